@@ -1,15 +1,34 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 # Use relative import for router
 from .v1.router import api_router
+from .utils.concurrency import blocking_executor
+from .utils.metrics_middleware import MetricsMiddleware
+from .utils.profiling_middleware import ProfilingMiddleware
 # Use absolute import for settings since it's outside api folder
 from config.settings import settings
+from utils.tracing import OTLPSpanExporter, add_span_exporter, clear_span_exporters
+from utils.metrics import CONTENT_TYPE, render
+from utils.profiling import SamplingProfiler
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if settings.OTLP_TRACES_ENDPOINT:
+        add_span_exporter(OTLPSpanExporter(settings.OTLP_TRACES_ENDPOINT, service_name=settings.OTLP_SERVICE_NAME))
+    try:
+        # Route asyncio.to_thread through the bounded blocking I/O pool
+        async with blocking_executor():
+            yield
+    finally:
+        clear_span_exporters()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     description="API for file uploads and LLM operations",
     version=settings.API_VERSION,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan
 )
 
 # CORS middleware
@@ -21,6 +40,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts and latencies per route, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
+if settings.PROFILING_ENABLED:
+    # Sampling profiles of a fraction of requests, listed at /api/v1/profiles
+    app.add_middleware(
+        ProfilingMiddleware,
+        profiler=SamplingProfiler(
+            interval=settings.PROFILING_INTERVAL_MS / 1000,
+            max_sessions=settings.PROFILING_MAX_CONCURRENT
+        ),
+        directory=settings.PROFILING_DIR,
+        sample_rate=settings.PROFILING_SAMPLE_RATE,
+        header=settings.PROFILING_HEADER,
+        keep=settings.PROFILING_KEEP
+    )
+
 @app.get("/")
 async def root():
     return {
@@ -29,6 +65,11 @@ async def root():
         "message": "File Upload API is running"
     }
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of this worker process (see utils.metrics)."""
+    return Response(content=render(), media_type=CONTENT_TYPE)
+
 # Include routers
 app.include_router(api_router, prefix=f"/api/{settings.API_VERSION}")
 
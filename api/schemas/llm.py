@@ -25,6 +25,35 @@ class LLMRequest(BaseModel):
         le=1.0
     )
 
+class LLMBatchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, description="The query texts to process against one corpus")
+    context_files: Optional[List[str]] = Field(
+        default=None,
+        description="List of specific file paths in S3 to use as context"
+    )
+    options: Optional[Dict[str, Any]] = Field(
+        default_factory=lambda: {
+            "bucket_name": "carftflow-demo",
+            "prefix": "uploads/",
+            "model_name": "gpt-4",
+            "file_extensions": [".txt", ".pdf", ".doc"],
+            "chain_options": {}
+        },
+        description="Additional options for LLM processing, shared by every query"
+    )
+    temperature: Optional[float] = Field(
+        default=0.7,
+        description="Temperature for LLM responses",
+        ge=0.0,
+        le=1.0
+    )
+    max_concurrency: int = Field(
+        default=4,
+        description="Maximum number of answers generated at the same time",
+        ge=1,
+        le=32
+    )
+
 class ContextDocument(BaseModel):
     content: str
     metadata: Dict[str, Any]
@@ -35,7 +64,7 @@ class LLMResponse(BaseModel):
     context: Optional[List[Dict[str, Any]]] = None
     metadata: Dict[str, Any] = Field(
         default_factory=dict,
-        description="Additional metadata about the processing"
+        description="Additional metadata about the processing, including the per-stage timing and token breakdown"
     )
     processing_time: float = Field(
         description="Time taken to process the query in seconds"
@@ -1,12 +1,45 @@
-from typing import Tuple, List, Dict, Any, Optional
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from functools import lru_cache
+from hashlib import sha256
+from typing import Tuple, List, Dict, Any, Optional, Hashable, AsyncIterator
+from langchain_core.documents import Document
 from rag.loaders import SourceType
-from rag.vectorstores import VectorStoreType
-from chains.rag_chain import create_chain
+from rag.loaders.s3_directory_loader import normalize_extensions
+from rag.vectorstores import VectorStoreType, similarity_search_batch, prune_snapshots
+from rag.retrievers import DEFAULT_MAX_CONTEXT_TOKENS, RetrievalMode, get_keyword_index, pack_documents, reciprocal_rank_fusion
+from chains.rag_chain import (
+    acreate_vectorstore,
+    create_answer_chain,
+    create_chain_from_vectorstore,
+    create_retriever
+)
 from api.services.s3 import S3Service
+from api.services.rag_cache import vectorstore_cache, semantic_answer_cache, compute_listing_fingerprint
+from chains.semantic_cache import with_semantic_cache
+from config.settings import settings
+from utils.tracing import SpanCallbackHandler, span
+
+# chain_options that only affect the chain built on top of the vectorstore
+CHAIN_ONLY_OPTIONS = ("similarity_threshold", "max_documents", "retrieval_mode", "pack_context", "max_context_tokens")
+
+@dataclass
+class RagQueryConfig:
+    """Resolved options of a RAG request."""
+    bucket_name: str
+    prefix: str
+    model_name: str
+    file_extensions: Optional[List[str]]
+    vectorstore_options: Dict[str, Any] = field(default_factory=dict)
+    chain_kwargs: Dict[str, Any] = field(default_factory=dict)
+    semantic_cache: bool = False
 
 class LLMService:
     def __init__(self):
         self.s3_service = S3Service()
+        self.vectorstore_type = VectorStoreType(settings.RAG_VECTORSTORE_TYPE)
         
     async def process_rag_query(
         self,
@@ -27,6 +60,245 @@ class LLMService:
         Returns:
             Tuple containing (answer, context_documents)
         """
+        config = await self._resolve_query_config(context_files, options)
+        
+        try:
+            # Reuse a cached vectorstore for this prefix when the objects are unchanged
+            vectorstore, corpus_version = await self._get_vectorstore(
+                bucket_name=config.bucket_name,
+                prefix=config.prefix,
+                file_extensions=config.file_extensions,
+                vectorstore_options=config.vectorstore_options
+            )
+            
+            chain = create_chain_from_vectorstore(
+                vectorstore=vectorstore,
+                vectorstore_type=self.vectorstore_type,
+                model_name=config.model_name,
+                temperature=temperature,
+                **config.chain_kwargs
+            )
+            
+            if config.semantic_cache:
+                # Serve paraphrased repeats of earlier questions without retrieval or generation
+                chain = with_semantic_cache(
+                    chain,
+                    cache=semantic_answer_cache,
+                    embedding_model=vectorstore.embeddings,
+                    corpus_version=self._get_answer_version(corpus_version, config, temperature)
+                )
+            
+            # Process the query
+            response = await chain.ainvoke({"input": query})
+            
+            return response["answer"], self._format_context(response.get("context", []))
+            
+        except Exception as e:
+            raise Exception(f"Error processing RAG query: {str(e)}")
+    
+    async def stream_rag_query(
+        self,
+        query: str,
+        context_files: Optional[List[str]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        temperature: float = 0.7
+    ) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Process a RAG query and stream the result as it is produced.
+        
+        Yields (event, data) pairs: one "context" event with the retrieved
+        documents, a "token" event per generated answer chunk, and a final
+        "done" event with a timing summary.
+        
+        Args:
+            query: The user's query
+            context_files: Optional list of specific file IDs/paths to use as context
+            options: Additional options for processing
+            temperature: Temperature setting for the LLM
+        """
+        start_time = time.perf_counter()
+        config = await self._resolve_query_config(context_files, options)
+        
+        vectorstore, corpus_version = await self._get_vectorstore(
+            bucket_name=config.bucket_name,
+            prefix=config.prefix,
+            file_extensions=config.file_extensions,
+            vectorstore_options=config.vectorstore_options
+        )
+        vectorstore_ready = time.perf_counter()
+        
+        if config.semantic_cache:
+            answer_version = self._get_answer_version(corpus_version, config, temperature)
+            query_vector = await vectorstore.embeddings.aembed_query(query)
+            hit = semantic_answer_cache.lookup(query_vector, answer_version)
+            if hit is not None:
+                yield "context", self._format_context(hit.context)
+                yield "token", {"token": hit.answer}
+                end_time = time.perf_counter()
+                yield "done", {
+                    "model": config.model_name,
+                    "cached": True,
+                    "context_count": len(hit.context),
+                    "vectorstore_time": vectorstore_ready - start_time,
+                    "time_to_first_token": end_time - start_time,
+                    "processing_time": end_time - start_time
+                }
+                return
+        
+        retriever = create_retriever(
+            vectorstore=vectorstore,
+            vectorstore_type=self.vectorstore_type,
+            **config.chain_kwargs
+        )
+        # Record retrieval and generation as spans of the current trace
+        traced_config = {"callbacks": [SpanCallbackHandler()]}
+        docs = await retriever.ainvoke(query, config=traced_config)
+        retrieval_done = time.perf_counter()
+        
+        yield "context", self._format_context(docs)
+        
+        answer_chain = create_answer_chain(model_name=config.model_name, temperature=temperature)
+        first_token_at = None
+        tokens = []
+        async for token in answer_chain.astream({"input": query, "context": docs}, config=traced_config):
+            if not token:
+                continue
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+            tokens.append(token)
+            yield "token", {"token": token}
+        end_time = time.perf_counter()
+        token_count = len(tokens)
+        
+        if config.semantic_cache:
+            semantic_answer_cache.store(query, query_vector, "".join(tokens), docs, answer_version)
+        
+        yield "done", {
+            "model": config.model_name,
+            "cached": False,
+            "context_count": len(docs),
+            "chunk_count": token_count,
+            "vectorstore_time": vectorstore_ready - start_time,
+            "retrieval_time": retrieval_done - vectorstore_ready,
+            "time_to_first_token": (first_token_at or end_time) - start_time,
+            "generation_time": end_time - retrieval_done,
+            "processing_time": end_time - start_time
+        }
+    
+    async def batch_rag_query(
+        self,
+        queries: List[str],
+        context_files: Optional[List[str]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        temperature: float = 0.7,
+        max_concurrency: int = 4
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Answer many queries against the same documents.
+        
+        The vectorstore and answer chain are set up once, all queries are
+        embedded in one batched call and retrieved in one vectorized pass, and
+        answers are generated with at most max_concurrency LLM calls in flight.
+        Results are yielded in completion order and carry the query index; a
+        failed generation is reported on its own item instead of failing the batch.
+        
+        Args:
+            queries: The user's queries
+            context_files: Optional list of specific file IDs/paths to use as context
+            options: Additional options for processing, shared by every query
+            temperature: Temperature setting for the LLM
+            max_concurrency: Maximum number of answers generated at the same time
+        """
+        start_time = time.perf_counter()
+        config = await self._resolve_query_config(context_files, options)
+        
+        vectorstore, _ = await self._get_vectorstore(
+            bucket_name=config.bucket_name,
+            prefix=config.prefix,
+            file_extensions=config.file_extensions,
+            vectorstore_options=config.vectorstore_options
+        )
+        vectorstore_ready = time.perf_counter()
+        
+        query_vectors = await vectorstore.embeddings.aembed_documents(queries)
+        embedding_done = time.perf_counter()
+        
+        max_documents = config.chain_kwargs.get("max_documents", 6)
+        hybrid = RetrievalMode(config.chain_kwargs.get("retrieval_mode", RetrievalMode.DENSE)) == RetrievalMode.HYBRID
+        contexts = await asyncio.to_thread(
+            similarity_search_batch,
+            vectorstore,
+            query_vectors,
+            max_documents * 2 if hybrid else max_documents
+        )
+        if hybrid:
+            # Same fusion as HybridRetriever, over the batched dense results
+            keyword_index = await asyncio.to_thread(get_keyword_index, vectorstore)
+            contexts = [
+                reciprocal_rank_fusion(
+                    [dense, [doc for doc, _ in keyword_index.search(query, max_documents * 2)]],
+                    max_documents
+                )
+                for query, dense in zip(queries, contexts)
+            ]
+        if config.chain_kwargs.get("pack_context", True):
+            max_context_tokens = config.chain_kwargs.get("max_context_tokens", DEFAULT_MAX_CONTEXT_TOKENS)
+            contexts = [pack_documents(docs, max_context_tokens) for docs in contexts]
+        retrieval_done = time.perf_counter()
+        
+        answer_chain = create_answer_chain(model_name=config.model_name, temperature=temperature)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def answer(index: int) -> Dict[str, Any]:
+            async with semaphore:
+                generation_start = time.perf_counter()
+                result = {"index": index, "query": queries[index]}
+                try:
+                    result["answer"] = await answer_chain.ainvoke(
+                        {"input": queries[index], "context": contexts[index]}
+                    )
+                    result["context"] = self._format_context(contexts[index])
+                except Exception as e:
+                    result["error"] = str(e)
+                generation_end = time.perf_counter()
+            result["timings"] = {
+                "queue_time": generation_start - retrieval_done,
+                "generation_time": generation_end - generation_start,
+                "processing_time": generation_end - start_time
+            }
+            return result
+        
+        failed = 0
+        for next_result in asyncio.as_completed([answer(i) for i in range(len(queries))]):
+            result = await next_result
+            failed += "error" in result
+            yield result
+        end_time = time.perf_counter()
+        
+        yield {
+            "summary": {
+                "model": config.model_name,
+                "query_count": len(queries),
+                "failed_count": failed,
+                "vectorstore_time": vectorstore_ready - start_time,
+                "embedding_time": embedding_done - vectorstore_ready,
+                "retrieval_time": retrieval_done - embedding_done,
+                "generation_time": end_time - retrieval_done,
+                "processing_time": end_time - start_time
+            }
+        }
+    
+    async def _resolve_query_config(
+        self,
+        context_files: Optional[List[str]],
+        options: Optional[Dict[str, Any]]
+    ) -> "RagQueryConfig":
+        """
+        Apply defaults to the request options and resolve the S3 prefix to query.
+        
+        Raises:
+            ValueError: If one of the context files does not exist in S3
+        """
         options = options or {}
         
         # Set up default options
@@ -38,8 +310,12 @@ class LLMService:
         # If specific files are provided, adjust the prefix to target those files
         if context_files:
             # Verify files exist in S3
-            for file_path in context_files:
-                if not await self.s3_service.file_exists(bucket_name, file_path):
+            exists = await asyncio.gather(*(
+                self.s3_service.file_exists(bucket_name, file_path)
+                for file_path in context_files
+            ))
+            for file_path, file_exists in zip(context_files, exists):
+                if not file_exists:
                     raise ValueError(f"File not found in S3: {file_path}")
             
             # Use the directory containing the specified files
@@ -47,37 +323,121 @@ class LLMService:
                 # Get the common prefix from the specified files
                 prefix = self._get_common_prefix(context_files)
         
-        try:
-            # Create and invoke the RAG chain
-            chain = create_chain(
+        chain_options = dict(options.get("chain_options", {}))
+        chain_kwargs = {
+            name: chain_options.pop(name)
+            for name in CHAIN_ONLY_OPTIONS
+            if name in chain_options
+        }
+        
+        return RagQueryConfig(
+            bucket_name=bucket_name,
+            prefix=prefix,
+            model_name=model_name,
+            file_extensions=file_extensions,
+            vectorstore_options=chain_options,
+            chain_kwargs=chain_kwargs,
+            semantic_cache=options.get("semantic_cache", settings.SEMANTIC_CACHE_ENABLED)
+        )
+    
+    def _format_context(self, docs: List[Document]) -> List[Dict[str, Any]]:
+        """
+        Format retrieved documents for the API response.
+        """
+        return [
+            {
+                "content": doc.page_content,
+                "metadata": doc.metadata,
+                "source": doc.metadata.get("source", "unknown")
+            }
+            for doc in docs
+        ]
+    
+    async def _get_vectorstore(
+        self,
+        bucket_name: str,
+        prefix: str,
+        file_extensions: Optional[List[str]],
+        vectorstore_options: Dict[str, Any]
+    ) -> Tuple[Any, str]:
+        """
+        Get the vectorstore for an S3 prefix, building it only when needed.
+        
+        The cache entry is invalidated whenever the ETags listed under the
+        prefix change, so new or modified uploads are picked up on the next query.
+        With RAG_SNAPSHOT_DIR set, the vectors are kept in a memory-mapped
+        snapshot shared by every worker process.
+        
+        Returns:
+            Tuple containing (vectorstore, corpus_version) where corpus_version
+            identifies the indexed objects and loader options
+        """
+        with span("rag.s3_list") as list_span:
+            objects = await self.s3_service.list_objects(
+                bucket_name=bucket_name,
+                prefix=prefix,
+                file_extension=file_extensions
+            )
+            list_span.set(objects=len(objects))
+        fingerprint = compute_listing_fingerprint(objects)
+        key = self._get_cache_key(bucket_name, prefix, file_extensions, vectorstore_options)
+        corpus_version = sha256(f"{key!r}\0{fingerprint}".encode("utf-8")).hexdigest()
+        
+        # Snapshots are named by corpus version, so a worker attaches to the
+        # index another worker built for the same objects instead of re-embedding
+        snapshot_path = None
+        if settings.RAG_SNAPSHOT_DIR:
+            snapshot_path = os.path.join(settings.RAG_SNAPSHOT_DIR, corpus_version)
+        
+        async def build():
+            vectorstore = await acreate_vectorstore(
                 source_type=SourceType.S3_DIRECTORY,
-                vectorstore_type=VectorStoreType.IN_MEMORY,
+                vectorstore_type=self.vectorstore_type,
                 bucket_name=bucket_name,
                 prefix=prefix,
                 file_extension=file_extensions,
-                model_name=model_name,
-                temperature=temperature,
-                # Add any additional options from the request
-                **options.get("chain_options", {})
+                snapshot_path=snapshot_path,
+                **{"quantization": settings.RAG_VECTOR_QUANTIZATION, **vectorstore_options}
             )
-            
-            # Process the query
-            response = chain.invoke({"input": query})
-            
-            # Format context documents
-            context_docs = []
-            if "context" in response:
-                for doc in response["context"]:
-                    context_docs.append({
-                        "content": doc.page_content,
-                        "metadata": doc.metadata,
-                        "source": doc.metadata.get("source", "unknown")
-                    })
-            
-            return response["answer"], context_docs
-            
-        except Exception as e:
-            raise Exception(f"Error processing RAG query: {str(e)}")
+            if snapshot_path:
+                await asyncio.to_thread(prune_snapshots, settings.RAG_SNAPSHOT_DIR, settings.RAG_SNAPSHOT_KEEP)
+            return vectorstore
+        
+        if not settings.RAG_CACHE_ENABLED:
+            return await build(), corpus_version
+        
+        return await vectorstore_cache.aget_or_build(key, fingerprint, build), corpus_version
+    
+    def _get_answer_version(self, corpus_version: str, config: RagQueryConfig, temperature: float) -> str:
+        """
+        Identify everything an answer depends on besides the question itself.
+        """
+        chain_kwargs = tuple(sorted(config.chain_kwargs.items()))
+        return f"{corpus_version}:{config.model_name}:{temperature}:{chain_kwargs!r}"
+    
+    def _get_cache_key(
+        self,
+        bucket_name: str,
+        prefix: str,
+        file_extensions: Optional[List[str]],
+        vectorstore_options: Dict[str, Any]
+    ) -> Hashable:
+        """
+        Build the cache key describing how a vectorstore is loaded and embedded.
+        """
+        options = dict(vectorstore_options)
+        extensions = normalize_extensions(file_extensions)
+        return (
+            self.vectorstore_type.value,
+            bucket_name,
+            prefix,
+            tuple(sorted(extensions)) if extensions else None,
+            options.pop("chunk_size", 1000),
+            options.pop("chunk_overlap", 200),
+            options.pop("embedding_model_name", "text-embedding-ada-002"),
+            # Any other loader options still change what gets indexed
+            tuple(sorted((name, repr(value)) for name, value in options.items()))
+        )
     
     def _get_common_prefix(self, file_paths: List[str]) -> str:
         """
@@ -98,3 +458,11 @@ class LLMService:
                 break
         
         return '/'.join(common_prefix) + '/' if common_prefix else ""
+
+@lru_cache()
+def get_llm_service() -> LLMService:
+    """
+    Returns the shared LLMService instance.
+    Use this as a dependency in FastAPI so the boto3 client is created once per worker.
+    """
+    return LLMService()
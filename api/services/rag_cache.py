@@ -0,0 +1,214 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from hashlib import sha256
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from api.utils.logger import logger
+from chains.semantic_cache import SemanticAnswerCache
+from config.settings import settings
+from utils.metrics import cache_lookup
+
+
+def compute_listing_fingerprint(objects: List[Dict[str, Any]]) -> str:
+    """
+    Compute a stable fingerprint of an S3 listing from its keys and ETags.
+
+    Any upload, overwrite or deletion under the prefix changes the fingerprint.
+    """
+    digest = sha256()
+    for obj in sorted(objects, key=lambda o: o["Key"]):
+        digest.update(f"{obj['Key']}\0{obj.get('ETag', '')}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def estimate_vectorstore_bytes(vectorstore: Any) -> int:
+    """
+    Roughly estimate the resident memory held by a vectorstore.
+
+    The estimate only needs to be good enough to drive cache eviction, so it
+    counts vectors, texts and a fixed per-entry overhead.
+    """
+    # Stores that know their own footprint
+    if hasattr(vectorstore, "memory_footprint"):
+        return int(vectorstore.memory_footprint())
+
+    # LangChain InMemoryVectorStore keeps a dict of python float lists
+    store = getattr(vectorstore, "store", None)
+    if isinstance(store, dict):
+        total = 0
+        for entry in store.values():
+            # ~32 bytes per python float (object + list slot)
+            total += len(entry.get("vector", ())) * 32
+            total += len(entry.get("text", ""))
+            total += 256
+        return total
+
+    # FAISS keeps contiguous float32 vectors plus a docstore
+    index = getattr(vectorstore, "index", None)
+    docstore = getattr(vectorstore, "docstore", None)
+    if index is not None and hasattr(index, "ntotal") and hasattr(index, "d"):
+        total = index.ntotal * index.d * 4
+        for doc in getattr(docstore, "_dict", {}).values():
+            total += len(doc.page_content) + 256
+        return total
+
+    return 0
+
+
+@dataclass
+class CacheEntry:
+    value: Any
+    fingerprint: str
+    size_bytes: int
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+
+
+class VectorStoreCache:
+    """
+    Process-wide LRU cache of built vectorstores bounded by a memory budget.
+
+    Entries are looked up by a hashable key describing how the vectorstore was
+    built and are only served while the source fingerprint (e.g. the S3
+    listing ETags) is unchanged.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Locks of the builds in progress, with the number of requests holding or awaiting each
+        self._build_locks: Dict[Hashable, Tuple[asyncio.Lock, int]] = {}
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, fingerprint: str) -> Optional[Any]:
+        """Return the cached value for key if its fingerprint still matches."""
+        value = self._get(key, fingerprint)
+        cache_lookup("vectorstore", value is not None)
+        return value
+
+    def _get(self, key: Hashable, fingerprint: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry.fingerprint != fingerprint:
+                # Source changed since the entry was built
+                self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            entry.hits += 1
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, fingerprint: str, value: Any, size_bytes: Optional[int] = None) -> None:
+        """Insert a value and evict least recently used entries over budget."""
+        if size_bytes is None:
+            size_bytes = estimate_vectorstore_bytes(value)
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            if size_bytes > self.max_bytes:
+                logger.warning(
+                    f"Not caching vectorstore of ~{size_bytes} bytes, "
+                    f"larger than cache budget of {self.max_bytes} bytes"
+                )
+                return
+
+            self._entries[key] = CacheEntry(value=value, fingerprint=fingerprint, size_bytes=size_bytes)
+            self._total_bytes += size_bytes
+
+            while self._total_bytes > self.max_bytes and self._entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    async def aget_or_build(
+        self,
+        key: Hashable,
+        fingerprint: str,
+        builder: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Return the cached value for key, building it with await builder() on a miss.
+
+        Concurrent requests for the same key await a single build instead of
+        each loading and embedding the same documents, while other keys keep
+        being served. Must be called from the event loop; a key's build lock
+        is dropped once no request holds or awaits it.
+        """
+        value = self.get(key, fingerprint)
+        if value is not None:
+            return value
+
+        build_lock, users = self._build_locks.get(key, (None, 0))
+        build_lock = build_lock or asyncio.Lock()
+        self._build_locks[key] = (build_lock, users + 1)
+        try:
+            async with build_lock:
+                # Another request may have finished the build while we waited
+                with self._lock:
+                    entry = self._entries.get(key)
+                    if entry is not None and entry.fingerprint == fingerprint:
+                        self._entries.move_to_end(key)
+                        entry.hits += 1
+                        return entry.value
+
+                value = await builder()
+                self.put(key, fingerprint, value)
+                return value
+        finally:
+            _, users = self._build_locks[key]
+            if users > 1:
+                self._build_locks[key] = (build_lock, users - 1)
+            else:
+                del self._build_locks[key]
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one entry, or every entry when key is None."""
+        with self._lock:
+            keys = [key] if key is not None else list(self._entries)
+            for k in keys:
+                if k in self._entries:
+                    self._remove(k)
+                    self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Return counters describing the cache state."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size_bytes
+
+
+# Shared by every LLMService instance in this process
+vectorstore_cache = VectorStoreCache(max_bytes=settings.RAG_CACHE_MAX_BYTES)
+
+# Answers to previous questions, looked up by query embedding similarity
+semantic_answer_cache = SemanticAnswerCache(
+    similarity_threshold=settings.SEMANTIC_CACHE_THRESHOLD,
+    ttl_seconds=settings.SEMANTIC_CACHE_TTL_SECONDS,
+    max_entries=settings.SEMANTIC_CACHE_MAX_ENTRIES
+)
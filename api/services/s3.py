@@ -1,9 +1,12 @@
+import asyncio
 import boto3
+from botocore.exceptions import ClientError
 
 from config.settings import settings
 from api.utils.logger import logger
 from fastapi import UploadFile, HTTPException
-from typing import Optional
+from typing import Optional, List, Dict, Any, Union
+from rag.loaders.s3_directory_loader import list_s3_objects
 
 
 class S3Service:
@@ -39,8 +42,9 @@ class S3Service:
             # Read file content
             content = await file.read()
             
-            # Use regular boto3 upload without await
-            self.s3_client.put_object(
+            # boto3 has no async API, run the upload on the blocking I/O pool
+            await asyncio.to_thread(
+                self.s3_client.put_object,
                 Bucket=self.bucket_name,
                 Key=file_key,
                 Body=content
@@ -51,4 +55,29 @@ class S3Service:
             return url
         except Exception as e:
             logger.error(f"Error uploading file to S3: {str(e)}")
-            raise Exception(f"S3 upload failed: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"S3 upload failed: {str(e)}")
+
+    async def file_exists(self, bucket_name: str, file_key: str) -> bool:
+        """Check whether an object exists without downloading it."""
+        try:
+            await asyncio.to_thread(self.s3_client.head_object, Bucket=bucket_name, Key=file_key)
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    async def list_objects(
+        self,
+        bucket_name: str,
+        prefix: str = "",
+        file_extension: Optional[Union[str, List[str]]] = None
+    ) -> List[Dict[str, Any]]:
+        """List objects (key, ETag, size, last modified) under a prefix."""
+        return await asyncio.to_thread(
+            list_s3_objects,
+            bucket_name=bucket_name,
+            prefix=prefix,
+            file_extension=file_extension,
+            s3_client=self.s3_client
+        )
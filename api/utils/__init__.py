@@ -1,3 +1,4 @@
 from .logger import logger, setup_logger
+from .concurrency import blocking_executor
 
-__all__ = ['logger', 'setup_logger'] 
\ No newline at end of file
+__all__ = ['logger', 'setup_logger', 'blocking_executor']
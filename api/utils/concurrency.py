@@ -0,0 +1,50 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+from config.settings import settings
+from utils.metrics import THREAD_POOL_QUEUE_DEPTH
+from utils.profiling import ProfiledThreadPoolExecutor
+
+# Pool of the running app, reported by the thread pool queue depth gauge
+_blocking_executor: Optional[ProfiledThreadPoolExecutor] = None
+
+def _queue_depth():
+    executor = _blocking_executor
+    return {("blocking_io",): executor._work_queue.qsize() if executor is not None else 0}
+
+THREAD_POOL_QUEUE_DEPTH.set_function(_queue_depth)
+
+@asynccontextmanager
+async def blocking_executor(max_workers: Optional[int] = None) -> AsyncIterator[ProfiledThreadPoolExecutor]:
+    """
+    Make a bounded pool the running event loop's default executor while the context is open.
+    
+    asyncio.to_thread and loop.run_in_executor(None, ...) then share it, so
+    blocking work from every request (boto3, document parsing) is capped at
+    BLOCKING_IO_WORKERS threads, and its calls are sampled as part of the
+    profile of the request submitting them. On exit the loop's previous
+    default executor is restored and the pool is shut down, so every app
+    startup (e.g. each TestClient block) gets a working pool of its own.
+    
+    Args:
+        max_workers: Number of pool threads (default: BLOCKING_IO_WORKERS)
+    """
+    global _blocking_executor
+    loop = asyncio.get_running_loop()
+    # asyncio has no public getter for the default executor; None makes the loop create one lazily
+    previous = getattr(loop, "_default_executor", None)
+    executor = ProfiledThreadPoolExecutor(
+        max_workers=max_workers or settings.BLOCKING_IO_WORKERS,
+        thread_name_prefix="blocking-io"
+    )
+    loop.set_default_executor(executor)
+    _blocking_executor = executor
+    try:
+        yield executor
+    finally:
+        if _blocking_executor is executor:
+            _blocking_executor = None
+        if getattr(loop, "_default_executor", None) is executor:
+            loop._default_executor = previous
+        executor.shutdown(wait=False)
@@ -0,0 +1,46 @@
+import time
+
+from utils.metrics import HTTP_REQUEST_DURATION, HTTP_REQUESTS, HTTP_REQUESTS_IN_FLIGHT
+
+def route_template(scope) -> str:
+    """Path template of the route that handled a request, or "unmatched"."""
+    # FastAPI versions that include routers lazily keep the route's path relative
+    # to its router and record the full path in the effective route context
+    context = (scope.get("fastapi") or {}).get("effective_route_context")
+    path = getattr(context, "path", None) or getattr(scope.get("route"), "path", None)
+    return path or "unmatched"
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording the count, status and latency of every HTTP request.
+
+    Requests are labelled with their route template (e.g. /api/v1/files/{file_id})
+    rather than their path, so path parameters do not create a series per value.
+    Latency runs until the last byte is sent, which includes streamed responses.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = route_template(scope)
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, scope["method"], route)
+            HTTP_REQUESTS.inc(scope["method"], route, str(status))
@@ -0,0 +1,81 @@
+import asyncio
+import random
+import uuid
+
+from api.utils.logger import logger
+from utils.profiling import SamplingProfiler, new_profile_id, save_profile
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware recording a sampling profile of selected requests.
+
+    A request is profiled with probability sample_rate, or when it sends the
+    profiling header with a value other than "0" or "false". Its profile is
+    saved under the request ID (the X-Request-ID header, or a new one) and the
+    response carries the profile ID in an X-Profile-ID header. Requests beyond
+    the profiler's max_sessions are not profiled.
+    """
+
+    def __init__(
+        self,
+        app,
+        profiler: SamplingProfiler,
+        directory: str,
+        sample_rate: float = 0.01,
+        header: str = "X-Profile",
+        keep: int = 200
+    ):
+        self.app = app
+        self.profiler = profiler
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.header = header.lower().encode("latin-1")
+        self.keep = keep
+
+    def _requested(self, headers) -> bool:
+        value = headers.get(self.header)
+        return value is not None and value.lower() not in (b"0", b"false")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if not (self._requested(headers) or random.random() < self.sample_rate):
+            await self.app(scope, receive, send)
+            return
+
+        session = self.profiler.start(f"{scope['method']} {scope['path']}", asyncio.get_running_loop())
+        if session is None:
+            await self.app(scope, receive, send)
+            return
+
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex
+        profile_id = new_profile_id(request_id)
+        status = 500
+
+        async def send_with_profile_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {
+                    **message,
+                    "headers": list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode("latin-1"))]
+                }
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            self.profiler.stop(session)
+            metadata = {
+                "request_id": request_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status
+            }
+            try:
+                await asyncio.to_thread(save_profile, self.directory, profile_id, session, metadata, self.keep)
+            except Exception as e:
+                logger.error(f"Error saving profile {profile_id}: {str(e)}")
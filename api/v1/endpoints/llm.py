@@ -1,6 +1,10 @@
 from fastapi import APIRouter, HTTPException, Depends
-from api.schemas.llm import LLMRequest, LLMResponse, LLMError
-from api.services.llm import LLMService
+from fastapi.responses import StreamingResponse
+from api.schemas.llm import LLMRequest, LLMBatchRequest, LLMResponse, LLMError
+from api.services.llm import LLMService, get_llm_service
+from api.utils.logger import logger
+from utils.tracing import trace
+import json
 import time
 
 router = APIRouter()
@@ -16,18 +20,19 @@ router = APIRouter()
 )
 async def query_documents(
     request: LLMRequest,
-    llm_service: LLMService = Depends(LLMService)
+    llm_service: LLMService = Depends(get_llm_service)
 ):
     try:
         start_time = time.time()
         
-        # Process the query using the LLM service
-        answer, context = await llm_service.process_rag_query(
-            query=request.query,
-            context_files=request.context_files,
-            options=request.options,
-            temperature=request.temperature
-        )
+        # Process the query using the LLM service, timing every stage
+        with trace("rag.query") as root:
+            answer, context = await llm_service.process_rag_query(
+                query=request.query,
+                context_files=request.context_files,
+                options=request.options,
+                temperature=request.temperature
+            )
         
         processing_time = time.time() - start_time
         
@@ -36,7 +41,8 @@ async def query_documents(
             context=context,
             metadata={
                 "model": request.options.get("model_name", "gpt-4"),
-                "file_count": len(request.context_files) if request.context_files else 0
+                "file_count": len(request.context_files) if request.context_files else 0,
+                "breakdown": root.trace.breakdown()
             },
             processing_time=processing_time
         )
@@ -45,3 +51,82 @@ async def query_documents(
         raise HTTPException(status_code=400, detail=str(ve))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+def format_sse(event: str, data) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@router.post("/rag/query/stream",
+    response_class=StreamingResponse,
+    summary="Query documents using RAG and stream the answer",
+    description=(
+        "Server-sent events variant of /rag/query. Emits a `context` event with the "
+        "retrieved documents, `token` events as the answer is generated, and a final "
+        "`done` event with timings and the per-stage `breakdown`. Failures are reported "
+        "as an `error` event."
+    )
+)
+async def stream_query_documents(
+    request: LLMRequest,
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    async def event_stream():
+        try:
+            with trace("rag.query", streaming=True) as root:
+                async for event, data in llm_service.stream_rag_query(
+                    query=request.query,
+                    context_files=request.context_files,
+                    options=request.options,
+                    temperature=request.temperature
+                ):
+                    if event == "done":
+                        data = {**data, "breakdown": root.trace.breakdown()}
+                    yield format_sse(event, data)
+        except ValueError as ve:
+            yield format_sse("error", {"status_code": 400, "detail": str(ve)})
+        except Exception as e:
+            logger.error(f"Error streaming RAG query: {str(e)}")
+            yield format_sse("error", {"status_code": 500, "detail": str(e)})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # Disable proxy buffering so tokens reach the client immediately
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+
+@router.post("/rag/batch",
+    response_class=StreamingResponse,
+    summary="Answer many queries against the same documents",
+    description=(
+        "Runs every query against one vectorstore and answer chain and streams the "
+        "results as JSON lines in completion order. Each line carries the query "
+        "`index`, the `answer` and `context` (or an `error`) and per-item `timings`; "
+        "the last line is a `summary` with batch-level timings."
+    )
+)
+async def batch_query_documents(
+    request: LLMBatchRequest,
+    llm_service: LLMService = Depends(get_llm_service)
+):
+    async def result_stream():
+        try:
+            async for result in llm_service.batch_rag_query(
+                queries=request.queries,
+                context_files=request.context_files,
+                options=request.options,
+                temperature=request.temperature,
+                max_concurrency=request.max_concurrency
+            ):
+                yield json.dumps(result, default=str) + "\n"
+        except ValueError as ve:
+            yield json.dumps({"error": str(ve), "status_code": 400}) + "\n"
+        except Exception as e:
+            logger.error(f"Error processing RAG batch: {str(e)}")
+            yield json.dumps({"error": str(e), "status_code": 500}) + "\n"
+    
+    return StreamingResponse(result_stream(), media_type="application/x-ndjson")
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import FileResponse
+from config.settings import settings
+from utils.profiling import list_profiles, profile_path
+import asyncio
+
+router = APIRouter()
+
+@router.get("",
+    summary="List recent request profiles",
+    description=(
+        "Metadata of the most recent sampling profiles (request ID, method, path, "
+        "status, duration and sample count), newest first. Profiles are only "
+        "recorded with PROFILING_ENABLED."
+    )
+)
+async def list_recent_profiles(limit: int = Query(50, ge=1, le=1000)):
+    return await asyncio.to_thread(list_profiles, settings.PROFILING_DIR, limit)
+
+@router.get("/{profile_id}",
+    response_class=FileResponse,
+    summary="Fetch a request profile",
+    description=(
+        "The profile's collapsed stacks (one `frame;frame;frame count` line per stack), "
+        "which flamegraph.pl, speedscope and inferno render as a flame graph."
+    )
+)
+async def get_profile(profile_id: str):
+    path = profile_path(settings.PROFILING_DIR, profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.collapsed")
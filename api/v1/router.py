@@ -2,6 +2,7 @@ from fastapi import APIRouter
 from api.v1.endpoints.file_upload import router as file_router
 from api.v1.endpoints.llm import router as llm_router
 from api.v1.endpoints.langsmith import router as langsmith_router
+from api.v1.endpoints.profiles import router as profiles_router
 
 # Create the main API router
 api_router = APIRouter()
@@ -25,4 +26,10 @@ api_router.include_router(
     tags=["LangSmith"]
 )
 
+api_router.include_router(
+    profiles_router,
+    prefix="/profiles",
+    tags=["Profiles"]
+)
+
 # You can add more routers here as your API grows 
\ No newline at end of file
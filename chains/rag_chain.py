@@ -1,39 +1,34 @@
 import os
-from typing import List, Optional, Union, Any, Callable
+import asyncio
+import inspect
+from typing import List, Optional, Union, Any, Callable, Dict
 from langchain.chains import create_retrieval_chain
 from langchain.chains.combine_documents import create_stuff_documents_chain
 from langchain_core.documents import Document
 from langchain_core.prompts import ChatPromptTemplate
 from enum import Enum
 
-from rag.loaders import get_loader, SourceType
-from rag.vectorstores import get_vectorstore, VectorStoreType
+from rag.loaders import get_loader, sync_s3_directory, S3SyncResult, SourceType
+from rag.vectorstores import get_vectorstore, aget_vectorstore, delete_documents, snapshot_exists, VectorStoreType, FaissIndexSpec, Quantization
+from rag.pipeline import stream_documents, PipelineStats
+from rag.dedup import ChunkDeduplicator
+from rag.retrievers import DEFAULT_MAX_CONTEXT_TOKENS, HybridRetriever, PackedRetriever, RetrievalMode, get_keyword_index
 from models.llms import get_openai_chat_model
 from rag.embeddings import get_openai_embeddings
 from rag.prompts.qa_prompts import get_qa_prompt
+from utils.tracing import SpanCallbackHandler, traced
 
 from dotenv import load_dotenv
 load_dotenv()
 
-def create_chain(
+def load_documents(
     source_type: SourceType = None,
     source_path: str = None,
     bucket_name: str = None, 
     file_key: str = None, 
     prefix: str = None,
-    index_name: str = "langchain-doc-embeddings",
-    namespace: str = None,
-    collection_name: str = None,
-    vectorstore_type: VectorStoreType = VectorStoreType.IN_MEMORY,
-    force_reload: bool = False,
-    chroma_db_path: str = "./chroma_db",
-    persist_directory: str = "./faiss_indexes",
-    model_name: str = "gpt-4",
-    temperature: float = 0.4,
     chunk_size: int = 1000,
     chunk_overlap: int = 200,
-    similarity_threshold: float = 0.7,
-    max_documents: int = 6,
     aws_access_key_id: str = None,
     aws_secret_access_key: str = None,
     aws_session_token: str = None,
@@ -45,6 +40,7 @@ def create_chain(
     use_multithreading: bool = True,
     glob_pattern: str = "**/*.txt",
     silent: bool = True,
+    pdf_workers: Optional[int] = None,
     endpoint_url: Optional[str] = None,
     use_ssl: Optional[bool] = True,
     verify: Union[str, bool, None] = None,
@@ -55,7 +51,7 @@ def create_chain(
     **unstructured_kwargs
 ):
     """
-    Create a RAG chain that can process various types of data sources.
+    Load and split documents from any supported data source.
     
     Args:
         source_type: Type of source data (PDF, TEXT_DIRECTORY, S3_FILE, etc.)
@@ -63,19 +59,8 @@ def create_chain(
         bucket_name: S3 bucket name (for S3 sources)
         file_key: S3 file key (for single S3 file)
         prefix: S3 prefix/directory (for S3 directory)
-        index_name: Name of the index (for Pinecone)
-        namespace: Namespace for Pinecone
-        collection_name: Collection name for Chroma
-        vectorstore_type: Type of vectorstore to use
-        persist_directory: Path to store vectorstore files (for FAISS)
-        chroma_db_path: Path to store Chroma database files (default: ./chroma_db)
-        force_reload: Whether to force reload the index with new documents
-        model_name: Name of the LLM model to use
-        temperature: Temperature setting for the LLM
         chunk_size: Size of each text chunk
         chunk_overlap: Overlap between chunks
-        similarity_threshold: Minimum similarity score (0-1) for retrieved documents
-        max_documents: Maximum number of documents to retrieve
         aws_access_key_id: AWS access key ID (for S3 sources)
         aws_secret_access_key: AWS secret access key (for S3 sources)
         aws_session_token: AWS session token (for S3 sources)
@@ -88,6 +73,7 @@ def create_chain(
         use_multithreading: Whether to use multithreading for loading
         glob_pattern: Pattern to match files
         silent: Whether to suppress stderr output for PDF loading
+        pdf_workers: Number of processes extracting PDF page ranges in parallel (None extracts serially)
         endpoint_url: Custom endpoint URL for S3
         use_ssl: Whether to use SSL for S3
         verify: Whether to verify SSL certificates for S3
@@ -98,7 +84,7 @@ def create_chain(
         **unstructured_kwargs: Additional kwargs for unstructured library
         
     Returns:
-        A retrieval chain
+        List of document chunks (empty for the EMBEDDINGS source type)
     """
     # Handle backward compatibility for S3 sources
     if bucket_name and (file_key or prefix) and not source_type:
@@ -135,6 +121,7 @@ def create_chain(
             
         if source_type == SourceType.PDF:
             kwargs["silent"] = silent
+            kwargs["pdf_workers"] = pdf_workers
             
     elif source_type == SourceType.S3_FILE:
         if not bucket_name or not file_key:
@@ -169,6 +156,7 @@ def create_chain(
         kwargs["verify"] = verify
         kwargs["api_version"] = api_version
         kwargs["boto_config"] = boto_config
+        kwargs["pdf_workers"] = pdf_workers
     
     # Load documents using the unified loader interface
     splits = get_loader(**kwargs)
@@ -180,70 +168,631 @@ def create_chain(
     if isinstance(splits, list):
         print(f"Loaded {len(splits)} document splits")
     
-    # Get embedding model
-    embedding_model = get_openai_embeddings()
+    return splits
 
-    try:
-        # Create vector store
-        vectorstore = get_vectorstore(
-            documents=splits, 
-            vectorstore_type=vectorstore_type,
-            embedding_model=embedding_model,
-            index_name=index_name,
-            namespace=namespace,
-            collection_name=collection_name,
-            force_reload=force_reload,
-            persist_directory=persist_directory
-        )
+def purge_stale_documents(
+    vectorstore: Any,
+    sync: S3SyncResult,
+    vectorstore_type: VectorStoreType,
+    persist_directory: str = "./faiss_indexes",
+    index_name: str = "langchain-doc-embeddings"
+):
+    """
+    Delete the chunks of removed or rewritten S3 objects after an incremental
+    sync, then record the sync in its manifest.
+    
+    The manifest is only committed once the vectorstore reflects it, so a failed
+    run is simply retried from the previous state.
+    """
+    removed = delete_documents(vectorstore, sync.stale_doc_ids)
+    if removed and vectorstore_type == VectorStoreType.FAISS:
+        vectorstore.save_local(os.path.join(persist_directory, "faiss"), index_name)
+    if removed:
+        print(f"Deleted {removed} stale chunks from {vectorstore_type} vectorstore")
+    sync.commit()
 
-        print(f"Vectorstore created with type: {vectorstore_type}")
-        if namespace:
-            print(f"Using Pinecone namespace: {namespace}")
-        if collection_name:
-            print(f"Using Chroma collection: {collection_name}")
-        
-        # Create retriever with vectorstore-specific configurations
-        if vectorstore_type == VectorStoreType.CHROMA:
-            retriever = vectorstore.as_retriever(
-                search_type="mmr",  # Use MMR for Chroma to ensure diversity
-                search_kwargs={
-                    "k": max_documents,
-                    "fetch_k": max_documents * 3,  # Fetch more candidates for MMR
-                    "lambda_mult": 0.7  # Diversity vs relevance trade-off
-                }
-            )
-        elif vectorstore_type == VectorStoreType.PINECONE:
-            retriever = vectorstore.as_retriever(
-                search_type="similarity",
-                search_kwargs={
-                    "k": max_documents,
-                    "score_threshold": similarity_threshold
-                }
+# Parameters of load_documents, which create_vectorstore passes on to the loaders
+_LOADER_OPTIONS = (
+    "source_type", "source_path", "bucket_name", "file_key", "prefix", "chunk_size", "chunk_overlap",
+    "aws_access_key_id", "aws_secret_access_key", "aws_session_token", "region_name", "file_extension",
+    "encoding", "show_progress", "use_multithreading", "glob_pattern", "silent", "pdf_workers",
+    "endpoint_url", "use_ssl", "verify", "api_version", "boto_config", "mode", "post_processors"
+)
+
+# Vectorstores that keep the chunks of previous runs, which an incremental S3 sync only updates
+_SYNCABLE_VECTORSTORES = (VectorStoreType.CHROMA, VectorStoreType.PINECONE, VectorStoreType.FAISS)
+
+class _VectorstoreBuild:
+    """
+    Option handling and steps of one create_vectorstore call, shared by its async variant.
+    
+    load and purge block (loaders, boto3, vectorstore deletes), so
+    acreate_vectorstore runs them on the thread pool and embeds through
+    aget_vectorstore instead of get_vectorstore.
+    """
+    
+    def __init__(self, options: Dict[str, Any]):
+        if options["sync_manifest_path"] and options["vectorstore_type"] not in _SYNCABLE_VECTORSTORES:
+            raise ValueError(
+                f"sync_manifest_path requires a persistent vectorstore (Chroma, Pinecone or FAISS), "
+                f"not {options['vectorstore_type']}"
             )
-        elif vectorstore_type == VectorStoreType.FAISS:
-            retriever = vectorstore.as_retriever(
-                search_type="mmr",
-                search_kwargs={
-                    "k": max_documents,
-                    "fetch_k": max_documents * 3,
-                    "lambda_mult": 0.7,
-                    "score_threshold": similarity_threshold
-                }
+        self.options = options
+        self.sync = None
+        self.pipeline_stats = None
+        self.deduplicator = (
+            ChunkDeduplicator(options["near_duplicate_threshold"]) if options["deduplicate"] else None
+        )
+    
+    def load(self):
+        """Load and split the documents to index (a lazy iterator when streaming)."""
+        options = self.options
+        if options["snapshot_path"] and snapshot_exists(options["snapshot_path"]) and not options["force_reload"]:
+            # Another process already indexed these documents; just map its snapshot
+            return []
+        
+        if options["sync_manifest_path"] and options["source_type"] == SourceType.S3_DIRECTORY:
+            # Only new and changed objects are downloaded, split and embedded
+            self.sync = sync_s3_directory(
+                bucket_name=options["bucket_name"],
+                prefix=options["prefix"] or "",
+                manifest_path=options["sync_manifest_path"],
+                file_extension=options["file_extension"],
+                chunk_size=options["chunk_size"],
+                chunk_overlap=options["chunk_overlap"],
+                aws_access_key_id=options["aws_access_key_id"],
+                aws_secret_access_key=options["aws_secret_access_key"],
+                aws_session_token=options["aws_session_token"],
+                region_name=options["region_name"],
+                endpoint_url=options["endpoint_url"],
+                use_ssl=options["use_ssl"],
+                verify=options["verify"],
+                api_version=options["api_version"],
+                boto_config=options["boto_config"],
+                force_reload=options["force_reload"]
             )
-        else:  # IN_MEMORY and others
-            retriever = vectorstore.as_retriever(
-                search_type="similarity",
-                search_kwargs={
-                    "k": max_documents
-                }
+            print(f"S3 sync: {self.sync.summary()}")
+            # Dropping one object's chunk as a duplicate of another object's would lose it
+            # once the other object is deleted, so synced chunks are kept as they are
+            self.deduplicator = None
+            return self.sync.documents
+        
+        loader_kwargs = {name: options[name] for name in _LOADER_OPTIONS}
+        loader_kwargs.update(options["unstructured_kwargs"])
+        if options["streaming"]:
+            # Documents are loaded and split lazily as the vectorstore pulls them
+            loader_kwargs.pop("use_multithreading")
+            self.pipeline_stats = PipelineStats()
+            return stream_documents(stats=self.pipeline_stats, deduplicator=self.deduplicator, **loader_kwargs)
+        
+        splits = load_documents(**loader_kwargs)
+        if self.deduplicator is not None:
+            splits = self.deduplicator.deduplicate(splits)
+        return splits
+    
+    def vectorstore_kwargs(self, splits) -> Dict[str, Any]:
+        """Arguments of get_vectorstore / aget_vectorstore for the loaded splits."""
+        options = self.options
+        embedding_model = get_openai_embeddings(
+            model=options["embedding_model_name"],
+            use_cache=options["use_embedding_cache"]
+        )
+        return {
+            "documents": splits,
+            "vectorstore_type": options["vectorstore_type"],
+            "embedding_model": embedding_model,
+            "index_name": options["index_name"],
+            "namespace": options["namespace"],
+            "collection_name": options["collection_name"],
+            "force_reload": options["force_reload"],
+            "persist_directory": options["persist_directory"],
+            "chroma_db_path": options["chroma_db_path"],
+            "faiss_index_spec": options["faiss_index_spec"],
+            "quantization": options["quantization"],
+            "snapshot_path": options["snapshot_path"]
+        }
+    
+    def purge(self, vectorstore: Any):
+        """Delete the chunks of removed or rewritten objects after an S3 sync."""
+        if self.sync is not None:
+            options = self.options
+            purge_stale_documents(
+                vectorstore, self.sync, options["vectorstore_type"], options["persist_directory"], options["index_name"]
             )
+    
+    def report(self, vectorstore: Any):
+        options = self.options
+        if self.deduplicator is not None and self.deduplicator.stats.chunks:
+            print(f"Deduplication: {self.deduplicator.stats}")
+        if self.pipeline_stats is not None:
+            print(f"Streaming ingestion: {self.pipeline_stats}")
+        print(f"Vectorstore created with type: {options['vectorstore_type']}")
+        if hasattr(vectorstore, "memory_report"):
+            print(f"Vectorstore memory: {vectorstore.memory_report()}")
+        if options["namespace"]:
+            print(f"Using Pinecone namespace: {options['namespace']}")
+        if options["collection_name"]:
+            print(f"Using Chroma collection: {options['collection_name']}")
+
+def create_vectorstore(
+    source_type: SourceType = None,
+    source_path: str = None,
+    bucket_name: str = None, 
+    file_key: str = None, 
+    prefix: str = None,
+    index_name: str = "langchain-doc-embeddings",
+    namespace: str = None,
+    collection_name: str = None,
+    vectorstore_type: VectorStoreType = VectorStoreType.IN_MEMORY,
+    force_reload: bool = False,
+    chroma_db_path: str = "./chroma_db",
+    persist_directory: str = "./faiss_indexes",
+    faiss_index_spec: Optional[FaissIndexSpec] = None,
+    quantization: Quantization = Quantization.NONE,
+    snapshot_path: Optional[str] = None,
+    sync_manifest_path: Optional[str] = None,
+    streaming: bool = False,
+    deduplicate: bool = True,
+    near_duplicate_threshold: Optional[float] = None,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    embedding_model_name: str = "text-embedding-ada-002",
+    use_embedding_cache: bool = True,
+    aws_access_key_id: str = None,
+    aws_secret_access_key: str = None,
+    aws_session_token: str = None,
+    region_name: str = None,
+    file_extension: Union[str, List[str]] = ".txt",
+    # Additional parameters for specific loaders
+    encoding: str = "utf-8",
+    show_progress: bool = True,
+    use_multithreading: bool = True,
+    glob_pattern: str = "**/*.txt",
+    silent: bool = True,
+    pdf_workers: Optional[int] = None,
+    endpoint_url: Optional[str] = None,
+    use_ssl: Optional[bool] = True,
+    verify: Union[str, bool, None] = None,
+    api_version: Optional[str] = None,
+    boto_config: Optional[Any] = None,
+    mode: str = "single",
+    post_processors: Optional[List[Callable]] = None,
+    **unstructured_kwargs
+):
+    """
+    Load documents from a data source and index them into a vectorstore.
+    
+    Args:
+        source_type: Type of source data (PDF, TEXT_DIRECTORY, S3_FILE, etc.)
+        source_path: Path to the source (for local files/directories)
+        bucket_name: S3 bucket name (for S3 sources)
+        file_key: S3 file key (for single S3 file)
+        prefix: S3 prefix/directory (for S3 directory)
+        index_name: Name of the index (for Pinecone)
+        namespace: Namespace for Pinecone
+        collection_name: Collection name for Chroma
+        vectorstore_type: Type of vectorstore to use
+        persist_directory: Path to store vectorstore files (for FAISS)
+        faiss_index_spec: Kind of FAISS index to build (Flat, IVF-Flat, IVF-PQ or HNSW) and its
+            nprobe/efSearch; exact flat search by default (see rag.vectorstores.faiss_index)
+        quantization: Search through int8 or binary codes of the vectors and re-rank the
+            candidates with the full vectors (for NUMPY, FAISS and snapshots)
+        snapshot_path: Memory-mapped snapshot directory shared across processes (for IN_MEMORY/NUMPY).
+            When the snapshot already exists, documents are not loaded at all
+        sync_manifest_path: ETag manifest for incremental S3_DIRECTORY indexing into a persistent
+            vectorstore (Chroma, Pinecone, FAISS). Only new and changed objects are downloaded and
+            embedded, and chunks of removed objects are deleted from the vectorstore. Other
+            vectorstore types raise ValueError. With force_reload, every object is re-indexed
+        streaming: Load, split, embed and write documents as a pipeline of bounded stages
+            (see rag.pipeline) instead of materializing every split first, so memory stays
+            flat however large the source is
+        deduplicate: Drop duplicate chunks (see rag.dedup) before embedding them.
+            Not applied to incremental S3 syncs, which track the chunks of every object
+        near_duplicate_threshold: Minimum estimated Jaccard similarity (0-1) of two chunks'
+            word shingles for the later one to be dropped (e.g. 0.9); None (default) only
+            drops exact duplicates
+        chroma_db_path: Path to store Chroma database files (default: ./chroma_db)
+        force_reload: Whether to force reload the index with new documents
+        chunk_size: Size of each text chunk
+        chunk_overlap: Overlap between chunks
+        embedding_model_name: OpenAI embedding model used to index the documents
+        use_embedding_cache: Whether to reuse previously computed embeddings from the on-disk cache
+        aws_access_key_id: AWS access key ID (for S3 sources)
+        aws_secret_access_key: AWS secret access key (for S3 sources)
+        aws_session_token: AWS session token (for S3 sources)
+        region_name: AWS region name (for S3 sources)
+        file_extension: File extension filter (for directory sources)
+        
+        # Additional parameters for specific loaders
+        encoding: Text encoding for text files
+        show_progress: Whether to show progress bar
+        use_multithreading: Whether to use multithreading for loading
+        glob_pattern: Pattern to match files
+        silent: Whether to suppress stderr output for PDF loading
+        pdf_workers: Number of processes extracting PDF page ranges in parallel (None extracts serially)
+        endpoint_url: Custom endpoint URL for S3
+        use_ssl: Whether to use SSL for S3
+        verify: Whether to verify SSL certificates for S3
+        api_version: AWS API version for S3
+        boto_config: Advanced boto3 client configuration for S3
+        mode: Mode in which to read the file (for S3 file loader)
+        post_processors: Post processing functions (for S3 file loader)
+        **unstructured_kwargs: Additional kwargs for unstructured library
+        
+    Returns:
+        A vectorstore instance
+    """
+    # Every argument by name (unstructured_kwargs as a dict), as acreate_vectorstore binds them
+    build = _VectorstoreBuild(dict(locals()))
+    splits = build.load()
+
+    try:
+        # Create vector store
+        vectorstore = get_vectorstore(**build.vectorstore_kwargs(splits))
+        build.purge(vectorstore)
+    except Exception as e:
+        raise Exception(f"Error creating vectorstore: {str(e)}")
+
+    build.report(vectorstore)
+    return vectorstore
+
+async def acreate_vectorstore(*args, **kwargs):
+    """
+    Async variant of create_vectorstore, taking the same arguments.
+    
+    Document loading has no async API (boto3, unstructured, pypdf) and runs on
+    the default thread pool, as does deleting stale chunks after an S3 sync.
+    Embedding into the in-memory store uses the async embeddings API; other
+    vectorstore types are built on the thread pool.
+    
+    Returns:
+        A vectorstore instance
+    """
+    arguments = inspect.signature(create_vectorstore).bind(*args, **kwargs)
+    arguments.apply_defaults()
+    build = _VectorstoreBuild(arguments.arguments)
+    splits = await asyncio.to_thread(build.load)
+
+    try:
+        # Create vector store
+        vectorstore = await aget_vectorstore(**build.vectorstore_kwargs(splits))
+        await asyncio.to_thread(build.purge, vectorstore)
+    except Exception as e:
+        raise Exception(f"Error creating vectorstore: {str(e)}")
+
+    build.report(vectorstore)
+    return vectorstore
+
+def create_retriever(
+    vectorstore: Any,
+    vectorstore_type: VectorStoreType = VectorStoreType.IN_MEMORY,
+    similarity_threshold: float = 0.7,
+    max_documents: int = 6,
+    retrieval_mode: RetrievalMode = RetrievalMode.DENSE,
+    pack_context: bool = True,
+    max_context_tokens: Optional[int] = DEFAULT_MAX_CONTEXT_TOKENS
+):
+    """
+    Create a retriever with vectorstore-specific search configuration.
+    
+    Args:
+        vectorstore: Vectorstore instance to retrieve from
+        vectorstore_type: Type of the vectorstore
+        similarity_threshold: Minimum similarity score (0-1) for retrieved documents
+        max_documents: Maximum number of documents to retrieve
+        retrieval_mode: DENSE for vector search only, or HYBRID to fuse it with BM25 keyword
+            search over the stored chunks (not available for Pinecone)
+        pack_context: Merge overlapping chunks of the same source and drop duplicates
+            (see rag.retrievers.packing) before they reach the prompt
+        max_context_tokens: Token budget of the packed documents, filled in retrieval
+            order (None for no limit)
+        
+    Returns:
+        A retriever instance
+    """
+    if pack_context:
+        return PackedRetriever(
+            retriever=create_retriever(
+                vectorstore=vectorstore,
+                vectorstore_type=vectorstore_type,
+                similarity_threshold=similarity_threshold,
+                max_documents=max_documents,
+                retrieval_mode=retrieval_mode,
+                pack_context=False
+            ),
+            max_tokens=max_context_tokens
+        )
+    
+    if RetrievalMode(retrieval_mode) == RetrievalMode.HYBRID:
+        # Each side proposes twice the final count; fusion keeps max_documents
+        return HybridRetriever(
+            dense_retriever=create_retriever(
+                vectorstore=vectorstore,
+                vectorstore_type=vectorstore_type,
+                similarity_threshold=similarity_threshold,
+                max_documents=max_documents * 2,
+                pack_context=False
+            ),
+            keyword_index=get_keyword_index(vectorstore),
+            k=max_documents,
+            keyword_k=max_documents * 2
+        )
+    
+    # Create retriever with vectorstore-specific configurations
+    if vectorstore_type == VectorStoreType.CHROMA:
+        retriever = vectorstore.as_retriever(
+            search_type="mmr",  # Use MMR for Chroma to ensure diversity
+            search_kwargs={
+                "k": max_documents,
+                "fetch_k": max_documents * 3,  # Fetch more candidates for MMR
+                "lambda_mult": 0.7  # Diversity vs relevance trade-off
+            }
+        )
+    elif vectorstore_type == VectorStoreType.PINECONE:
+        retriever = vectorstore.as_retriever(
+            search_type="similarity",
+            search_kwargs={
+                "k": max_documents,
+                "score_threshold": similarity_threshold
+            }
+        )
+    elif vectorstore_type == VectorStoreType.FAISS:
+        retriever = vectorstore.as_retriever(
+            search_type="mmr",
+            search_kwargs={
+                "k": max_documents,
+                "fetch_k": max_documents * 3,
+                "lambda_mult": 0.7,
+                "score_threshold": similarity_threshold
+            }
+        )
+    else:  # IN_MEMORY and others
+        retriever = vectorstore.as_retriever(
+            search_type="similarity",
+            search_kwargs={
+                "k": max_documents
+            }
+        )
+    
+    return retriever
+
+def create_answer_chain(
+    model_name: str = "gpt-4",
+    temperature: float = 0.4
+):
+    """
+    Create the chain that answers a question from already retrieved documents.
+    
+    It expects {"input": question, "context": List[Document]} and produces the
+    answer text, so it can be streamed token by token with astream().
+    
+    Args:
+        model_name: Name of the LLM model to use
+        temperature: Temperature setting for the LLM
         
-        # Define prompt template
-        prompt = get_qa_prompt()
+    Returns:
+        A stuff-documents chain
+    """
+    # Define prompt template
+    prompt = get_qa_prompt()
 
-        # Create the chain
-        llm = get_openai_chat_model(model_name=model_name, temperature=temperature)
-        question_answer_chain = create_stuff_documents_chain(llm, prompt)
-        return create_retrieval_chain(retriever, question_answer_chain)
+    # Create the chain
+    llm = get_openai_chat_model(model_name=model_name, temperature=temperature)
+    return create_stuff_documents_chain(llm, prompt)
+
+def create_chain_from_vectorstore(
+    vectorstore: Any,
+    vectorstore_type: VectorStoreType = VectorStoreType.IN_MEMORY,
+    model_name: str = "gpt-4",
+    temperature: float = 0.4,
+    similarity_threshold: float = 0.7,
+    max_documents: int = 6,
+    retrieval_mode: RetrievalMode = RetrievalMode.DENSE,
+    pack_context: bool = True,
+    max_context_tokens: Optional[int] = DEFAULT_MAX_CONTEXT_TOKENS
+):
+    """
+    Create a RAG chain on top of an already populated vectorstore.
+    
+    Building the chain is cheap compared to loading and embedding documents,
+    so callers that keep vectorstores around (e.g. the API cache) can create
+    a fresh chain per request.
+    
+    Args:
+        vectorstore: Vectorstore instance to retrieve from
+        vectorstore_type: Type of the vectorstore
+        model_name: Name of the LLM model to use
+        temperature: Temperature setting for the LLM
+        similarity_threshold: Minimum similarity score (0-1) for retrieved documents
+        max_documents: Maximum number of documents to retrieve
+        retrieval_mode: Dense or hybrid (dense + BM25) retrieval (see create_retriever)
+        pack_context: Merge overlapping and duplicate chunks before prompting (see create_retriever)
+        max_context_tokens: Token budget of the packed context (see create_retriever)
+        
+    Returns:
+        A retrieval chain
+    """
+    try:
+        retriever = create_retriever(
+            vectorstore=vectorstore,
+            vectorstore_type=vectorstore_type,
+            similarity_threshold=similarity_threshold,
+            max_documents=max_documents,
+            retrieval_mode=retrieval_mode,
+            pack_context=pack_context,
+            max_context_tokens=max_context_tokens
+        )
+        
+        question_answer_chain = create_answer_chain(model_name=model_name, temperature=temperature)
+        # Retrieval and generation runs are recorded as spans of the current trace, if any
+        return create_retrieval_chain(retriever, question_answer_chain).with_config(
+            callbacks=[SpanCallbackHandler()]
+        )
     except Exception as e:
-        raise Exception(f"Error creating RAG chain: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Error creating RAG chain: {str(e)}")
+
+@traced("rag.create_chain")
+def create_chain(
+    source_type: SourceType = None,
+    source_path: str = None,
+    bucket_name: str = None, 
+    file_key: str = None, 
+    prefix: str = None,
+    index_name: str = "langchain-doc-embeddings",
+    namespace: str = None,
+    collection_name: str = None,
+    vectorstore_type: VectorStoreType = VectorStoreType.IN_MEMORY,
+    force_reload: bool = False,
+    chroma_db_path: str = "./chroma_db",
+    persist_directory: str = "./faiss_indexes",
+    faiss_index_spec: Optional[FaissIndexSpec] = None,
+    quantization: Quantization = Quantization.NONE,
+    sync_manifest_path: Optional[str] = None,
+    streaming: bool = False,
+    deduplicate: bool = True,
+    near_duplicate_threshold: Optional[float] = None,
+    model_name: str = "gpt-4",
+    temperature: float = 0.4,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    embedding_model_name: str = "text-embedding-ada-002",
+    use_embedding_cache: bool = True,
+    similarity_threshold: float = 0.7,
+    max_documents: int = 6,
+    retrieval_mode: RetrievalMode = RetrievalMode.DENSE,
+    pack_context: bool = True,
+    max_context_tokens: Optional[int] = DEFAULT_MAX_CONTEXT_TOKENS,
+    aws_access_key_id: str = None,
+    aws_secret_access_key: str = None,
+    aws_session_token: str = None,
+    region_name: str = None,
+    file_extension: Union[str, List[str]] = ".txt",
+    # Additional parameters for specific loaders
+    encoding: str = "utf-8",
+    show_progress: bool = True,
+    use_multithreading: bool = True,
+    glob_pattern: str = "**/*.txt",
+    silent: bool = True,
+    pdf_workers: Optional[int] = None,
+    endpoint_url: Optional[str] = None,
+    use_ssl: Optional[bool] = True,
+    verify: Union[str, bool, None] = None,
+    api_version: Optional[str] = None,
+    boto_config: Optional[Any] = None,
+    mode: str = "single",
+    post_processors: Optional[List[Callable]] = None,
+    **unstructured_kwargs
+):
+    """
+    Create a RAG chain that can process various types of data sources.
+    
+    Args:
+        source_type: Type of source data (PDF, TEXT_DIRECTORY, S3_FILE, etc.)
+        source_path: Path to the source (for local files/directories)
+        bucket_name: S3 bucket name (for S3 sources)
+        file_key: S3 file key (for single S3 file)
+        prefix: S3 prefix/directory (for S3 directory)
+        index_name: Name of the index (for Pinecone)
+        namespace: Namespace for Pinecone
+        collection_name: Collection name for Chroma
+        vectorstore_type: Type of vectorstore to use
+        persist_directory: Path to store vectorstore files (for FAISS)
+        faiss_index_spec: Kind of FAISS index and its search parameters (see create_vectorstore)
+        quantization: Quantized vector search with re-ranking (see create_vectorstore)
+        chroma_db_path: Path to store Chroma database files (default: ./chroma_db)
+        force_reload: Whether to force reload the index with new documents
+        sync_manifest_path: ETag manifest for incremental S3_DIRECTORY indexing (see create_vectorstore)
+        streaming: Ingest through the bounded streaming pipeline (see create_vectorstore)
+        deduplicate: Drop duplicate chunks before embedding them (see create_vectorstore)
+        near_duplicate_threshold: Similarity above which chunks count as near duplicates (see create_vectorstore)
+        model_name: Name of the LLM model to use
+        temperature: Temperature setting for the LLM
+        chunk_size: Size of each text chunk
+        chunk_overlap: Overlap between chunks
+        embedding_model_name: OpenAI embedding model used to index the documents
+        use_embedding_cache: Whether to reuse previously computed embeddings from the on-disk cache
+        similarity_threshold: Minimum similarity score (0-1) for retrieved documents
+        max_documents: Maximum number of documents to retrieve
+        retrieval_mode: Dense or hybrid (dense + BM25) retrieval (see create_retriever)
+        pack_context: Merge overlapping and duplicate chunks before prompting (see create_retriever)
+        max_context_tokens: Token budget of the packed context (see create_retriever)
+        aws_access_key_id: AWS access key ID (for S3 sources)
+        aws_secret_access_key: AWS secret access key (for S3 sources)
+        aws_session_token: AWS session token (for S3 sources)
+        region_name: AWS region name (for S3 sources)
+        file_extension: File extension filter (for directory sources)
+        
+        # Additional parameters for specific loaders
+        encoding: Text encoding for text files
+        show_progress: Whether to show progress bar
+        use_multithreading: Whether to use multithreading for loading
+        glob_pattern: Pattern to match files
+        silent: Whether to suppress stderr output for PDF loading
+        pdf_workers: Number of processes extracting PDF page ranges in parallel (None extracts serially)
+        endpoint_url: Custom endpoint URL for S3
+        use_ssl: Whether to use SSL for S3
+        verify: Whether to verify SSL certificates for S3
+        api_version: AWS API version for S3
+        boto_config: Advanced boto3 client configuration for S3
+        mode: Mode in which to read the file (for S3 file loader)
+        post_processors: Post processing functions (for S3 file loader)
+        **unstructured_kwargs: Additional kwargs for unstructured library
+        
+    Returns:
+        A retrieval chain
+    """
+    vectorstore = create_vectorstore(
+        source_type=source_type,
+        source_path=source_path,
+        bucket_name=bucket_name,
+        file_key=file_key,
+        prefix=prefix,
+        index_name=index_name,
+        namespace=namespace,
+        collection_name=collection_name,
+        vectorstore_type=vectorstore_type,
+        force_reload=force_reload,
+        chroma_db_path=chroma_db_path,
+        persist_directory=persist_directory,
+        faiss_index_spec=faiss_index_spec,
+        quantization=quantization,
+        sync_manifest_path=sync_manifest_path,
+        streaming=streaming,
+        deduplicate=deduplicate,
+        near_duplicate_threshold=near_duplicate_threshold,
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        embedding_model_name=embedding_model_name,
+        use_embedding_cache=use_embedding_cache,
+        aws_access_key_id=aws_access_key_id,
+        aws_secret_access_key=aws_secret_access_key,
+        aws_session_token=aws_session_token,
+        region_name=region_name,
+        file_extension=file_extension,
+        encoding=encoding,
+        show_progress=show_progress,
+        use_multithreading=use_multithreading,
+        glob_pattern=glob_pattern,
+        silent=silent,
+        pdf_workers=pdf_workers,
+        endpoint_url=endpoint_url,
+        use_ssl=use_ssl,
+        verify=verify,
+        api_version=api_version,
+        boto_config=boto_config,
+        mode=mode,
+        post_processors=post_processors,
+        **unstructured_kwargs
+    )
+    
+    return create_chain_from_vectorstore(
+        vectorstore=vectorstore,
+        vectorstore_type=vectorstore_type,
+        model_name=model_name,
+        temperature=temperature,
+        similarity_threshold=similarity_threshold,
+        max_documents=max_documents,
+        retrieval_mode=retrieval_mode,
+        pack_context=pack_context,
+        max_context_tokens=max_context_tokens
+    )
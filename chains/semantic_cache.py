@@ -0,0 +1,222 @@
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.runnables import RunnableLambda
+
+from utils.metrics import cache_lookup
+
+
+@dataclass
+class CachedAnswer:
+    query: str
+    answer: str
+    context: List[Document]
+    context_ids: List[Optional[str]]
+    corpus_version: str
+    created_at: float = field(default_factory=time.time)
+
+
+class SemanticAnswerCache:
+    """
+    Cache of RAG answers looked up by query embedding similarity.
+
+    Query vectors are kept L2-normalized in one float32 matrix, so a lookup is a
+    single matrix-vector product. An entry is only served for the corpus version
+    it was answered against, until its TTL expires. When full, the least recently
+    used entry is replaced.
+    """
+
+    def __init__(
+        self,
+        similarity_threshold: float = 0.95,
+        ttl_seconds: float = 3600,
+        max_entries: int = 1000
+    ):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # allocated on first store
+        self._entries: List[Optional[CachedAnswer]] = [None] * max_entries
+        self._valid = np.zeros(max_entries, dtype=bool)
+        self._expires_at = np.zeros(max_entries, dtype=np.float64)
+        self._last_access = np.zeros(max_entries, dtype=np.float64)
+        self._version_ids = np.full(max_entries, -1, dtype=np.int64)
+        # Ids of the corpus versions valid entries were answered against
+        self._versions: Dict[str, int] = {}
+        self._next_version_id = itertools.count()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def lookup(self, query_vector: List[float], corpus_version: str) -> Optional[CachedAnswer]:
+        """Return the most similar cached answer above the threshold, if any."""
+        hit = self._lookup(query_vector, corpus_version)
+        cache_lookup("semantic_answer", hit is not None)
+        return hit
+
+    def _lookup(self, query_vector: List[float], corpus_version: str) -> Optional[CachedAnswer]:
+        query = self._normalize(query_vector)
+        now = time.time()
+
+        with self._lock:
+            version_id = self._versions.get(corpus_version)
+            if self._vectors is None or version_id is None or query.shape[0] != self._vectors.shape[1]:
+                self.misses += 1
+                return None
+
+            expired = self._valid & (self._expires_at <= now)
+            if expired.any():
+                self._drop(expired)
+                self.expirations += int(expired.sum())
+
+            candidates = self._valid & (self._version_ids == version_id)
+            if not candidates.any():
+                self.misses += 1
+                return None
+
+            scores = self._vectors @ query
+            scores[~candidates] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            self._last_access[best] = now
+            self.hits += 1
+            return self._entries[best]
+
+    def store(
+        self,
+        query: str,
+        query_vector: List[float],
+        answer: str,
+        context: List[Document],
+        corpus_version: str
+    ) -> None:
+        """Add an answer, replacing an expired or least recently used entry."""
+        vector = self._normalize(query_vector)
+        now = time.time()
+
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                # First entry (or a different embedding model): start over
+                self._vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+                self._drop(self._valid.copy())
+
+            free = np.flatnonzero(~self._valid)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_access))
+                self.evictions += 1
+                self._drop(np.arange(self.max_entries) == slot)
+
+            self._vectors[slot] = vector
+            self._entries[slot] = CachedAnswer(
+                query=query,
+                answer=answer,
+                context=list(context),
+                context_ids=[doc.metadata.get("doc_id") for doc in context],
+                corpus_version=corpus_version
+            )
+            self._valid[slot] = True
+            self._expires_at[slot] = now + self.ttl_seconds
+            self._last_access[slot] = now
+            version_id = self._versions.get(corpus_version)
+            if version_id is None:
+                version_id = self._versions[corpus_version] = next(self._next_version_id)
+            self._version_ids[slot] = version_id
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._drop(self._valid.copy())
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit-rate and size counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": int(self._valid.sum()),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations
+            }
+
+    def _drop(self, mask: np.ndarray) -> None:
+        self._valid[mask] = False
+        self._version_ids[mask] = -1
+        for slot in np.flatnonzero(mask):
+            self._entries[slot] = None
+        # Forget versions no entry refers to anymore, e.g. listings since re-uploaded
+        live = set(self._version_ids[self._valid].tolist())
+        if len(live) < len(self._versions):
+            self._versions = {version: i for version, i in self._versions.items() if i in live}
+
+    @staticmethod
+    def _normalize(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+
+def with_semantic_cache(
+    chain: Any,
+    cache: SemanticAnswerCache,
+    embedding_model: Any,
+    corpus_version: str
+):
+    """
+    Wrap a retrieval chain so near-identical questions are answered from cache.
+
+    The wrapped chain takes and returns the same dicts as create_retrieval_chain
+    ({"input"} -> {"input", "context", "answer"}); cached responses also carry
+    "cached": True.
+
+    Args:
+        chain: Retrieval chain to wrap
+        cache: Semantic answer cache to read from and write to
+        embedding_model: Embedding model used to embed the question
+        corpus_version: Identifier of the indexed corpus; answers are only reused within a version
+
+    Returns:
+        A runnable supporting invoke and ainvoke
+    """
+    def cached_response(query: str, hit: CachedAnswer) -> Dict[str, Any]:
+        return {"input": query, "context": hit.context, "answer": hit.answer, "cached": True}
+
+    def invoke(inputs: Dict[str, Any]) -> Dict[str, Any]:
+        query = inputs["input"]
+        vector = embedding_model.embed_query(query)
+        hit = cache.lookup(vector, corpus_version)
+        if hit is not None:
+            return cached_response(query, hit)
+
+        response = chain.invoke(inputs)
+        cache.store(query, vector, response["answer"], response.get("context", []), corpus_version)
+        return response
+
+    async def ainvoke(inputs: Dict[str, Any]) -> Dict[str, Any]:
+        query = inputs["input"]
+        vector = await embedding_model.aembed_query(query)
+        hit = cache.lookup(vector, corpus_version)
+        if hit is not None:
+            return cached_response(query, hit)
+
+        response = await chain.ainvoke(inputs)
+        cache.store(query, vector, response["answer"], response.get("context", []), corpus_version)
+        return response
+
+    return RunnableLambda(invoke, afunc=ainvoke, name="semantic_cache")
@@ -8,7 +8,8 @@ import sys
 from botocore.exceptions import NoCredentialsError, ClientError
 
 from rag.loaders import SourceType
-from rag.vectorstores import VectorStoreType
+from rag.vectorstores import VectorStoreType, FaissIndexSpec, Quantization
+from rag.retrievers import DEFAULT_MAX_CONTEXT_TOKENS, RetrievalMode
 from chains.rag_chain import create_chain
 
 def main():
@@ -42,6 +43,31 @@ def main():
                        help="Collection name for Chroma vectorstore")
     parser.add_argument("--persist_directory", type=str, default="./faiss_indexes",
                         help="Directory to persist vector stores (for FAISS and Chroma)")
+    parser.add_argument("--sync_manifest", type=str,
+                        help="ETag manifest for incremental indexing of an S3 directory into a persistent vector store")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Load, split and embed documents as a bounded streaming pipeline to keep memory flat")
+    parser.add_argument("--pdf_workers", type=int,
+                        help="Processes extracting PDF page ranges in parallel (for PDF files, PDF directories and S3 PDFs)")
+    parser.add_argument("--no_dedup", action="store_true",
+                        help="Embed every chunk, including exact and near-duplicate ones")
+    parser.add_argument("--near_duplicate_threshold", type=float,
+                        help="Also drop near-duplicate chunks whose shingle similarity (0-1) is above this, e.g. 0.9 (default: exact duplicates only)")
+    parser.add_argument("--retrieval_mode", type=str, choices=[m.value for m in RetrievalMode],
+                        default=RetrievalMode.DENSE.value,
+                        help="dense: vector search only; hybrid: fuse it with BM25 keyword search (not for Pinecone)")
+    parser.add_argument("--no_context_packing", action="store_true",
+                        help="Send the retrieved chunks as they are instead of merging overlapping neighbours and dropping duplicates")
+    parser.add_argument("--max_context_tokens", type=int, default=DEFAULT_MAX_CONTEXT_TOKENS,
+                        help=f"Token budget of the packed context, filled in retrieval order (default: {DEFAULT_MAX_CONTEXT_TOKENS})")
+    parser.add_argument("--faiss_index", type=str, default="Flat",
+                        help="FAISS index factory string: Flat, IVF<nlist>,Flat, IVF<nlist>,PQ<m> or HNSW<M> (nlist may be omitted) (default: Flat)")
+    parser.add_argument("--faiss_nprobe", type=int, default=16,
+                        help="Inverted lists searched per query (for IVF FAISS indexes, default: 16)")
+    parser.add_argument("--faiss_ef_search", type=int, default=64,
+                        help="Candidate list size of graph searches (for HNSW FAISS indexes, default: 64)")
+    parser.add_argument("--quantization", type=str, choices=[q.value for q in Quantization], default=Quantization.NONE.value,
+                        help="Search int8 or binary vector codes and re-rank with the full vectors (numpy, faiss or snapshot stores)")
     
     # Parse arguments
     args = parser.parse_args()
@@ -101,6 +127,19 @@ def main():
             "namespace": args.namespace,
             "collection_name": args.collection,
             "persist_directory": args.persist_directory,
+            "streaming": args.streaming,
+            "pdf_workers": args.pdf_workers,
+            "deduplicate": not args.no_dedup,
+            "near_duplicate_threshold": args.near_duplicate_threshold,
+            "retrieval_mode": RetrievalMode(args.retrieval_mode),
+            "pack_context": not args.no_context_packing,
+            "max_context_tokens": args.max_context_tokens,
+            "faiss_index_spec": FaissIndexSpec(
+                factory=args.faiss_index,
+                nprobe=args.faiss_nprobe,
+                ef_search=args.faiss_ef_search
+            ),
+            "quantization": Quantization(args.quantization),
         }
         
         # Add source-specific parameters
@@ -128,6 +167,7 @@ def main():
                 "bucket_name": args.bucket,
                 "prefix": args.prefix,
                 "file_extension": file_extensions,
+                "sync_manifest_path": args.sync_manifest,
                 "aws_access_key_id": aws_access_key_id,
                 "aws_secret_access_key": aws_secret_access_key,
                 "region_name": region_name
@@ -45,7 +45,44 @@ class Settings(BaseSettings):
 
     # API URL
     API_URL: str
-    
+
+    # RAG Cache Configuration
+    RAG_CACHE_ENABLED: bool = True
+    RAG_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    # In-process vectorstore built per S3 prefix: "in_memory" or "numpy" (NumpyVectorStore)
+    RAG_VECTORSTORE_TYPE: str = "in_memory"
+    # Memory-mapped vector snapshots shared by all uvicorn workers (opt-in): set to a
+    # directory, e.g. ./vector_snapshots, to embed each corpus once per host and keep
+    # the RAG_SNAPSHOT_KEEP most recent ones there
+    RAG_SNAPSHOT_DIR: str = ""
+    RAG_SNAPSHOT_KEEP: int = 16
+    # Vector codes searched before re-ranking with the full vectors: "none", "int8" or "binary"
+    RAG_VECTOR_QUANTIZATION: str = "none"
+
+    # Semantic answer cache (can be toggled per request with options.semantic_cache)
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_TTL_SECONDS: int = 3600
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
+
+    # Threads for blocking calls without an async API (boto3, parsing)
+    BLOCKING_IO_WORKERS: int = 16
+
+    # OTLP/HTTP traces endpoint of an OpenTelemetry collector, e.g.
+    # http://localhost:4318/v1/traces (empty to only report breakdowns in responses)
+    OTLP_TRACES_ENDPOINT: str = ""
+    OTLP_SERVICE_NAME: str = "llm-toolchain-api"
+
+    # Sampling profiler (opt-in): profiles a fraction of requests, and requests
+    # sending PROFILING_HEADER, into PROFILING_DIR (see /api/v1/profiles)
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.01
+    PROFILING_HEADER: str = "X-Profile"
+    PROFILING_INTERVAL_MS: float = 10
+    PROFILING_MAX_CONCURRENT: int = 4
+    PROFILING_DIR: str = "./profiles"
+    PROFILING_KEEP: int = 200
+
     @property
     def aws_region(self) -> str:
         # Strip any quotes from the region
@@ -0,0 +1,112 @@
+"""
+Benchmark FAISS index kinds (see rag.vectorstores.faiss_index) against exact flat search.
+
+Builds each index spec over synthetic clustered, L2-normalized vectors (a
+stand-in for text embeddings) at several corpus sizes, and reports build time,
+recall@k against the flat index and single-query p50/p99 latency.
+
+Usage:
+    python experiments/scripts/benchmark_faiss_index.py --sizes 10000,50000,100000
+    python experiments/scripts/benchmark_faiss_index.py --specs "IVF,Flat" "HNSW32" --nprobe 4 16 64
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from rag.vectorstores.faiss_index import FaissIndexSpec, build_index
+
+
+def make_vectors(count: int, dimension: int, centers: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    assignment = rng.integers(0, len(centers), count)
+    vectors = centers[assignment] + 1.5 * rng.standard_normal((count, dimension)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def query_latencies(index, queries: np.ndarray, k: int):
+    latencies = []
+    results = np.empty((len(queries), k), dtype=np.int64)
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        _, ids = index.search(queries[i:i + 1], k)
+        latencies.append(time.perf_counter() - start)
+        results[i] = ids[0]
+    return np.array(latencies) * 1000, results
+
+
+def recall_at_k(results: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(r) & set(t)) / k for r, t in zip(results, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark FAISS ANN index kinds against flat search")
+    parser.add_argument("--sizes", default="10000,50000,100000", help="Comma-separated corpus sizes (default: 10000,50000,100000)")
+    parser.add_argument("--dimension", type=int, default=256, help="Vector dimension (default: 256)")
+    parser.add_argument("--specs", nargs="+", default=["IVF,Flat", "IVF,PQ32", "HNSW32"],
+                        help="Index factory strings to compare with Flat (default: IVF,Flat IVF,PQ32 HNSW32)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 32], help="nprobe values for IVF indexes (default: 8 32)")
+    parser.add_argument("--ef_search", type=int, nargs="+", default=[32, 128], help="efSearch values for HNSW indexes (default: 32 128)")
+    parser.add_argument("--queries", type=int, default=500, help="Number of queries (default: 500)")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query (default: 10)")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads (default: 1)")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((256, args.dimension)).astype(np.float32)
+    queries = make_vectors(args.queries, args.dimension, centers, rng)
+
+    print(f"Dimension {args.dimension}, {args.queries} queries, recall@{args.k} vs. Flat, {args.threads} thread(s)\n")
+    print(f"{'Vectors':>8} {'Index':<16} {'Param':<12} {'Build (s)':>9} {'Recall':>7} {'p50 ms':>7} {'p99 ms':>7} {'Speedup':>8}")
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        vectors = make_vectors(size, args.dimension, centers, rng)
+
+        start = time.perf_counter()
+        flat = build_index(FaissIndexSpec("Flat"), vectors, faiss.METRIC_L2)
+        build_time = time.perf_counter() - start
+        latencies, truth = query_latencies(flat, queries, args.k)
+        flat_p50 = np.percentile(latencies, 50)
+        print(f"{size:>8} {'Flat':<16} {'-':<12} {build_time:>9.2f} {1.0:>7.3f} "
+              f"{flat_p50:>7.3f} {np.percentile(latencies, 99):>7.3f} {1.0:>7.1f}x")
+        del flat
+
+        for factory in args.specs:
+            spec = FaissIndexSpec(factory)
+            if size < spec.min_training_vectors():
+                print(f"{size:>8} {factory:<16} skipped: needs {spec.min_training_vectors()} vectors to train")
+                continue
+            start = time.perf_counter()
+            index = build_index(spec, vectors, faiss.METRIC_L2)
+            build_time = time.perf_counter() - start
+
+            ivf = faiss.try_extract_index_ivf(index)
+            hnsw = getattr(faiss.downcast_index(index), "hnsw", None)
+            if ivf is not None:
+                settings = [(f"nprobe={n}", lambda n=n: setattr(ivf, "nprobe", n)) for n in args.nprobe]
+            elif hnsw is not None:
+                settings = [(f"efSearch={ef}", lambda ef=ef: setattr(hnsw, "efSearch", ef)) for ef in args.ef_search]
+            else:
+                settings = [("-", lambda: None)]
+
+            name = f"IVF{ivf.nlist}," + factory.split(",", 1)[1] if ivf is not None else factory
+            for label, apply in settings:
+                apply()
+                latencies, results = query_latencies(index, queries, args.k)
+                p50 = np.percentile(latencies, 50)
+                print(f"{size:>8} {name:<16} {label:<12} {build_time:>9.2f} {recall_at_k(results, truth):>7.3f} "
+                      f"{p50:>7.3f} {np.percentile(latencies, 99):>7.3f} {flat_p50 / p50:>7.1f}x")
+            del index
+        print()
+
+
+if __name__ == "__main__":
+    main()
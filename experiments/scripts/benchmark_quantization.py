@@ -0,0 +1,129 @@
+"""
+Benchmark quantized vector search (see rag.vectorstores.quantization) against exact search.
+
+Builds a memory-mapped snapshot (MmapVectorStore) and FAISS indexes over
+synthetic clustered, L2-normalized vectors (a stand-in for text embeddings),
+and reports recall@k against exact search, single-query p50/p99 latency, and
+the bytes every query scans (the codes, or the full vectors without
+quantization) next to the full vectors that stay on disk.
+
+Usage:
+    python experiments/scripts/benchmark_quantization.py --size 100000 --dimension 384
+    python experiments/scripts/benchmark_quantization.py --rerank_factors 4 10 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from rag.vectorstores.faiss_index import FaissIndexSpec, build_index, index_bytes, tune_index
+from rag.vectorstores.numpy_store import NumpyVectorStore
+from rag.vectorstores.quantization import Quantization
+from rag.vectorstores.snapshot import load_or_build_snapshot
+
+
+class NoEmbeddings:
+    """Queries are passed as vectors, so the stores never embed anything."""
+
+
+def make_vectors(count: int, dimension: int, centers: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    assignment = rng.integers(0, len(centers), count)
+    vectors = centers[assignment] + 1.5 * rng.standard_normal((count, dimension)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def recall_at_k(results: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    return float(np.mean([len(set(r) & set(t)) / k for r, t in zip(results, truth)]))
+
+
+def timed(search, queries: np.ndarray, k: int):
+    latencies = []
+    results = np.empty((len(queries), k), dtype=np.int64)
+    for i in range(len(queries)):
+        start = time.perf_counter()
+        results[i] = search(queries[i:i + 1], k)
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000, results
+
+
+def report(name: str, param: str, latencies: np.ndarray, results: np.ndarray, truth: np.ndarray,
+           scanned: int, stored: int, exact_p50: float):
+    p50 = np.percentile(latencies, 50)
+    print(f"{name:<18} {param:<10} {recall_at_k(results, truth):>7.3f} {p50:>7.3f} {np.percentile(latencies, 99):>7.3f} "
+          f"{exact_p50 / p50:>7.1f}x {scanned / 1e6:>10.1f} {stored / 1e6:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark int8 and binary quantized search against exact search")
+    parser.add_argument("--size", type=int, default=100000, help="Number of vectors (default: 100000)")
+    parser.add_argument("--dimension", type=int, default=384, help="Vector dimension (default: 384)")
+    parser.add_argument("--rerank_factors", type=int, nargs="+", default=[4, 10, 20],
+                        help="Candidates re-scored per result (default: 4 10 20)")
+    parser.add_argument("--queries", type=int, default=300, help="Number of queries (default: 300)")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per query (default: 10)")
+    parser.add_argument("--threads", type=int, default=1, help="FAISS OpenMP threads (default: 1)")
+    args = parser.parse_args()
+
+    faiss.omp_set_num_threads(args.threads)
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((256, args.dimension)).astype(np.float32)
+    vectors = make_vectors(args.size, args.dimension, centers, rng)
+    queries = make_vectors(args.queries, args.dimension, centers, rng)
+    full_bytes = vectors.nbytes
+
+    store = NumpyVectorStore(NoEmbeddings())
+    store.add_embeddings(((f"chunk {i}", vector) for i, vector in enumerate(vectors)),
+                         ids=[str(i) for i in range(args.size)])
+
+    def snapshot_search(vectorstore):
+        def search(query, k):
+            hits = vectorstore.similarity_search_batch_with_score_by_vector(query, k=k)[0]
+            return [int(doc.id) for doc, _ in hits]
+        return search
+
+    print(f"{args.size} vectors, dimension {args.dimension}, {args.queries} queries, recall@{args.k} vs. exact, "
+          f"{args.threads} thread(s)\n")
+    print(f"{'Store':<18} {'Rerank':<10} {'Recall':>7} {'p50 ms':>7} {'p99 ms':>7} {'Speedup':>8} "
+          f"{'Scanned MB':>10} {'Stored MB':>10}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "snapshot")
+        exact = load_or_build_snapshot(path, NoEmbeddings(), build=lambda: store)
+        latencies, truth = timed(snapshot_search(exact), queries, args.k)
+        exact_p50 = np.percentile(latencies, 50)
+        report("snapshot", "-", latencies, truth, truth, full_bytes, full_bytes, exact_p50)
+
+        for quantization in (Quantization.INT8, Quantization.BINARY):
+            for factor in args.rerank_factors:
+                mapped = load_or_build_snapshot(path, NoEmbeddings(), build=lambda: store,
+                                                quantization=quantization, rerank_factor=factor)
+                latencies, results = timed(snapshot_search(mapped), queries, args.k)
+                code_bytes = mapped.memory_report()["code_bytes"]
+                report(f"snapshot {quantization.value}", f"x{factor}", latencies, results, truth,
+                       code_bytes, full_bytes + code_bytes, exact_p50)
+
+        for quantization in (Quantization.INT8, Quantization.BINARY):
+            spec = FaissIndexSpec(quantization=quantization)
+            index = build_index(spec, vectors, faiss.METRIC_L2)
+            sizes = index_bytes(index)
+            for factor in args.rerank_factors:
+                spec.rerank_factor = factor
+                tune_index(index, spec)
+                latencies, results = timed(lambda query, k: index.search(query, k)[1][0], queries, args.k)
+                report(f"faiss {spec.resolve(args.size)}", f"x{factor}", latencies, results, truth,
+                       sizes["code_bytes"], sizes["vector_bytes"] + sizes["code_bytes"], exact_p50)
+            del index
+
+
+if __name__ == "__main__":
+    main()
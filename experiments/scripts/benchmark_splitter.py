@@ -0,0 +1,109 @@
+"""
+Benchmark OffsetTextSplitter against RecursiveCharacterTextSplitter.
+
+Splits data/raw/*.txt and data/raw/research.pdf (repeated --repeat times to
+get measurable timings) with both splitters, checks that they produce the
+same chunks, and reports throughput and peak memory.
+
+Usage:
+    python experiments/scripts/benchmark_splitter.py --repeat 50
+"""
+import argparse
+import contextlib
+import glob
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+from langchain_community.document_loaders import PyPDFLoader, TextLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from rag.splitters import OffsetTextSplitter
+
+
+def load_corpus(data_dir: Path):
+    docs = []
+    for path in sorted(glob.glob(str(data_dir / "*.txt"))):
+        docs.extend(TextLoader(path, encoding="utf-8").load())
+    with open(os.devnull, "w") as f, contextlib.redirect_stderr(f):
+        docs.extend(PyPDFLoader(str(data_dir / "research.pdf")).load())
+    return docs
+
+
+def best_time(fn, rounds: int):
+    best, result = float("inf"), None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_memory(fn) -> int:
+    tracemalloc.start()
+    try:
+        result = fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        del result
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offset-based text splitter")
+    parser.add_argument("--data_dir", default=str(ROOT / "data" / "raw"), help="Directory with the *.txt files and research.pdf")
+    parser.add_argument("--chunk_size", type=int, default=1000, help="Chunk size (default: 1000)")
+    parser.add_argument("--chunk_overlap", type=int, default=200, help="Chunk overlap (default: 200)")
+    parser.add_argument("--repeat", type=int, default=50, help="Times the corpus is repeated (default: 50)")
+    parser.add_argument("--rounds", type=int, default=3, help="Timing rounds, best is reported (default: 3)")
+    args = parser.parse_args()
+
+    corpus = load_corpus(Path(args.data_dir))
+    docs = corpus * args.repeat
+    characters = sum(len(doc.page_content) for doc in docs)
+
+    # OffsetTextSplitter records start_index by default, so the baseline does too
+    recursive = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap, add_start_index=True
+    )
+    offset = OffsetTextSplitter(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+
+    # Same chunks and metadata, in the same order
+    expected = recursive.split_documents(corpus)
+    actual = offset.split_documents(corpus)
+    identical = len(expected) == len(actual) and all(
+        a.page_content == b.page_content and a.metadata == b.metadata for a, b in zip(expected, actual)
+    )
+    if not identical:
+        print("ERROR: OffsetTextSplitter output differs from RecursiveCharacterTextSplitter")
+        sys.exit(1)
+
+    runs = [
+        ("RecursiveCharacterTextSplitter.split_documents", lambda: recursive.split_documents(docs)),
+        ("OffsetTextSplitter.split_documents", lambda: offset.split_documents(docs)),
+        ("OffsetTextSplitter.iter_chunks (offsets only)", lambda: list(offset.iter_chunks(docs))),
+    ]
+
+    print(f"Corpus: {len(corpus)} documents x {args.repeat} = {len(docs)} documents, "
+          f"{characters / 1e6:.1f}M characters")
+    print(f"Chunking: chunk_size={args.chunk_size}, chunk_overlap={args.chunk_overlap}; output identical: {identical}\n")
+    print(f"{'Splitter':<50} {'Chunks':>8} {'Time (s)':>9} {'Chunks/s':>10} {'MB/s':>7} {'Peak MB':>8}")
+
+    baseline = None
+    for name, fn in runs:
+        elapsed, chunks = best_time(fn, args.rounds)
+        count = len(chunks)
+        del chunks
+        peak = peak_memory(fn)
+        baseline = baseline or elapsed
+        print(f"{name:<50} {count:>8} {elapsed:>9.3f} {count / elapsed:>10.0f} "
+              f"{characters / 1e6 / elapsed:>7.1f} {peak / 1e6:>8.1f}  ({baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import re
+import zlib
+from dataclasses import dataclass
+from hashlib import blake2b
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from rag.vectorstores.ingestion import count_tokens
+
+DEFAULT_NUM_PERM = 128
+DEFAULT_SHINGLE_SIZE = 5
+
+# Mersenne prime for the permutation hashes; a * hash + b stays below 2**64 for 32-bit hashes
+_PRIME = np.uint64((1 << 31) - 1)
+_WORD = re.compile(r"\w+")
+
+
+@dataclass
+class DedupStats:
+    """Counters of a deduplication run."""
+    chunks: int = 0
+    exact_duplicates: int = 0
+    near_duplicates: int = 0
+    tokens_saved: int = 0
+
+    @property
+    def dropped(self) -> int:
+        return self.exact_duplicates + self.near_duplicates
+
+    @property
+    def kept(self) -> int:
+        return self.chunks - self.dropped
+
+    def __str__(self) -> str:
+        return (
+            f"kept {self.kept} of {self.chunks} chunks, dropped {self.exact_duplicates} exact and "
+            f"{self.near_duplicates} near duplicates ({self.tokens_saved} embedding tokens saved)"
+        )
+
+
+def _lsh_bands(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Choose (bands, rows) so that the LSH S-curve rises at or just below the threshold.
+
+    Pairs above the threshold then almost always share a band; the extra
+    candidates this lets through are rejected by comparing signatures.
+    """
+    bands, rows = num_perm, 1
+    for r in range(1, num_perm + 1):
+        if num_perm % r == 0 and (1 / (num_perm // r)) ** (1 / r) <= threshold:
+            bands, rows = num_perm // r, r
+    return bands, rows
+
+
+class ChunkDeduplicator:
+    """
+    Drop exact and near-duplicate chunks before they are embedded.
+
+    Exact duplicates are detected with a hash of the whitespace-normalized
+    text. Near-duplicate detection (repeated disclaimers, boilerplate headers
+    and footers) is opt-in: it uses MinHash signatures over word shingles,
+    indexed with locality-sensitive hashing so each chunk is only compared
+    against likely matches. Numbers are kept in the shingles, so chunks that
+    differ only in part numbers, quantities or prices are not merged. The
+    first occurrence of a chunk is kept.
+
+    State is kept for every chunk seen (a hash, plus a num_perm * 4 bytes
+    signature when near-duplicate detection is on), so one instance should be
+    used per ingestion run.
+    """
+
+    def __init__(
+        self,
+        near_duplicate_threshold: Optional[float] = None,
+        num_perm: int = DEFAULT_NUM_PERM,
+        shingle_size: int = DEFAULT_SHINGLE_SIZE,
+        seed: int = 0
+    ):
+        """
+        Args:
+            near_duplicate_threshold: Minimum estimated Jaccard similarity (0-1) for a
+                chunk to be dropped as a near duplicate (e.g. 0.9); None only drops exact duplicates
+            num_perm: Number of MinHash permutations (signature length)
+            shingle_size: Number of consecutive words per shingle
+            seed: Seed of the permutation parameters
+        """
+        if near_duplicate_threshold is not None and not 0 < near_duplicate_threshold <= 1:
+            raise ValueError("near_duplicate_threshold must be in (0, 1]")
+
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.shingle_size = shingle_size
+        self.stats = DedupStats()
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, int(_PRIME), size=num_perm).astype(np.uint64)[:, None]
+        self._b = rng.randint(0, int(_PRIME), size=num_perm).astype(np.uint64)[:, None]
+        self._bands, self._rows = _lsh_bands(near_duplicate_threshold or 1.0, num_perm)
+
+        self._hashes: Set[bytes] = set()
+        self._signatures: List[np.ndarray] = []
+        self._buckets: List[Dict[int, List[int]]] = [{} for _ in range(self._bands)]
+
+    def filter(self, documents: Iterable[Document]) -> Iterator[Document]:
+        """
+        Lazily yield the documents that are not duplicates of an earlier one.
+
+        Dropped chunks are counted in self.stats, with their token count as
+        the embedding tokens saved.
+        """
+        for doc in documents:
+            self.stats.chunks += 1
+            duplicate = self.check(doc.page_content)
+            if duplicate is None:
+                yield doc
+                continue
+            if duplicate == "exact":
+                self.stats.exact_duplicates += 1
+            else:
+                self.stats.near_duplicates += 1
+            self.stats.tokens_saved += count_tokens(doc.page_content)
+
+    def deduplicate(self, documents: Iterable[Document]) -> List[Document]:
+        """Eager variant of filter()."""
+        return list(self.filter(documents))
+
+    def check(self, text: str) -> Optional[str]:
+        """
+        Record a text and tell whether it duplicates one recorded before.
+
+        Returns:
+            "exact" or "near" for duplicates (which are not recorded), None otherwise
+        """
+        digest = blake2b(" ".join(text.split()).encode("utf-8"), digest_size=16).digest()
+        if digest in self._hashes:
+            return "exact"
+
+        words = None
+        if self.near_duplicate_threshold is not None:
+            words = _WORD.findall(text.lower())
+        if words:
+            signature = self._signature(words)
+            keys = [
+                hash(signature[band * self._rows:(band + 1) * self._rows].tobytes())
+                for band in range(self._bands)
+            ]
+            if self._has_near_duplicate(signature, keys):
+                return "near"
+            row = len(self._signatures)
+            self._signatures.append(signature)
+            for bucket, key in zip(self._buckets, keys):
+                bucket.setdefault(key, []).append(row)
+
+        self._hashes.add(digest)
+        return None
+
+    def _signature(self, words: List[str]) -> np.ndarray:
+        k = min(self.shingle_size, len(words))
+        shingles = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+        return ((self._a * hashes + self._b) % _PRIME).min(axis=1).astype(np.uint32)
+
+    def _has_near_duplicate(self, signature: np.ndarray, keys: List[int]) -> bool:
+        candidates = set()
+        for bucket, key in zip(self._buckets, keys):
+            candidates.update(bucket.get(key, ()))
+        # The fraction of equal MinHash values estimates the Jaccard similarity
+        return any(
+            np.mean(self._signatures[row] == signature) >= self.near_duplicate_threshold
+            for row in candidates
+        )
@@ -2,6 +2,7 @@
 Module for embedding models used in RAG applications.
 """
 
-from rag.embeddings.openai_embeddings import get_openai_embeddings
+from rag.embeddings.openai_embeddings import get_openai_embeddings, get_embedding_dimension
+from rag.embeddings.cached_embeddings import CachedEmbeddings, SQLiteEmbeddingStore
 
-__all__ = ["get_openai_embeddings"] 
\ No newline at end of file
+__all__ = ["get_openai_embeddings", "get_embedding_dimension", "CachedEmbeddings", "SQLiteEmbeddingStore"]
@@ -0,0 +1,284 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from hashlib import sha256
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from utils.metrics import cache_lookup
+
+# SQLite limits the number of bound parameters per statement
+_SQL_BATCH_SIZE = 500
+
+
+def hash_text(text: str) -> str:
+    """Content address of a text used as the embedding cache key."""
+    return sha256(text.encode("utf-8")).hexdigest()
+
+
+class SQLiteEmbeddingStore:
+    """
+    Disk-backed store of float32 embedding vectors keyed by content hash.
+
+    Rows are keyed by (text hash, model, dimensions) so the same file can hold
+    vectors for several embedding models. The store is bounded by max_bytes and
+    evicts the least recently used vectors first.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 2 * 1024 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        # WAL lets several uvicorn workers read while one writes
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                text_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                dimensions INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                nbytes INTEGER NOT NULL,
+                last_accessed REAL NOT NULL,
+                PRIMARY KEY (text_hash, model, dimensions)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_accessed ON embeddings (last_accessed)"
+        )
+        self._conn.commit()
+        self._total_bytes = self._count_bytes()
+
+    def get_many(self, text_hashes: Sequence[str], model: str, dimensions: int) -> Dict[str, List[float]]:
+        """Bulk lookup of vectors for the given hashes. Missing hashes are omitted."""
+        found: Dict[str, List[float]] = {}
+        unique_hashes = list(dict.fromkeys(text_hashes))
+
+        with self._lock:
+            for start in range(0, len(unique_hashes), _SQL_BATCH_SIZE):
+                batch = unique_hashes[start:start + _SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                    (model, dimensions, *batch)
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_accessed = ? "
+                    "WHERE text_hash = ? AND model = ? AND dimensions = ?",
+                    [(now, text_hash, model, dimensions) for text_hash in found]
+                )
+                self._conn.commit()
+
+        return found
+
+    def put_many(self, items: Sequence[Tuple[str, List[float]]], model: str, dimensions: int) -> None:
+        """Insert or replace vectors and evict old entries if over budget."""
+        if not items:
+            return
+
+        now = time.time()
+        # The last vector of a repeated hash wins, as it would with INSERT OR REPLACE
+        rows_by_hash = {}
+        for text_hash, vector in items:
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows_by_hash[text_hash] = (text_hash, model, dimensions, blob, len(blob), now)
+        rows = list(rows_by_hash.values())
+
+        with self._lock:
+            # Replaced rows give their bytes back, e.g. when workers miss on the same texts
+            replaced_bytes = self._stored_bytes(list(rows_by_hash), model, dimensions)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings "
+                "(text_hash, model, dimensions, vector, nbytes, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+            self._total_bytes += sum(row[4] for row in rows) - replaced_bytes
+
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def size_bytes(self) -> int:
+        """Total size of stored vectors in bytes."""
+        with self._lock:
+            return self._total_bytes
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def _stored_bytes(self, text_hashes: Sequence[str], model: str, dimensions: int) -> int:
+        total = 0
+        for start in range(0, len(text_hashes), _SQL_BATCH_SIZE):
+            batch = text_hashes[start:start + _SQL_BATCH_SIZE]
+            placeholders = ",".join("?" * len(batch))
+            total += self._conn.execute(
+                f"SELECT COALESCE(SUM(nbytes), 0) FROM embeddings "
+                f"WHERE model = ? AND dimensions = ? AND text_hash IN ({placeholders})",
+                (model, dimensions, *batch)
+            ).fetchone()[0]
+        return total
+
+    def _count_bytes(self) -> int:
+        return self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+
+    def _evict(self) -> None:
+        # Other processes may have written to the same file, so re-read the total
+        self._total_bytes = self._count_bytes()
+        # Evict down to 90% of the budget so we don't evict on every insert
+        target = int(self.max_bytes * 0.9)
+        while self._total_bytes > target:
+            cursor = self._conn.execute(
+                "SELECT rowid, nbytes FROM embeddings ORDER BY last_accessed LIMIT ?",
+                (_SQL_BATCH_SIZE,)
+            )
+            victims = []
+            freed = 0
+            for rowid, nbytes in cursor:
+                victims.append((rowid,))
+                freed += nbytes
+                if self._total_bytes - freed <= target:
+                    break
+            if not victims:
+                break
+            self._conn.executemany("DELETE FROM embeddings WHERE rowid = ?", victims)
+            self._total_bytes -= freed
+        self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves previously computed vectors from a store.
+
+    Only texts that are not in the cache are sent to the underlying model, so
+    re-ingesting a mostly unchanged corpus only pays for the changed chunks.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        store: SQLiteEmbeddingStore,
+        model: str,
+        dimensions: Optional[int] = None
+    ):
+        self.underlying = underlying
+        self.store = store
+        self.model = model
+        # 0 stands for the model's native dimensionality
+        self.dimensions = dimensions or 0
+        self.hits = 0
+        self.misses = 0
+        self._counter_lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, cached, missing = self._lookup(texts)
+        if missing:
+            vectors = self.underlying.embed_documents([texts[i] for i in missing.values()])
+            cached.update(self._store_missing(missing, vectors))
+        return [cached[text_hash] for text_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        text_hash = hash_text(text)
+        found = self.store.get_many([text_hash], self.model, self.dimensions)
+        if text_hash in found:
+            self._count(hits=1)
+            return found[text_hash]
+
+        self._count(misses=1)
+        vector = self.underlying.embed_query(text)
+        self.store.put_many([(text_hash, vector)], self.model, self.dimensions)
+        return vector
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        hashes, cached, missing = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            vectors = await self.underlying.aembed_documents([texts[i] for i in missing.values()])
+            cached.update(await asyncio.to_thread(self._store_missing, missing, vectors))
+        return [cached[text_hash] for text_hash in hashes]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        text_hash = hash_text(text)
+        found = await asyncio.to_thread(self.store.get_many, [text_hash], self.model, self.dimensions)
+        if text_hash in found:
+            self._count(hits=1)
+            return found[text_hash]
+
+        self._count(misses=1)
+        vector = await self.underlying.aembed_query(text)
+        await asyncio.to_thread(self.store.put_many, [(text_hash, vector)], self.model, self.dimensions)
+        return vector
+
+    def stats(self) -> Dict[str, float]:
+        """Return hit/miss counters for this wrapper."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "store_bytes": self.store.size_bytes()
+        }
+
+    def _lookup(self, texts: List[str]) -> Tuple[List[str], Dict[str, List[float]], Dict[str, int]]:
+        """
+        Resolve texts against the store.
+
+        Returns the hash of every text, the vectors found, and a mapping of
+        missing hash -> index of the first text with that hash.
+        """
+        hashes = [hash_text(text) for text in texts]
+        cached = self.store.get_many(hashes, self.model, self.dimensions)
+
+        missing: Dict[str, int] = {}
+        for i, text_hash in enumerate(hashes):
+            if text_hash not in cached and text_hash not in missing:
+                missing[text_hash] = i
+
+        self._count(hits=len(texts) - len(missing), misses=len(missing))
+        return hashes, cached, missing
+
+    def _store_missing(self, missing: Dict[str, int], vectors: List[List[float]]) -> Dict[str, List[float]]:
+        computed = dict(zip(missing.keys(), vectors))
+        self.store.put_many(list(computed.items()), self.model, self.dimensions)
+        return computed
+
+    def _count(self, hits: int = 0, misses: int = 0) -> None:
+        with self._counter_lock:
+            self.hits += hits
+            self.misses += misses
+        if hits:
+            cache_lookup("embedding", True, hits)
+        if misses:
+            cache_lookup("embedding", False, misses)
+
+
+# One store per cache file shared by every wrapper in the process
+_stores: Dict[str, SQLiteEmbeddingStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_embedding_store(path: str, max_bytes: int = 2 * 1024 * 1024 * 1024) -> SQLiteEmbeddingStore:
+    """Return the process-wide store for a cache file, opening it on first use."""
+    path = os.path.abspath(path)
+    with _stores_lock:
+        if path not in _stores:
+            _stores[path] = SQLiteEmbeddingStore(path, max_bytes=max_bytes)
+        return _stores[path]
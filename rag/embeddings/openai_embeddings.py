@@ -1,24 +1,92 @@
+import os
 from langchain_openai import OpenAIEmbeddings
-from typing import Optional, Dict, Any
+from langchain_core.embeddings import Embeddings
+from typing import Optional, Dict, Any, List
+
+from rag.embeddings.cached_embeddings import CachedEmbeddings, get_embedding_store
+from utils.metrics import metered_embedding
+
+DEFAULT_CACHE_PATH = os.environ.get("EMBEDDING_CACHE_PATH", "./embedding_cache/embeddings.sqlite3")
+DEFAULT_CACHE_MAX_BYTES = int(os.environ.get("EMBEDDING_CACHE_MAX_BYTES", 2 * 1024 * 1024 * 1024))
+
+# Native output sizes of the OpenAI embedding models
+OPENAI_EMBEDDING_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+class MeteredOpenAIEmbeddings(OpenAIEmbeddings):
+    """OpenAIEmbeddings recording every API request in the embedding metrics (see utils.metrics)."""
+    
+    def embed_documents(self, texts: List[str], chunk_size: Optional[int] = None, **kwargs: Any) -> List[List[float]]:
+        with metered_embedding(self.model, texts):
+            return super().embed_documents(texts, chunk_size, **kwargs)
+    
+    async def aembed_documents(self, texts: List[str], chunk_size: Optional[int] = None, **kwargs: Any) -> List[List[float]]:
+        with metered_embedding(self.model, texts):
+            return await super().aembed_documents(texts, chunk_size, **kwargs)
 
 def get_openai_embeddings(
     model: str = "text-embedding-ada-002",
     dimensions: Optional[int] = None,
+    use_cache: bool = False,
+    cache_path: str = DEFAULT_CACHE_PATH,
+    cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
     **kwargs: Any
-) -> OpenAIEmbeddings:
+) -> Embeddings:
     """
     Create an OpenAI embeddings model instance.
     
     Args:
         model: The OpenAI embedding model to use
         dimensions: Optional number of dimensions for the embeddings
+        use_cache: Whether to serve repeated texts from the persistent embedding cache
+        cache_path: Path of the SQLite embedding cache file
+        cache_max_bytes: Maximum size of cached vectors before LRU eviction
         **kwargs: Additional arguments to pass to the OpenAIEmbeddings constructor
     
     Returns:
-        An OpenAIEmbeddings instance
+        An OpenAIEmbeddings instance, wrapped in CachedEmbeddings when use_cache is True
     """
-    return OpenAIEmbeddings(
+    embeddings = MeteredOpenAIEmbeddings(
         model=model,
         dimensions=dimensions,
         **kwargs
-    )
\ No newline at end of file
+    )
+    
+    if not use_cache:
+        return embeddings
+    
+    return CachedEmbeddings(
+        underlying=embeddings,
+        store=get_embedding_store(cache_path, max_bytes=cache_max_bytes),
+        model=model,
+        dimensions=dimensions
+    )
+
+def get_embedding_dimension(embedding_model: Embeddings) -> int:
+    """
+    Get the size of the vectors produced by an embedding model.
+    
+    Uses the model's configured dimensions or its known native size, and only
+    falls back to embedding a probe query for unknown models.
+    
+    Args:
+        embedding_model: Embedding model, optionally wrapped in CachedEmbeddings
+    
+    Returns:
+        The embedding dimension
+    """
+    model = embedding_model
+    while True:
+        dimensions = getattr(model, "dimensions", None)
+        if dimensions:
+            return dimensions
+        if getattr(model, "model", None) in OPENAI_EMBEDDING_DIMENSIONS:
+            return OPENAI_EMBEDDING_DIMENSIONS[model.model]
+        if not hasattr(model, "underlying"):
+            break
+        model = model.underlying
+    
+    return len(embedding_model.embed_query("dimension probe"))
@@ -1,15 +1,19 @@
 from enum import Enum
-from typing import List, Optional, Union, Any, Callable
+from typing import Iterator, List, Optional, Union, Any, Callable
 from hashlib import sha256
+import glob
 import os
 from datetime import datetime
 
 from langchain_core.documents import Document
 
-from .pdf_loader import load_pdf
-from .text_loader import load_text_directory, load_text_file
-from .s3_file_loader import load_s3_file
-from .s3_directory_loader import load_s3_directory
+from utils.tracing import current_span, traced
+
+from .pdf_loader import load_pdf, load_pdf_directory, load_pdf_files, iter_pdf_pages
+from .text_loader import load_text_directory, load_text_file, iter_text_directory, iter_text_file
+from .s3_file_loader import load_s3_file, iter_s3_file
+from .s3_directory_loader import load_s3_directory, iter_s3_directory
+from .s3_sync import sync_s3_directory, S3SyncResult
 
 
 class SourceType(str, Enum):
@@ -42,6 +46,7 @@ def add_document_metadata(doc: Document, source_type: SourceType) -> Document:
     
     return doc
 
+@traced("rag.load")
 def get_loader(
     source_type: SourceType,
     source_path: str = None,
@@ -63,6 +68,7 @@ def get_loader(
     use_multithreading: bool = True,
     glob_pattern: str = "**/*.txt",
     silent: bool = True,
+    pdf_workers: Optional[int] = None,
     # S3 file loader specific parameters
     endpoint_url: Optional[str] = None,
     use_ssl: Optional[bool] = True,
@@ -100,6 +106,8 @@ def get_loader(
         use_multithreading: Whether to use multithreading for loading
         glob_pattern: Pattern to match files
         silent: Whether to suppress stderr output for PDF loading
+        pdf_workers: Number of processes extracting PDF page ranges in parallel, for
+            PDF files, PDF directories and PDFs in S3 directories (None extracts serially)
         
         # S3 file loader specific parameters
         endpoint_url: Custom endpoint URL
@@ -112,7 +120,7 @@ def get_loader(
         **unstructured_kwargs: Additional kwargs for unstructured library
         
     Returns:
-        List of document chunks, or empty list for EMBEDDINGS source type
+        List of document chunks with doc_id metadata, or empty list for EMBEDDINGS source type
     """
     if source_type == SourceType.EMBEDDINGS:
         # For EMBEDDINGS type, return empty list since we'll use existing vectorstore
@@ -122,17 +130,27 @@ def get_loader(
     elif source_type == SourceType.PDF:
         if not source_path:
             raise ValueError("source_path is required for PDF loader")
-        return load_pdf(
-            file_path=source_path,
-            chunk_size=chunk_size,
-            chunk_overlap=chunk_overlap,
-            silent=silent
-        )
+        if os.path.isdir(source_path):
+            splits = load_pdf_directory(
+                directory_path=source_path,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                silent=silent,
+                workers=pdf_workers
+            )
+        else:
+            splits = load_pdf(
+                file_path=source_path,
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+                silent=silent,
+                workers=pdf_workers
+            )
     
     elif source_type == SourceType.TEXT_DIRECTORY:
         if not source_path:
             raise ValueError("source_path is required for text directory loader")
-        return load_text_directory(
+        splits = load_text_directory(
             directory_path=source_path,
             glob_pattern=glob_pattern,
             chunk_size=chunk_size,
@@ -145,7 +163,7 @@ def get_loader(
     elif source_type == SourceType.TEXT_FILE:
         if not source_path:
             raise ValueError("source_path is required for text file loader")
-        return load_text_file(
+        splits = load_text_file(
             file_path=source_path,
             chunk_size=chunk_size,
             chunk_overlap=chunk_overlap,
@@ -155,7 +173,7 @@ def get_loader(
     elif source_type == SourceType.S3_FILE:
         if not bucket_name or not file_key:
             raise ValueError("bucket_name and file_key are required for S3 file loader")
-        return load_s3_file(
+        splits = load_s3_file(
             bucket_name=bucket_name,
             file_key=file_key,
             chunk_size=chunk_size,
@@ -177,7 +195,7 @@ def get_loader(
     elif source_type == SourceType.S3_DIRECTORY:
         if not bucket_name:
             raise ValueError("bucket_name is required for S3 directory loader")
-        return load_s3_directory(
+        splits = load_s3_directory(
             bucket_name=bucket_name,
             prefix=prefix or "",
             file_extension=file_extension,
@@ -191,17 +209,124 @@ def get_loader(
             use_ssl=use_ssl,
             verify=verify,
             api_version=api_version,
-            boto_config=boto_config
+            boto_config=boto_config,
+            pdf_workers=pdf_workers,
+            show_progress=show_progress
         )
     
     else:
         raise ValueError(f"Unsupported source type: {source_type}")
+    
+    current_span().set(chunks=len(splits))
+    # Give every chunk its content-hash doc_id, used to skip already stored chunks
+    return [add_document_metadata(doc, source_type) for doc in splits]
 
-    # Load documents using the unified loader interface
-    splits = get_loader(**kwargs)
+def iter_documents(
+    source_type: SourceType,
+    source_path: str = None,
+    # S3 specific parameters
+    bucket_name: str = None,
+    file_key: str = None,
+    prefix: str = None,
+    file_extension: Optional[Union[str, List[str]]] = None,
+    # AWS credentials
+    aws_access_key_id: Optional[str] = None,
+    aws_secret_access_key: Optional[str] = None,
+    aws_session_token: Optional[str] = None,
+    region_name: Optional[str] = None,
+    # Additional parameters
+    encoding: str = "utf-8",
+    show_progress: bool = True,
+    glob_pattern: str = "**/*.txt",
+    silent: bool = True,
+    pdf_workers: Optional[int] = None,
+    # S3 file loader specific parameters
+    endpoint_url: Optional[str] = None,
+    use_ssl: Optional[bool] = True,
+    verify: Union[str, bool, None] = None,
+    api_version: Optional[str] = None,
+    boto_config: Optional[Any] = None,
+    mode: str = "single",
+    post_processors: Optional[List[Callable]] = None,
+    **unstructured_kwargs: Any
+) -> Iterator[Document]:
+    """
+    Lazily yield the unsplit documents (files or pages) of a data source.
+    
+    This is the streaming counterpart of get_loader: nothing is loaded until
+    the consumer asks for the next document, and nothing is split. See
+    rag.pipeline for the bounded load -> split -> embed -> write pipeline
+    built on top of it.
     
-    # Add metadata to each document
-    if splits and isinstance(splits, list):
-        splits = [add_document_metadata(doc, source_type) for doc in splits]
+    Args:
+        Same as get_loader, minus the chunking and multithreading options
+        
+    Yields:
+        Unsplit documents, or nothing for the EMBEDDINGS source type
+    """
+    aws_credentials = {}
+    if aws_access_key_id:
+        aws_credentials["aws_access_key_id"] = aws_access_key_id
+    if aws_secret_access_key:
+        aws_credentials["aws_secret_access_key"] = aws_secret_access_key
+    if aws_session_token:
+        aws_credentials["aws_session_token"] = aws_session_token
+    if region_name:
+        aws_credentials["region_name"] = region_name
+    if endpoint_url:
+        aws_credentials["endpoint_url"] = endpoint_url
+    if use_ssl is not None:
+        aws_credentials["use_ssl"] = use_ssl
+    if verify is not None:
+        aws_credentials["verify"] = verify
+    if api_version:
+        aws_credentials["api_version"] = api_version
+    if boto_config:
+        aws_credentials["boto_config"] = boto_config
     
-    return splits 
\ No newline at end of file
+    if source_type == SourceType.EMBEDDINGS:
+        return
+    
+    elif source_type == SourceType.PDF:
+        if not source_path:
+            raise ValueError("source_path is required for PDF loader")
+        if os.path.isdir(source_path):
+            for file_path in sorted(glob.glob(os.path.join(source_path, "**", "*.pdf"), recursive=True)):
+                yield from iter_pdf_pages(file_path, silent=silent, workers=pdf_workers)
+        else:
+            yield from iter_pdf_pages(source_path, silent=silent, workers=pdf_workers)
+    
+    elif source_type == SourceType.TEXT_DIRECTORY:
+        if not source_path:
+            raise ValueError("source_path is required for text directory loader")
+        yield from iter_text_directory(source_path, glob_pattern=glob_pattern, encoding=encoding)
+    
+    elif source_type == SourceType.TEXT_FILE:
+        if not source_path:
+            raise ValueError("source_path is required for text file loader")
+        yield from iter_text_file(source_path, encoding=encoding)
+    
+    elif source_type == SourceType.S3_FILE:
+        if not bucket_name or not file_key:
+            raise ValueError("bucket_name and file_key are required for S3 file loader")
+        unstructured_params = dict(unstructured_kwargs)
+        if mode:
+            unstructured_params["mode"] = mode
+        if post_processors:
+            unstructured_params["post_processors"] = post_processors
+        yield from iter_s3_file(bucket_name, file_key, **aws_credentials, **unstructured_params)
+    
+    elif source_type == SourceType.S3_DIRECTORY:
+        if not bucket_name:
+            raise ValueError("bucket_name is required for S3 directory loader")
+        yield from iter_s3_directory(
+            bucket_name,
+            prefix=prefix or "",
+            file_extension=file_extension,
+            pdf_workers=pdf_workers,
+            show_progress=show_progress,
+            **aws_credentials
+        )
+    
+    else:
+        raise ValueError(f"Unsupported source type: {source_type}")
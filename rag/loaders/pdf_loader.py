@@ -1,16 +1,25 @@
 import os
 import contextlib
-from typing import List, Optional
+import math
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+from rag.splitters import OffsetTextSplitter
+
+# Shards smaller than this spend more time re-reading the PDF structure than extracting
+MIN_PAGES_PER_SHARD = 8
+
 def load_pdf(
     file_path: str,
     chunk_size: int = 1000,
     chunk_overlap: int = 200,
-    silent: bool = True
+    silent: bool = True,
+    workers: Optional[int] = None,
+    pages_per_shard: Optional[int] = None
 ) -> List[Document]:
     """
     Load and split a PDF document into chunks.
@@ -20,6 +29,9 @@ def load_pdf(
         chunk_size: Size of each text chunk
         chunk_overlap: Overlap between chunks
         silent: Whether to suppress stderr output
+        workers: Number of processes extracting page ranges in parallel
+            (None or 1 extracts on the calling thread)
+        pages_per_shard: Pages per parallel extraction task (sized from workers if None)
         
     Returns:
         List of document chunks
@@ -28,20 +40,282 @@ def load_pdf(
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"PDF file not found: {file_path}")
     
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            docs = extract_pdf_pages(file_path, executor, workers, pages_per_shard, silent)
+    else:
+        docs = _load_pdf_pages(file_path, silent)
+    
+    # Split the documents
+    text_splitter = OffsetTextSplitter(
+        chunk_size=chunk_size, 
+        chunk_overlap=chunk_overlap
+    )
+    
+    return text_splitter.split_documents(docs) 
+
+def load_pdf_files(
+    file_paths: Sequence[str],
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    silent: bool = True,
+    workers: Optional[int] = None,
+    pages_per_shard: Optional[int] = None
+) -> List[Document]:
+    """
+    Load and split many PDF documents, extracting them concurrently with workers.
+    
+    The page ranges of all files are queued on one process pool, so a few
+    large files and many small ones keep every worker busy alike.
+    
+    Args:
+        file_paths: Paths to the PDF files
+        chunk_size: Size of each text chunk
+        chunk_overlap: Overlap between chunks
+        silent: Whether to suppress stderr output
+        workers: Number of extraction processes (None or 1 extracts the files one
+            by one on the calling thread)
+        pages_per_shard: Pages per extraction task (sized from workers if None)
+        
+    Returns:
+        List of document chunks, file by file in the given order
+    """
+    for file_path in file_paths:
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"PDF file not found: {file_path}")
+    
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # Submit every file's shards before waiting on any of them
+            pending = [
+                submit_pdf_shards(file_path, executor, workers, pages_per_shard, silent)
+                for file_path in file_paths
+            ]
+            docs = [doc for futures in pending for future in futures for doc in future.result()]
+    else:
+        docs = [doc for file_path in file_paths for doc in _load_pdf_pages(file_path, silent)]
+    
+    text_splitter = OffsetTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+    
+    return text_splitter.split_documents(docs)
+
+def load_pdf_directory(
+    directory_path: str,
+    glob_pattern: str = "**/*.pdf",
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    silent: bool = True,
+    workers: Optional[int] = None
+) -> List[Document]:
+    """
+    Load and split every PDF in a directory (see load_pdf_files).
+    
+    Args:
+        directory_path: Path to the directory containing PDF files
+        glob_pattern: Pattern to match files (default: all .pdf files recursively)
+        chunk_size: Size of each text chunk
+        chunk_overlap: Overlap between chunks
+        silent: Whether to suppress stderr output
+        workers: Number of extraction processes (None or 1 extracts serially)
+        
+    Returns:
+        List of document chunks
+    """
+    if not os.path.isdir(directory_path):
+        raise FileNotFoundError(f"Directory not found: {directory_path}")
+    
+    from pathlib import Path
+    file_paths = sorted(str(path) for path in Path(directory_path).glob(glob_pattern) if path.is_file())
+    return load_pdf_files(file_paths, chunk_size, chunk_overlap, silent=silent, workers=workers)
+
+def _load_pdf_pages(file_path: str, silent: bool = True) -> List[Document]:
+    """Extract every page of a PDF on the calling thread."""
     # Load the PDF
     loader = PyPDFLoader(file_path)
     
     # Suppress stderr output if silent is True
     if silent:
         with open(os.devnull, "w") as f, contextlib.redirect_stderr(f):
-            docs = loader.load()
-    else:
-        docs = loader.load()
+            return loader.load()
+    return loader.load()
+
+def count_pdf_pages(file_path: str) -> int:
+    """Number of pages of a PDF, without extracting any text."""
+    import pypdf
+    with open(os.devnull, "w") as f, contextlib.redirect_stderr(f):
+        return len(pypdf.PdfReader(file_path).pages)
+
+def plan_pdf_shards(
+    page_count: int,
+    workers: int,
+    pages_per_shard: Optional[int] = None
+) -> List[Tuple[int, int]]:
+    """
+    Split a page count into contiguous (start, end) page ranges.
     
-    # Split the documents
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size, 
-        chunk_overlap=chunk_overlap
-    )
+    By default each worker gets about two shards, which evens out pages that
+    are much slower to extract than others, but never fewer than
+    MIN_PAGES_PER_SHARD pages per shard.
+    """
+    if page_count <= 0:
+        return []
+    if not pages_per_shard:
+        pages_per_shard = max(MIN_PAGES_PER_SHARD, math.ceil(page_count / (max(workers, 1) * 2)))
+    return [(start, min(start + pages_per_shard, page_count)) for start in range(0, page_count, pages_per_shard)]
+
+def submit_pdf_shards(
+    file_path: str,
+    executor: Executor,
+    workers: int,
+    pages_per_shard: Optional[int] = None,
+    silent: bool = True,
+    source: Optional[str] = None
+) -> List:
+    """
+    Queue the page-range extraction tasks of one PDF on an executor.
+    
+    Returns:
+        One future per shard, in page order; each resolves to the shard's
+        page Documents
+    """
+    shards = plan_pdf_shards(count_pdf_pages(file_path), workers, pages_per_shard)
+    return [
+        executor.submit(extract_pdf_page_range, file_path, start, end, silent, source)
+        for start, end in shards
+    ]
+
+def extract_pdf_pages(
+    file_path: str,
+    executor: Executor,
+    workers: int,
+    pages_per_shard: Optional[int] = None,
+    silent: bool = True,
+    source: Optional[str] = None
+) -> List[Document]:
+    """
+    Extract the pages of a PDF by page ranges on an executor (normally a
+    process pool, as text extraction is CPU-bound) and merge them in order.
+    
+    The pages are identical to PyPDFLoader(file_path).load(), including the
+    page, page_label and total_pages metadata.
+    
+    Args:
+        file_path: Path to the PDF file
+        executor: Executor running the shards
+        workers: Number of workers of the executor, used to size the shards
+        pages_per_shard: Pages per shard (sized from workers if None)
+        silent: Whether to suppress stderr output
+        source: Value of the source metadata (defaults to file_path)
+        
+    Returns:
+        One Document per page
+    """
+    futures = submit_pdf_shards(file_path, executor, workers, pages_per_shard, silent, source)
+    return [doc for future in futures for doc in future.result()]
+
+def _normalize_pdf_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize a PDF's document information the way PyPDFLoader does: keys
+    without the leading slash and lowercased, dates as ISO 8601, other values
+    as stripped strings or ints.
+    """
+    normalized: Dict[str, Any] = {}
+    for key, value in metadata.items():
+        if type(value) not in (str, int):
+            value = str(value)
+        key = key[1:].lower() if key.startswith("/") else key.lower()
+        if key in ("creationdate", "moddate"):
+            try:
+                normalized[key] = datetime.strptime(value.replace("'", ""), "D:%Y%m%d%H%M%S%z").isoformat("T")
+            except ValueError:
+                normalized[key] = value
+        elif key in ("page_count", "file_path"):
+            # Also under the names other PDF parsers use
+            normalized["total_pages" if key == "page_count" else "source"] = value
+            normalized[key] = value
+        elif isinstance(value, str):
+            normalized[key] = value.strip()
+        else:
+            normalized[key] = value
+    return normalized
+
+def extract_pdf_page_range(
+    file_path: str,
+    start: int,
+    end: int,
+    silent: bool = True,
+    source: Optional[str] = None
+) -> List[Document]:
+    """
+    Extract pages [start, end) of a PDF the way PyPDFLoader does.
+    
+    This runs in worker processes, so it only takes picklable arguments and
+    opens the file itself.
+    """
+    import pypdf
+
+    with contextlib.ExitStack() as stack:
+        if silent:
+            stack.enter_context(contextlib.redirect_stderr(stack.enter_context(open(os.devnull, "w"))))
+        
+        reader = pypdf.PdfReader(file_path)
+        doc_metadata = _normalize_pdf_metadata(
+            {"producer": "PyPDF", "creator": "PyPDF", "creationdate": ""}
+            | dict(reader.metadata or {})
+            | {"source": source or file_path, "total_pages": len(reader.pages)}
+        )
+        page_labels = reader.page_labels
+        
+        docs = []
+        for page_number in range(start, min(end, len(reader.pages))):
+            text = reader.pages[page_number].extract_text(extraction_mode="plain").strip()
+            docs.append(Document(
+                page_content=text,
+                metadata=doc_metadata | {"page": page_number, "page_label": page_labels[page_number]}
+            ))
+        return docs
+
+def iter_pdf_pages(
+    file_path: str,
+    silent: bool = True,
+    workers: Optional[int] = None
+) -> Iterator[Document]:
+    """
+    Lazily yield the pages of a PDF document, one Document per page.
+    
+    Only the page being extracted is held in memory, so this is the entry
+    point of the streaming ingestion pipeline. With workers, page ranges are
+    extracted on a process pool and yielded in order as they complete.
+    
+    Args:
+        file_path: Path to the PDF file
+        silent: Whether to suppress stderr output
+        workers: Number of extraction processes (None or 1 extracts lazily in-process)
+        
+    Yields:
+        One document per page, unsplit
+    """
+    # Check if file exists
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"PDF file not found: {file_path}")
+    
+    if workers and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for future in submit_pdf_shards(file_path, executor, workers, silent=silent):
+                yield from future.result()
+        return
     
-    return text_splitter.split_documents(docs) 
\ No newline at end of file
+    pages = PyPDFLoader(file_path).lazy_load()
+    while True:
+        # Suppress stderr output if silent is True
+        if silent:
+            with open(os.devnull, "w") as f, contextlib.redirect_stderr(f):
+                page = next(pages, None)
+        else:
+            page = next(pages, None)
+        if page is None:
+            return
+        yield page
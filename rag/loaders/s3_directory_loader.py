@@ -1,12 +1,74 @@
 # https://python.langchain.com/api_reference/_modules/langchain_community/document_loaders/s3_directory.html#S3DirectoryLoader
 
 import os
-from typing import List, Optional, Dict, Any, Union
+from typing import Iterator, List, Optional, Dict, Any, Union
 
-from langchain_community.document_loaders import S3DirectoryLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import boto3
 from langchain_core.documents import Document
 
+from rag.splitters import OffsetTextSplitter
+
+from .s3_parallel_loader import (
+    S3ParallelLoader,
+    print_progress,
+    DEFAULT_MAX_CONCURRENCY,
+    DEFAULT_PARSE_WORKERS
+)
+
+def normalize_extensions(file_extension: Optional[Union[str, List[str]]]) -> Optional[List[str]]:
+    """
+    Normalize a file extension filter to a list (or None for all files).
+    """
+    if not file_extension:
+        return None
+    if isinstance(file_extension, str):
+        return [file_extension]
+    return list(file_extension)
+
+def list_s3_objects(
+    bucket_name: str,
+    prefix: str = "",
+    file_extension: Optional[Union[str, List[str]]] = None,
+    s3_client: Optional[Any] = None,
+    **client_kwargs: Any
+) -> List[Dict[str, Any]]:
+    """
+    List the objects under an S3 prefix without downloading them.
+    
+    Args:
+        bucket_name: Name of the S3 bucket
+        prefix: Prefix (folder path) in the bucket
+        file_extension: Optional file extension(s) to filter keys by
+        s3_client: Existing boto3 S3 client to reuse (optional)
+        **client_kwargs: Arguments for boto3.client when no client is given
+        
+    Returns:
+        List of dicts with Key, ETag, Size and LastModified, sorted by key
+    """
+    if s3_client is None:
+        s3_client = boto3.client("s3", **client_kwargs)
+    
+    extensions = normalize_extensions(file_extension)
+    
+    objects = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            key = obj["Key"]
+            # Skip "directory" placeholder objects
+            if key.endswith("/"):
+                continue
+            if extensions and not any(key.endswith(ext) for ext in extensions):
+                continue
+            objects.append({
+                "Key": key,
+                "ETag": obj.get("ETag", "").strip('"'),
+                "Size": obj.get("Size", 0),
+                "LastModified": obj.get("LastModified")
+            })
+    
+    return sorted(objects, key=lambda o: o["Key"])
+
 def load_s3_directory(
     bucket_name: str,
     prefix: str = "",
@@ -21,11 +83,18 @@ def load_s3_directory(
     use_ssl: Optional[bool] = True,
     verify: Union[str, bool, None] = None,
     api_version: Optional[str] = None,
-    boto_config: Optional[Any] = None
+    boto_config: Optional[Any] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    parse_workers: int = DEFAULT_PARSE_WORKERS,
+    pdf_workers: Optional[int] = None,
+    show_progress: bool = True
 ) -> List[Document]:
     """
     Load and split files from a directory in AWS S3.
     
+    The prefix is listed once and matching objects are downloaded concurrently
+    through a single pooled client, then parsed on a worker pool.
+    
     Args:
         bucket_name: Name of the S3 bucket
         prefix: Prefix (folder path) in the bucket
@@ -42,6 +111,10 @@ def load_s3_directory(
         verify: Whether to verify SSL certificates (default: None)
         api_version: AWS API version (optional)
         boto_config: Advanced boto3 client configuration (optional)
+        max_concurrency: Number of concurrent downloads
+        parse_workers: Number of threads parsing downloaded files
+        pdf_workers: Number of processes extracting PDF page ranges (None parses PDFs on the threads)
+        show_progress: Whether to print download progress and throughput
         
     Returns:
         List of document chunks
@@ -67,35 +140,67 @@ def load_s3_directory(
     if boto_config:
         aws_credentials["boto_config"] = boto_config
     
-    # Load files from S3 directory
-    loader = S3DirectoryLoader(
-        bucket=bucket_name,
-        prefix=prefix,
+    loader = S3ParallelLoader(
+        bucket_name,
+        max_concurrency=max_concurrency,
+        parse_workers=parse_workers,
+        pdf_workers=pdf_workers,
+        on_progress=print_progress() if show_progress else None,
         **aws_credentials
     )
     
-    docs = loader.load()
-    
-    # Filter by file extension if specified
-    if file_extension:
-        # Convert single extension to list for consistent handling
-        if isinstance(file_extension, str):
-            extensions = [file_extension]
-        else:
-            extensions = file_extension
-            
-        # Filter documents that end with any of the specified extensions
-        filtered_docs = []
-        for doc in docs:
-            source = doc.metadata.get("source", "")
-            if any(source.endswith(ext) for ext in extensions):
-                filtered_docs.append(doc)
-        docs = filtered_docs
+    # List and filter keys first so only matching objects are downloaded
+    objects = list_s3_objects(bucket_name, prefix, file_extension, s3_client=loader.s3_client)
+    docs = [doc for key_docs in loader.load(objects).values() for doc in key_docs]
     
     # Split the documents
-    text_splitter = RecursiveCharacterTextSplitter(
+    text_splitter = OffsetTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap
     )
     
-    return text_splitter.split_documents(docs) 
\ No newline at end of file
+    return text_splitter.split_documents(docs) 
+
+def iter_s3_directory(
+    bucket_name: str,
+    prefix: str = "",
+    file_extension: Optional[Union[str, List[str]]] = None,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    parse_workers: int = DEFAULT_PARSE_WORKERS,
+    pdf_workers: Optional[int] = None,
+    show_progress: bool = True,
+    **aws_credentials: Any
+) -> Iterator[Document]:
+    """
+    Lazily yield the files of a directory in AWS S3, unsplit.
+    
+    Files are yielded in completion order. Downloads run ahead of the consumer
+    by at most max_concurrency + parse_workers objects, so a slow consumer
+    (e.g. the embedding stage) throttles the downloads instead of letting
+    them pile up in memory.
+    
+    Args:
+        bucket_name: Name of the S3 bucket
+        prefix: Prefix (folder path) in the bucket
+        file_extension: Optional file extension(s) to filter by
+        max_concurrency: Number of concurrent downloads
+        parse_workers: Number of threads parsing downloaded files
+        pdf_workers: Number of processes extracting PDF page ranges (None parses PDFs on the threads)
+        show_progress: Whether to print download progress and throughput
+        **aws_credentials: AWS credentials and client options (aws_access_key_id, region_name,
+            endpoint_url, boto_config, ...), as accepted by create_s3_client
+        
+    Yields:
+        Documents of each downloaded file
+    """
+    loader = S3ParallelLoader(
+        bucket_name,
+        max_concurrency=max_concurrency,
+        parse_workers=parse_workers,
+        pdf_workers=pdf_workers,
+        on_progress=print_progress() if show_progress else None,
+        **aws_credentials
+    )
+    objects = list_s3_objects(bucket_name, prefix, file_extension, s3_client=loader.s3_client)
+    for _, docs in loader.iter_load(objects):
+        yield from docs
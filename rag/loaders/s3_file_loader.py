@@ -1,12 +1,13 @@
 # https://python.langchain.com/api_reference/_modules/langchain_community/document_loaders/s3_file.html#S3FileLoader
 
 import os
-from typing import List, Optional, Dict, Any, Union, Callable
+from typing import Iterator, List, Optional, Dict, Any, Union, Callable
 
 from langchain_community.document_loaders import S3FileLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+from rag.splitters import OffsetTextSplitter
+
 def load_s3_file(
     bucket_name: str,
     file_key: str,
@@ -89,9 +90,28 @@ def load_s3_file(
     docs = loader.load()
     
     # Split the documents
-    text_splitter = RecursiveCharacterTextSplitter(
+    text_splitter = OffsetTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap
     )
     
-    return text_splitter.split_documents(docs) 
\ No newline at end of file
+    return text_splitter.split_documents(docs) 
+
+def iter_s3_file(
+    bucket_name: str,
+    file_key: str,
+    **loader_kwargs: Any
+) -> Iterator[Document]:
+    """
+    Lazily yield the documents of a file in AWS S3, unsplit.
+    
+    Args:
+        bucket_name: Name of the S3 bucket
+        file_key: Key of the file in the bucket
+        **loader_kwargs: AWS credentials and unstructured options, as accepted by S3FileLoader
+        
+    Yields:
+        The documents unstructured extracts from the file
+    """
+    loader = S3FileLoader(bucket=bucket_name, key=file_key, **loader_kwargs)
+    yield from loader.lazy_load()
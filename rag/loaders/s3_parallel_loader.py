@@ -0,0 +1,322 @@
+import contextlib
+import os
+import random
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from tempfile import NamedTemporaryFile, SpooledTemporaryFile
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import BotoCoreError, ClientError
+from langchain_core.documents import Document
+
+from utils.metrics import S3_DOWNLOADED_BYTES
+from .pdf_loader import extract_pdf_pages
+
+DEFAULT_MAX_CONCURRENCY = 16
+DEFAULT_PARSE_WORKERS = 4
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_SECONDS = 0.5
+# Bodies larger than this are spooled to disk instead of memory
+DEFAULT_SPOOL_MAX_BYTES = 8 * 1024 * 1024
+_READ_CHUNK_BYTES = 1024 * 1024
+
+# Extensions decoded directly instead of going through unstructured
+PLAIN_TEXT_EXTENSIONS = (".txt", ".md", ".csv", ".json", ".log")
+
+# Errors that will not go away by retrying
+_PERMANENT_ERROR_CODES = {"NoSuchKey", "NoSuchBucket", "AccessDenied", "InvalidObjectState", "404", "403"}
+
+
+@dataclass
+class DownloadProgress:
+    """Running counters of a parallel S3 download."""
+    total_objects: int
+    total_bytes: int
+    completed_objects: int = 0
+    downloaded_bytes: int = 0
+    failed_objects: int = 0
+    retries: int = 0
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    @property
+    def throughput_mb_s(self) -> float:
+        elapsed = self.elapsed
+        return self.downloaded_bytes / (1024 * 1024) / elapsed if elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.completed_objects}/{self.total_objects} objects, "
+            f"{self.downloaded_bytes / (1024 * 1024):.1f}/{self.total_bytes / (1024 * 1024):.1f} MB, "
+            f"{self.throughput_mb_s:.1f} MB/s, {self.failed_objects} failed, {self.retries} retries"
+        )
+
+
+def aws_client_kwargs(aws_credentials: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Translate loader-style AWS credentials (as passed to S3FileLoader) into
+    boto3.client keyword arguments.
+    """
+    client_kwargs = dict(aws_credentials)
+    if "boto_config" in client_kwargs:
+        client_kwargs["config"] = client_kwargs.pop("boto_config")
+    return client_kwargs
+
+
+def create_s3_client(max_pool_connections: int = DEFAULT_MAX_CONCURRENCY, **aws_credentials: Any):
+    """
+    Create one boto3 S3 client sized for concurrent use from many threads.
+
+    The connection pool is sized to the number of download threads (botocore's
+    default of 10 would serialize anything above that), and botocore's own
+    retries are left to the downloader so they can be counted and backed off.
+    """
+    client_kwargs = aws_client_kwargs(aws_credentials)
+    config = Config(max_pool_connections=max_pool_connections, retries={"total_max_attempts": 1})
+    if client_kwargs.get("config") is not None:
+        config = client_kwargs["config"].merge(config)
+    client_kwargs["config"] = config
+    return boto3.client("s3", **client_kwargs)
+
+
+def parse_s3_object(bucket_name: str, key: str, body: BinaryIO) -> List[Document]:
+    """
+    Turn a downloaded object into documents.
+
+    Plain text is decoded directly; everything else goes through unstructured,
+    the same parser S3FileLoader uses.
+    """
+    metadata = {"source": f"s3://{bucket_name}/{key}"}
+
+    if key.lower().endswith(PLAIN_TEXT_EXTENSIONS):
+        text = body.read().decode("utf-8", errors="replace")
+        return [Document(page_content=text, metadata=metadata)]
+
+    from unstructured.partition.auto import partition
+
+    elements = partition(file=body, metadata_filename=os.path.basename(key))
+    text = "\n\n".join(str(element) for element in elements)
+    return [Document(page_content=text, metadata=metadata)]
+
+
+class S3ParallelLoader:
+    """
+    Download and parse many S3 objects concurrently.
+
+    Objects are fetched by a pool of threads sharing one boto3 client, with
+    bodies streamed into spooled temporary files (kept in memory up to
+    spool_max_bytes, on disk above). Each finished download is handed to a
+    separate parse pool, so slow parsing does not hold back the network.
+    Transient failures are retried with exponential backoff and jitter.
+    With pdf_workers, PDFs are extracted by page ranges on a process pool
+    instead, since text extraction is CPU-bound.
+    """
+
+    def __init__(
+        self,
+        bucket_name: str,
+        s3_client: Optional[Any] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        parse_workers: int = DEFAULT_PARSE_WORKERS,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        backoff_seconds: float = DEFAULT_BACKOFF_SECONDS,
+        spool_max_bytes: int = DEFAULT_SPOOL_MAX_BYTES,
+        parse: Optional[Callable[[str, str, BinaryIO], List[Document]]] = None,
+        on_progress: Optional[Callable[[DownloadProgress], None]] = None,
+        raise_on_error: bool = True,
+        pdf_workers: Optional[int] = None,
+        **aws_credentials: Any
+    ):
+        """
+        Args:
+            bucket_name: Name of the S3 bucket
+            s3_client: Existing boto3 S3 client (created with a pool of max_concurrency if omitted)
+            max_concurrency: Number of concurrent downloads
+            parse_workers: Number of threads parsing downloaded objects
+            max_retries: Retries per object after the first attempt
+            backoff_seconds: Base delay of the exponential backoff
+            spool_max_bytes: Body size above which downloads are spooled to disk
+            parse: Callable(bucket, key, file) -> documents (defaults to parse_s3_object)
+            on_progress: Callback invoked with the progress after every object
+            raise_on_error: Raise the first permanent failure instead of skipping the object
+            pdf_workers: Number of processes extracting PDF page ranges (None keeps PDFs on the parse pool)
+            **aws_credentials: AWS credentials and client options, as accepted by S3FileLoader
+        """
+        self.bucket_name = bucket_name
+        self.s3_client = s3_client or create_s3_client(max_pool_connections=max_concurrency, **aws_credentials)
+        self.max_concurrency = max_concurrency
+        self.parse_workers = parse_workers
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.spool_max_bytes = spool_max_bytes
+        self.parse = parse or parse_s3_object
+        self.on_progress = on_progress
+        self.raise_on_error = raise_on_error
+        self.pdf_workers = pdf_workers
+        self._pdf_executor: Optional[ProcessPoolExecutor] = None
+        self.progress: Optional[DownloadProgress] = None
+        self.errors: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def load(self, objects: List[Dict[str, Any]]) -> Dict[str, List[Document]]:
+        """
+        Download and parse objects as returned by list_s3_objects.
+
+        Returns:
+            Documents per key. Objects that failed permanently are missing
+            (and listed in self.errors) unless raise_on_error is set.
+        """
+        results = dict(self.iter_load(objects))
+        # Keep the listing order so downstream IDs and splits are deterministic
+        return {obj["Key"]: results[obj["Key"]] for obj in objects if obj["Key"] in results}
+
+    def iter_load(self, objects: Iterable[Dict[str, Any]]) -> Iterator[Tuple[str, List[Document]]]:
+        """
+        Download and parse objects, yielding (key, documents) as each finishes.
+
+        At most max_concurrency + parse_workers objects are downloading, parsed
+        or waiting for the consumer at any time; the next object is only
+        requested once the consumer takes a result, so memory stays bounded
+        however many objects there are and a slow consumer throttles downloads.
+        """
+        objects = list(objects)
+        self.progress = DownloadProgress(
+            total_objects=len(objects),
+            total_bytes=sum(obj.get("Size", 0) for obj in objects)
+        )
+        self.errors = {}
+        pending = iter(objects)
+        window = self.max_concurrency + self.parse_workers
+
+        with contextlib.ExitStack() as stack:
+            if self.pdf_workers and self.pdf_workers > 1:
+                # Entered first so it outlives the parse threads submitting to it
+                stack.callback(setattr, self, "_pdf_executor", None)
+                self._pdf_executor = stack.enter_context(ProcessPoolExecutor(max_workers=self.pdf_workers))
+            downloads = stack.enter_context(
+                ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="s3-download")
+            )
+            parsers = stack.enter_context(
+                ThreadPoolExecutor(max_workers=self.parse_workers, thread_name_prefix="s3-parse")
+            )
+            # future -> (stage, key); an object is in flight from download until yielded
+            in_flight: Dict[Any, Tuple[str, str]] = {}
+
+            def fill() -> None:
+                while len(in_flight) < window:
+                    obj = next(pending, None)
+                    if obj is None:
+                        return
+                    in_flight[downloads.submit(self._download, obj["Key"])] = ("download", obj["Key"])
+
+            try:
+                fill()
+                while in_flight:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage, key = in_flight.pop(future)
+                        try:
+                            value = future.result()
+                        except Exception as e:
+                            self._record_failure(key, e)
+                            continue
+                        if stage == "download":
+                            in_flight[parsers.submit(self._parse, key, value)] = ("parse", key)
+                        else:
+                            self._advance(completed=1)
+                            yield key, value
+                    fill()
+            except BaseException:
+                # Don't keep downloading the rest of the prefix after a fatal
+                # error or when the consumer stops early
+                for future in in_flight:
+                    future.cancel()
+                raise
+
+    def _download(self, key: str) -> SpooledTemporaryFile:
+        attempt = 0
+        while True:
+            spool = SpooledTemporaryFile(max_size=self.spool_max_bytes)
+            received = 0
+            try:
+                response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+                body = response["Body"]
+                for chunk in iter(lambda: body.read(_READ_CHUNK_BYTES), b""):
+                    spool.write(chunk)
+                    received += len(chunk)
+                    self._advance(downloaded_bytes=len(chunk))
+                    S3_DOWNLOADED_BYTES.inc(amount=len(chunk))
+                spool.seek(0)
+                return spool
+            except (ClientError, BotoCoreError, ConnectionError, TimeoutError) as e:
+                spool.close()
+                # The retry downloads the whole object again
+                self._advance(downloaded_bytes=-received)
+                if not self._is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._advance(retries=1)
+                # Exponential backoff with full jitter
+                time.sleep(random.uniform(0, self.backoff_seconds * 2 ** (attempt - 1)))
+
+    def _parse(self, key: str, spool: SpooledTemporaryFile) -> List[Document]:
+        with spool:
+            if self._pdf_executor is not None and key.lower().endswith(".pdf"):
+                return self._parse_pdf(key, spool)
+            return self.parse(self.bucket_name, key, spool)
+
+    def _parse_pdf(self, key: str, spool: SpooledTemporaryFile) -> List[Document]:
+        # The extraction processes open the file themselves, so it must be on disk
+        with NamedTemporaryFile(suffix=".pdf") as pdf_file:
+            shutil.copyfileobj(spool, pdf_file)
+            pdf_file.flush()
+            return extract_pdf_pages(
+                pdf_file.name,
+                self._pdf_executor,
+                self.pdf_workers,
+                source=f"s3://{self.bucket_name}/{key}"
+            )
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        if isinstance(error, ClientError):
+            code = str(error.response.get("Error", {}).get("Code", ""))
+            return code not in _PERMANENT_ERROR_CODES
+        return True
+
+    def _record_failure(self, key: str, error: Exception) -> None:
+        if self.raise_on_error:
+            raise error
+        with self._lock:
+            self.errors[key] = str(error)
+        self._advance(failed=1)
+
+    def _advance(self, completed: int = 0, downloaded_bytes: int = 0, failed: int = 0, retries: int = 0) -> None:
+        with self._lock:
+            self.progress.completed_objects += completed
+            self.progress.downloaded_bytes += downloaded_bytes
+            self.progress.failed_objects += failed
+            self.progress.retries += retries
+        if (completed or failed) and self.on_progress:
+            self.on_progress(self.progress)
+
+
+def print_progress(every: int = 0) -> Callable[[DownloadProgress], None]:
+    """
+    Progress callback printing a line every `every` objects (about 20 lines
+    per run when 0) and on the last object.
+    """
+    def report(progress: DownloadProgress) -> None:
+        step = every or max(1, progress.total_objects // 20)
+        done = progress.completed_objects + progress.failed_objects
+        if done % step == 0 or done == progress.total_objects:
+            print(f"S3 download: {progress}")
+    return report
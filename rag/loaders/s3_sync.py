@@ -0,0 +1,204 @@
+import json
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from langchain_core.documents import Document
+
+from rag.splitters import OffsetTextSplitter
+from .s3_directory_loader import list_s3_objects
+from .s3_parallel_loader import S3ParallelLoader, print_progress
+
+MANIFEST_VERSION = 1
+
+
+@dataclass
+class S3SyncResult:
+    """
+    Outcome of comparing an S3 prefix against its sync manifest.
+
+    documents holds the chunks of new and changed objects, ready to be
+    embedded; stale_doc_ids holds the chunk IDs to purge from the vectorstore
+    (chunks of deleted objects and chunks that disappeared from changed ones).
+    The manifest on disk is only updated by commit(), which callers should run
+    once the vectorstore has been updated.
+    """
+    manifest_path: str
+    added_keys: List[str] = field(default_factory=list)
+    changed_keys: List[str] = field(default_factory=list)
+    deleted_keys: List[str] = field(default_factory=list)
+    unchanged_keys: List[str] = field(default_factory=list)
+    documents: List[Document] = field(default_factory=list)
+    stale_doc_ids: List[str] = field(default_factory=list)
+    manifest: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added_keys or self.changed_keys or self.deleted_keys)
+
+    def commit(self) -> None:
+        """Persist the updated manifest."""
+        save_manifest(self.manifest, self.manifest_path)
+
+    def summary(self) -> str:
+        return (
+            f"{len(self.added_keys)} added, {len(self.changed_keys)} changed, "
+            f"{len(self.deleted_keys)} deleted, {len(self.unchanged_keys)} unchanged objects; "
+            f"{len(self.documents)} chunks to embed, {len(self.stale_doc_ids)} stale chunks"
+        )
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    """Read a sync manifest, returning an empty one if it does not exist."""
+    if not os.path.exists(path):
+        return {"version": MANIFEST_VERSION, "objects": {}}
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("version") != MANIFEST_VERSION:
+        # Unknown layout: treat every object as new
+        return {"version": MANIFEST_VERSION, "objects": {}}
+    return manifest
+
+
+def save_manifest(manifest: Dict[str, Any], path: str) -> None:
+    """Write a sync manifest atomically."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=1, default=str)
+    os.replace(tmp_path, path)
+
+
+def sync_s3_directory(
+    bucket_name: str,
+    prefix: str,
+    manifest_path: str,
+    file_extension: Optional[Union[str, List[str]]] = None,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    load_objects: Optional[Callable[[List[Dict[str, Any]]], Dict[str, List[Document]]]] = None,
+    s3_client: Optional[Any] = None,
+    show_progress: bool = True,
+    force_reload: bool = False,
+    **aws_credentials: Any
+) -> S3SyncResult:
+    """
+    Compute the incremental changes under an S3 prefix since the last sync.
+
+    Keys are listed and filtered by extension before anything is downloaded,
+    then compared by ETag and size against the manifest of the previous run.
+    Only new and changed objects are downloaded (in parallel) and split. Each chunk gets a
+    content-addressed doc_id, and the manifest records the doc_ids produced per
+    key so the chunks of deleted or rewritten objects can be purged later.
+
+    Args:
+        bucket_name: Name of the S3 bucket
+        prefix: Prefix (folder path) in the bucket
+        manifest_path: JSON manifest from the previous sync (created if missing)
+        file_extension: Optional file extension(s) to filter keys by
+        chunk_size: Size of each text chunk
+        chunk_overlap: Overlap between chunks
+        load_objects: Optional callable(objects) -> {key: chunks} replacing the default parallel loader
+        s3_client: Existing boto3 S3 client used for listing and downloads (optional)
+        show_progress: Whether to print download progress and throughput
+        force_reload: Ignore the previous manifest and load every object, for a
+            vectorstore that was just wiped
+        **aws_credentials: AWS credentials and client options, as accepted by S3FileLoader
+
+    Returns:
+        The sync result; call commit() on it once the vectorstore is updated
+    """
+    # Imported here because rag.loaders imports this module
+    from rag.loaders import SourceType, add_document_metadata
+
+    loader = S3ParallelLoader(
+        bucket_name,
+        s3_client=s3_client,
+        on_progress=print_progress() if show_progress else None,
+        **aws_credentials
+    )
+    if load_objects is None:
+        splitter = OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        
+        def load_objects(to_load: List[Dict[str, Any]]) -> Dict[str, List[Document]]:
+            return {key: splitter.split_documents(docs) for key, docs in loader.load(to_load).items()}
+
+    # A wiped vectorstore holds none of the previous chunks, so compare against nothing
+    previous = {"version": MANIFEST_VERSION, "objects": {}} if force_reload else load_manifest(manifest_path)
+    settings_unchanged = (
+        previous.get("bucket") == bucket_name
+        and previous.get("prefix") == prefix
+        and previous.get("chunk_size") == chunk_size
+        and previous.get("chunk_overlap") == chunk_overlap
+    )
+    # Chunking changes invalidate every chunk, so compare against nothing
+    previous_objects = previous.get("objects", {}) if settings_unchanged else {}
+
+    objects = list_s3_objects(bucket_name, prefix, file_extension, s3_client=loader.s3_client)
+
+    def is_unchanged(obj: Dict[str, Any]) -> bool:
+        old_entry = previous_objects.get(obj["Key"])
+        return bool(old_entry) and old_entry["etag"] == obj["ETag"] and old_entry["size"] == obj["Size"]
+
+    # Download everything new or changed in one parallel pass
+    loaded = load_objects([obj for obj in objects if not is_unchanged(obj)])
+
+    result = S3SyncResult(manifest_path=manifest_path)
+    current_objects: Dict[str, Dict[str, Any]] = {}
+
+    for obj in objects:
+        key = obj["Key"]
+        entry = {
+            "etag": obj["ETag"],
+            "size": obj["Size"],
+            "last_modified": obj["LastModified"].isoformat()
+                if isinstance(obj["LastModified"], datetime) else obj["LastModified"]
+        }
+        old_entry = previous_objects.get(key)
+
+        if is_unchanged(obj):
+            entry["doc_ids"] = old_entry.get("doc_ids", [])
+            result.unchanged_keys.append(key)
+        else:
+            chunks = [add_document_metadata(chunk, SourceType.S3_DIRECTORY) for chunk in loaded.get(key, [])]
+            for chunk in chunks:
+                chunk.metadata["s3_key"] = key
+                chunk.metadata["etag"] = entry["etag"]
+            entry["doc_ids"] = list(dict.fromkeys(chunk.metadata["doc_id"] for chunk in chunks))
+            result.documents.extend(chunks)
+
+            if old_entry:
+                result.changed_keys.append(key)
+                # Chunks identical to the previous version keep their ID and are not purged
+                kept = set(entry["doc_ids"])
+                result.stale_doc_ids.extend(i for i in old_entry.get("doc_ids", []) if i not in kept)
+            else:
+                result.added_keys.append(key)
+
+        current_objects[key] = entry
+
+    for key, old_entry in previous_objects.items():
+        if key not in current_objects:
+            result.deleted_keys.append(key)
+            result.stale_doc_ids.extend(old_entry.get("doc_ids", []))
+    if not settings_unchanged:
+        for old_entry in previous.get("objects", {}).values():
+            result.stale_doc_ids.extend(old_entry.get("doc_ids", []))
+
+    # Chunks shared between objects (e.g. copied files) must survive if still referenced
+    live_ids = {doc_id for entry in current_objects.values() for doc_id in entry["doc_ids"]}
+    result.stale_doc_ids = [doc_id for doc_id in dict.fromkeys(result.stale_doc_ids) if doc_id not in live_ids]
+
+    result.manifest = {
+        "version": MANIFEST_VERSION,
+        "bucket": bucket_name,
+        "prefix": prefix,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "synced_at": datetime.now().isoformat(),
+        "objects": current_objects
+    }
+    return result
@@ -1,10 +1,11 @@
 import os
-from typing import List, Optional
+from typing import Iterator, List, Optional
 
 from langchain_community.document_loaders import DirectoryLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
 
+from rag.splitters import OffsetTextSplitter
+
 def load_text_directory(
     directory_path: str,
     glob_pattern: str = "**/*.txt",
@@ -46,7 +47,7 @@ def load_text_directory(
     docs = loader.load()
     
     # Split the documents
-    text_splitter = RecursiveCharacterTextSplitter(
+    text_splitter = OffsetTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap
     )
@@ -80,9 +81,63 @@ def load_text_file(
     docs = loader.load()
     
     # Split the documents
-    text_splitter = RecursiveCharacterTextSplitter(
+    text_splitter = OffsetTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap
     )
     
-    return text_splitter.split_documents(docs) 
\ No newline at end of file
+    return text_splitter.split_documents(docs) 
+
+def iter_text_directory(
+    directory_path: str,
+    glob_pattern: str = "**/*.txt",
+    encoding: str = "utf-8"
+) -> Iterator[Document]:
+    """
+    Lazily yield the text files of a directory, one Document per file.
+    
+    Files are read one at a time as the consumer asks for them, so this is the
+    entry point of the streaming ingestion pipeline.
+    
+    Args:
+        directory_path: Path to the directory containing text files
+        glob_pattern: Pattern to match files (default: all .txt files recursively)
+        encoding: Text encoding
+        
+    Yields:
+        One document per file, unsplit
+    """
+    # Check if directory exists
+    if not os.path.exists(directory_path):
+        raise FileNotFoundError(f"Directory not found: {directory_path}")
+    
+    # DirectoryLoader only loads lazily without multithreading
+    loader = DirectoryLoader(
+        directory_path,
+        glob=glob_pattern,
+        loader_cls=TextLoader,
+        loader_kwargs={"encoding": encoding},
+        show_progress=False,
+        use_multithreading=False
+    )
+    yield from loader.lazy_load()
+
+def iter_text_file(
+    file_path: str,
+    encoding: str = "utf-8"
+) -> Iterator[Document]:
+    """
+    Lazily yield a single text file as a Document.
+    
+    Args:
+        file_path: Path to the text file
+        encoding: Text encoding
+        
+    Yields:
+        The file as one unsplit document
+    """
+    # Check if file exists
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Text file not found: {file_path}")
+    
+    yield from TextLoader(file_path, encoding=encoding).lazy_load()
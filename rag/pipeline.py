@@ -0,0 +1,191 @@
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, Optional, TypeVar
+
+from langchain_core.documents import Document
+
+from rag.dedup import ChunkDeduplicator
+from rag.loaders import SourceType, add_document_metadata, iter_documents
+from rag.splitters import OffsetTextSplitter
+
+T = TypeVar("T")
+
+# Items buffered between two stages before the upstream stage blocks
+DEFAULT_QUEUE_SIZE = 64
+
+_DONE = object()
+
+
+class _StageError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+@dataclass
+class PipelineStats:
+    """Counters of a streaming ingestion run."""
+    documents: int = 0
+    chunks: int = 0
+    max_queue_depth: Dict[str, int] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started_at
+
+    def __str__(self) -> str:
+        return (
+            f"{self.documents} documents -> {self.chunks} chunks in {self.elapsed:.1f}s "
+            f"(max queue depth {self.max_queue_depth})"
+        )
+
+
+def bounded_stage(
+    items: Iterable[T],
+    maxsize: int = DEFAULT_QUEUE_SIZE,
+    name: str = "stage",
+    stats: Optional[PipelineStats] = None
+) -> Iterator[T]:
+    """
+    Run an iterator on a background thread, handing its items over through a
+    queue of at most maxsize items.
+
+    The producer blocks when the queue is full, so a slow consumer applies
+    backpressure all the way up the pipeline instead of letting items pile up
+    in memory. Exceptions raised by the producer are re-raised in the
+    consumer, and closing the consumer stops the producer.
+
+    Args:
+        items: Upstream iterator, consumed on the stage thread
+        maxsize: Maximum number of buffered items
+        name: Stage name used for the thread and in stats
+        stats: Optional stats recording the deepest queue seen
+
+    Yields:
+        The upstream items, in order
+    """
+    buffer: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+    stopped = threading.Event()
+
+    def put(item: Any) -> bool:
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in items:
+                if not put(item):
+                    return
+                if stats is not None:
+                    depth = buffer.qsize()
+                    if depth > stats.max_queue_depth.get(name, 0):
+                        stats.max_queue_depth[name] = depth
+            put(_DONE)
+        except BaseException as e:
+            put(_StageError(e))
+        finally:
+            # Let upstream generators release their resources (threads, files)
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name=f"pipeline-{name}", daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _StageError):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def split_stream(
+    documents: Iterable[Document],
+    source_type: SourceType,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    stats: Optional[PipelineStats] = None
+) -> Iterator[Document]:
+    """
+    Split documents one at a time, tagging every chunk with its doc_id and
+    source metadata.
+
+    Args:
+        documents: Unsplit documents (files or pages)
+        source_type: Source type recorded in the chunk metadata
+        chunk_size: Size of each text chunk
+        chunk_overlap: Overlap between chunks
+        stats: Optional stats counting documents and chunks
+
+    Yields:
+        Document chunks
+    """
+    text_splitter = OffsetTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap
+    )
+
+    for doc in documents:
+        chunks = text_splitter.split_documents([doc])
+        if stats is not None:
+            stats.documents += 1
+            stats.chunks += len(chunks)
+        for chunk in chunks:
+            yield add_document_metadata(chunk, source_type)
+
+
+def stream_documents(
+    source_type: SourceType,
+    chunk_size: int = 1000,
+    chunk_overlap: int = 200,
+    queue_size: int = DEFAULT_QUEUE_SIZE,
+    stats: Optional[PipelineStats] = None,
+    deduplicator: Optional[ChunkDeduplicator] = None,
+    **loader_kwargs: Any
+) -> Iterator[Document]:
+    """
+    Lazily load and split a data source as a pipeline of bounded stages.
+
+    Loading (files or pages) and splitting each run on their own thread,
+    connected by queues of queue_size items. The returned iterator is meant
+    to be handed to get_vectorstore / ingest_documents, which pull token-sized
+    batches from it for embedding and write each batch as soon as it is
+    embedded. Every stage only runs ahead of the next one by a bounded amount,
+    so peak memory is independent of the corpus size (apart from the
+    vectorstore itself, for the in-memory stores).
+
+    Args:
+        source_type: Type of source data
+        chunk_size: Size of each text chunk
+        chunk_overlap: Overlap between chunks
+        queue_size: Maximum items buffered between two stages
+        stats: Optional stats filled in while the pipeline runs
+        deduplicator: Optional deduplicator dropping duplicate chunks on the split stage
+        **loader_kwargs: Source parameters, as accepted by iter_documents
+
+    Yields:
+        Document chunks with doc_id metadata
+    """
+    documents = bounded_stage(
+        iter_documents(source_type, **loader_kwargs),
+        maxsize=queue_size,
+        name="load",
+        stats=stats
+    )
+    chunks = split_stream(documents, source_type, chunk_size, chunk_overlap, stats=stats)
+    if deduplicator is not None:
+        chunks = deduplicator.filter(chunks)
+    return bounded_stage(chunks, maxsize=queue_size, name="split", stats=stats)
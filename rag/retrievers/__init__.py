@@ -0,0 +1,11 @@
+from enum import Enum
+
+from rag.retrievers.bm25 import BM25Index, tokenize
+from rag.retrievers.hybrid import HybridRetriever, get_keyword_index, reciprocal_rank_fusion, stored_documents
+from rag.retrievers.packing import DEFAULT_MAX_CONTEXT_TOKENS, PackedRetriever, pack_documents
+
+
+class RetrievalMode(str, Enum):
+    """How create_retriever finds the documents of a query"""
+    DENSE = "dense"  # Vector similarity only (MMR for Chroma and FAISS)
+    HYBRID = "hybrid"  # Dense retrieval fused with BM25 keyword search
@@ -0,0 +1,107 @@
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from rag.vectorstores.search import top_k_indices
+
+DEFAULT_K1 = 1.5
+DEFAULT_B = 0.75
+
+# Words and identifiers such as part numbers ("XJ-4412", "v2.1"), kept whole
+_TOKEN = re.compile(r"\w+(?:[-./]\w+)*")
+_PART = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased terms of a text.
+
+    Compound identifiers are indexed whole and by their parts, so "XJ-4412"
+    matches queries for "XJ-4412", "xj" and "4412".
+    """
+    terms = []
+    for token in _TOKEN.findall(text.lower()):
+        terms.append(token)
+        parts = _PART.findall(token)
+        if len(parts) > 1:
+            terms.extend(parts)
+    return terms
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a fixed list of documents, as a compact inverted index.
+
+    Postings are stored column-wise in CSR form: the postings of term t are
+    doc_ids[indptr[t]:indptr[t + 1]], with their BM25 weight (idf times the
+    saturated, length-normalized term frequency) precomputed in weights. A
+    query is then one vectorized score accumulation per query term.
+    """
+
+    def __init__(self, documents: Sequence[Document], k1: float = DEFAULT_K1, b: float = DEFAULT_B):
+        self.documents = list(documents)
+        self.k1 = k1
+        self.b = b
+
+        self.vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        term_freqs: List[int] = []
+        doc_lengths = np.zeros(len(self.documents), dtype=np.float32)
+        for doc_index, doc in enumerate(self.documents):
+            terms = tokenize(doc.page_content)
+            doc_lengths[doc_index] = len(terms)
+            for term, count in Counter(terms).items():
+                term_ids.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                doc_ids.append(doc_index)
+                term_freqs.append(count)
+
+        term_ids = np.asarray(term_ids, dtype=np.int64)
+        order = np.argsort(term_ids, kind="stable")
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        self.indptr = np.zeros(len(self.vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(term_ids, minlength=len(self.vocabulary)), out=self.indptr[1:])
+
+        doc_freqs = np.diff(self.indptr).astype(np.float32)
+        self.idf = np.log1p((len(self.documents) - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+
+        tf = np.asarray(term_freqs, dtype=np.float32)[order]
+        average_length = float(doc_lengths.mean()) if len(self.documents) else 0.0
+        norm = 1 - b + b * doc_lengths[self.doc_ids] / max(average_length, 1e-9)
+        posting_idf = np.repeat(self.idf, np.diff(self.indptr))
+        self.weights = (posting_idf * tf * (k1 + 1) / (tf + k1 * norm)).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the postings arrays."""
+        return self.doc_ids.nbytes + self.weights.nbytes + self.indptr.nbytes + self.idf.nbytes
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for query."""
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        for term in tokenize(query):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.indptr[term_id], self.indptr[term_id + 1]
+            # Each document appears once in a term's postings, so fancy-index += is safe
+            scores[self.doc_ids[start:end]] += self.weights[start:end]
+        return scores
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        """The k best matching documents with their scores, best first; documents without any query term are left out."""
+        if not self.documents or k <= 0:
+            return []
+        scores = self.scores(query)
+        best = top_k_indices(scores[np.newaxis, :], k)[0]
+        return [(self.documents[i], float(scores[i])) for i in best if scores[i] > 0]
+
+    @classmethod
+    def from_texts(cls, texts: Iterable[str], **kwargs) -> "BM25Index":
+        return cls([Document(page_content=text) for text in texts], **kwargs)
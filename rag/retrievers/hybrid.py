@@ -0,0 +1,144 @@
+import threading
+import weakref
+from typing import Any, Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import InMemoryVectorStore
+from langchain_community.vectorstores import FAISS
+
+from rag.retrievers.bm25 import BM25Index
+from rag.vectorstores.numpy_store import NumpyVectorStore
+
+# Rank constant of reciprocal rank fusion, as in Cormack et al. (2009)
+DEFAULT_RRF_K = 60
+
+# Chroma returns stored documents in pages of this size
+_CHROMA_PAGE_SIZE = 5000
+
+# Keyword indexes per vectorstore, with the document count they were built at
+_keyword_indexes: "weakref.WeakKeyDictionary[Any, tuple]" = weakref.WeakKeyDictionary()
+_keyword_indexes_lock = threading.Lock()
+
+
+def _unsupported(vectorstore: Any) -> ValueError:
+    return ValueError(
+        f"Hybrid retrieval needs the stored chunks, which {type(vectorstore).__name__} cannot list; "
+        "use dense retrieval instead"
+    )
+
+
+def _document_count(vectorstore: Any) -> int:
+    if isinstance(vectorstore, FAISS):
+        return len(vectorstore.index_to_docstore_id)
+    if isinstance(vectorstore, NumpyVectorStore):
+        return len(vectorstore)
+    if isinstance(vectorstore, InMemoryVectorStore):
+        return len(vectorstore.store)
+    if hasattr(vectorstore, "_collection"):  # Chroma
+        return vectorstore._collection.count()
+    raise _unsupported(vectorstore)
+
+
+def stored_documents(vectorstore: Any) -> List[Document]:
+    """
+    All documents stored in a vectorstore.
+
+    Raises:
+        ValueError: If the vectorstore cannot list its documents (e.g. Pinecone)
+    """
+    if isinstance(vectorstore, FAISS):
+        ids = vectorstore.index_to_docstore_id
+        return [vectorstore.docstore.search(ids[i]) for i in sorted(ids)]
+    if isinstance(vectorstore, NumpyVectorStore):
+        return [vectorstore._document(row) for row in range(len(vectorstore))]
+    if isinstance(vectorstore, InMemoryVectorStore):
+        return [
+            Document(id=entry["id"], page_content=entry["text"], metadata=entry["metadata"])
+            for entry in vectorstore.store.values()
+        ]
+    if hasattr(vectorstore, "_collection"):  # Chroma
+        documents = []
+        while True:
+            page = vectorstore.get(include=["documents", "metadatas"], limit=_CHROMA_PAGE_SIZE, offset=len(documents))
+            documents.extend(
+                Document(id=doc_id, page_content=text, metadata=metadata or {})
+                for doc_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+            )
+            if len(page["ids"]) < _CHROMA_PAGE_SIZE:
+                return documents
+    raise _unsupported(vectorstore)
+
+
+def get_keyword_index(vectorstore: Any) -> BM25Index:
+    """
+    The BM25 index over a vectorstore's documents, built on first use.
+
+    Indexes are kept for as long as their vectorstore is alive and rebuilt when
+    its document count changes, so a cached vectorstore (see the API's
+    vectorstore cache) is tokenized once rather than on every chain.
+    """
+    count = _document_count(vectorstore)
+    with _keyword_indexes_lock:
+        cached = _keyword_indexes.get(vectorstore)
+        if cached is not None and cached[0] == count:
+            return cached[1]
+    keyword_index = BM25Index(stored_documents(vectorstore))
+    with _keyword_indexes_lock:
+        _keyword_indexes[vectorstore] = (count, keyword_index)
+    return keyword_index
+
+
+def _document_key(doc: Document) -> str:
+    return doc.metadata.get("doc_id") or doc.id or doc.page_content
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[Document]], k: int, rrf_k: int = DEFAULT_RRF_K) -> List[Document]:
+    """
+    Merge ranked lists of documents by reciprocal rank fusion.
+
+    Every document scores sum(1 / (rrf_k + rank)) over the lists it appears in
+    (rank starting at 1), so documents found by several retrievers move up
+    without having to calibrate their scores against each other.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _document_key(doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+            documents.setdefault(key, doc)
+    best = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [documents[key] for key in best]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retriever fusing dense retrieval with BM25 keyword search.
+
+    The dense retriever catches paraphrases, BM25 catches exact terms such as
+    part numbers and names that embeddings blur; both candidate lists are
+    merged with reciprocal rank fusion and cut to k documents.
+    """
+
+    dense_retriever: BaseRetriever
+    keyword_index: BM25Index
+    k: int = 6
+    keyword_k: Optional[int] = None
+    rrf_k: int = DEFAULT_RRF_K
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    def _keyword_documents(self, query: str) -> List[Document]:
+        return [doc for doc, _ in self.keyword_index.search(query, self.keyword_k or self.k * 2)]
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        dense = self.dense_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return reciprocal_rank_fusion([dense, self._keyword_documents(query)], self.k, self.rrf_k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        dense = await self.dense_retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return reciprocal_rank_fusion([dense, self._keyword_documents(query)], self.k, self.rrf_k)
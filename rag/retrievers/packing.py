@@ -0,0 +1,170 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.callbacks import AsyncCallbackManagerForRetrieverRun, CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from rag.vectorstores.ingestion import count_tokens
+
+# Prompt tokens the packed context may take (GPT-4 has an 8k window for prompt and answer)
+DEFAULT_MAX_CONTEXT_TOKENS = 3000
+
+# Neighbouring chunks are at most this far apart: the splitter only strips whitespace between them
+_MAX_GAP_CHARS = 8
+# Shortest suffix/prefix match taken as the overlap of two chunks without offsets
+_MIN_TEXT_OVERLAP = 32
+
+
+class _Span:
+    """Contiguous text of one source, made of one or more retrieved chunks."""
+
+    def __init__(self, rank: int, doc: Document):
+        self.rank = rank  # Best retrieval rank of the merged chunks
+        self.best = doc
+        self.start: Optional[int] = doc.metadata.get("start_index")
+        self.text = doc.page_content
+        self.chunks = 1
+
+    @property
+    def end(self) -> int:
+        return self.start + len(self.text)
+
+    def absorb(self, other: "_Span", text: str) -> None:
+        self.text = text
+        self.chunks += other.chunks
+        if other.rank < self.rank:
+            self.rank, self.best = other.rank, other.best
+
+    def to_document(self) -> Document:
+        metadata = dict(self.best.metadata)
+        if self.start is not None:
+            metadata["start_index"] = self.start
+        if self.chunks > 1:
+            metadata["merged_chunks"] = self.chunks
+        return Document(id=self.best.id, page_content=self.text, metadata=metadata)
+
+
+def _source_key(doc: Document) -> Tuple[Any, Any]:
+    return doc.metadata.get("source"), doc.metadata.get("page")
+
+
+def _merge_by_offset(spans: List[_Span]) -> List[_Span]:
+    merged: List[_Span] = []
+    for span in sorted(spans, key=lambda s: s.start):
+        last = merged[-1] if merged else None
+        if last is None or span.start > last.end + _MAX_GAP_CHARS:
+            merged.append(span)
+            continue
+        overlap = last.end - span.start
+        if span.end <= last.end:
+            # Contained (e.g. the same chunk stored twice); keep it only if the texts disagree
+            if last.text[span.start - last.start:span.end - last.start] == span.text:
+                last.absorb(span, last.text)
+                continue
+        elif overlap < 0:
+            last.absorb(span, last.text + "\n" + span.text)
+            continue
+        elif last.text[len(last.text) - overlap:] == span.text[:overlap]:
+            last.absorb(span, last.text + span.text[overlap:])
+            continue
+        merged.append(span)
+    return merged
+
+
+def _text_overlap(head: str, tail: str) -> int:
+    """Length of the longest suffix of head that tail starts with (0 below _MIN_TEXT_OVERLAP)."""
+    probe = tail[:_MIN_TEXT_OVERLAP]
+    if len(probe) < _MIN_TEXT_OVERLAP:
+        return 0
+    position = head.find(probe)
+    while position != -1:
+        if tail.startswith(head[position:]):
+            return len(head) - position
+        position = head.find(probe, position + 1)
+    return 0
+
+
+def _merge_by_text(spans: List[_Span]) -> List[_Span]:
+    # Chunks indexed without start_index: find the overlaps in the texts themselves
+    merged: List[_Span] = []
+    for span in spans:
+        while True:
+            for i, other in enumerate(merged):
+                if span.text in other.text:
+                    text = other.text
+                elif other.text in span.text:
+                    text = span.text
+                elif _text_overlap(other.text, span.text):
+                    text = other.text + span.text[_text_overlap(other.text, span.text):]
+                elif _text_overlap(span.text, other.text):
+                    text = span.text + other.text[_text_overlap(span.text, other.text):]
+                else:
+                    continue
+                # The merged span may now join another one, so try again with it
+                other.absorb(span, text)
+                span = merged.pop(i)
+                break
+            else:
+                merged.append(span)
+                break
+    return merged
+
+
+def pack_documents(documents: Sequence[Document], max_tokens: Optional[int] = DEFAULT_MAX_CONTEXT_TOKENS) -> List[Document]:
+    """
+    Pack retrieved chunks into the context sent to the LLM.
+
+    Chunks of the same source (and page) that overlap or touch are merged
+    into one document, using their start_index offsets or, for chunks indexed
+    without offsets, the overlapping text itself; exact duplicates and chunks
+    contained in another one are dropped. The merged documents are then
+    taken in retrieval order (a merged document ranks as its best chunk)
+    while they fit into max_tokens; the best one is always kept.
+
+    Args:
+        documents: Retrieved chunks, best first
+        max_tokens: Token budget of the packed context, or None for no limit
+
+    Returns:
+        The packed documents, best first
+    """
+    groups: Dict[Tuple[Any, Any], List[_Span]] = {}
+    seen = set()
+    for rank, doc in enumerate(documents):
+        if doc.page_content in seen:
+            continue
+        seen.add(doc.page_content)
+        groups.setdefault(_source_key(doc), []).append(_Span(rank, doc))
+
+    spans: List[_Span] = []
+    for group in groups.values():
+        spans.extend(_merge_by_offset([span for span in group if span.start is not None]))
+        spans.extend(_merge_by_text([span for span in group if span.start is None]))
+    spans.sort(key=lambda span: span.rank)
+
+    packed = []
+    used = 0
+    for span in spans:
+        tokens = count_tokens(span.text)
+        if packed and max_tokens is not None and used + tokens > max_tokens:
+            continue
+        packed.append(span.to_document())
+        used += tokens
+    return packed
+
+
+class PackedRetriever(BaseRetriever):
+    """Retriever whose documents are packed with pack_documents, to cut duplicated prompt tokens."""
+
+    retriever: BaseRetriever
+    max_tokens: Optional[int] = DEFAULT_MAX_CONTEXT_TOKENS
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        documents = self.retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        return pack_documents(documents, self.max_tokens)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        documents = await self.retriever.ainvoke(query, config={"callbacks": run_manager.get_child()})
+        return pack_documents(documents, self.max_tokens)
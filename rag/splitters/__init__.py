@@ -0,0 +1,7 @@
+"""
+Module for text splitters used in RAG applications.
+"""
+
+from rag.splitters.offset_splitter import OffsetTextSplitter, TextChunk
+
+__all__ = ["OffsetTextSplitter", "TextChunk"]
@@ -0,0 +1,223 @@
+import re
+from bisect import bisect_left
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+from utils.tracing import span
+
+Span = Tuple[int, int]
+
+
+class TextChunk:
+    """
+    A chunk of a source text, kept as (start, end) offsets.
+
+    The text is only sliced out when .text is read, and every chunk of a
+    source document shares that document's string and metadata object.
+    """
+    __slots__ = ("source_text", "start", "end", "metadata")
+
+    def __init__(self, source_text: str, start: int, end: int, metadata: Dict[str, Any]):
+        self.source_text = source_text
+        self.start = start
+        self.end = end
+        self.metadata = metadata
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def __repr__(self) -> str:
+        return f"TextChunk(start={self.start}, end={self.end}, metadata={self.metadata!r})"
+
+    @property
+    def text(self) -> str:
+        return self.source_text[self.start:self.end]
+
+    def to_document(self, add_start_index: bool = False) -> Document:
+        """Materialize the chunk as a Document with its own copy of the metadata."""
+        metadata = dict(self.metadata)
+        if add_start_index:
+            metadata["start_index"] = self.start
+        return Document(page_content=self.text, metadata=metadata)
+
+
+class _SeparatorIndex:
+    """Positions of every separator in one text, found once and shared by all recursion levels."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self._positions: Dict[str, List[int]] = {}
+
+    def find(self, separator: str, start: int, end: int) -> List[int]:
+        """
+        Start positions of the non-overlapping occurrences of separator in
+        text[start:end], as re.split on that substring would find them.
+        """
+        if _overlaps_itself(separator) and start != 0:
+            # Matches of e.g. "\n\n" depend on where the scan starts, so scan this range itself
+            return _scan(self.text, separator, start, end)
+
+        positions = self._positions.get(separator)
+        if positions is None:
+            positions = self._positions[separator] = _scan(self.text, separator, 0, len(self.text))
+        return positions[bisect_left(positions, start):bisect_left(positions, end - len(separator) + 1)]
+
+
+class OffsetTextSplitter(RecursiveCharacterTextSplitter):
+    """
+    Drop-in RecursiveCharacterTextSplitter that works on character offsets.
+
+    Separator positions are found once per text, and splitting, merging and
+    whitespace stripping all operate on (start, end) offsets into the original
+    string, so no intermediate strings are built. The chunks are identical to
+    RecursiveCharacterTextSplitter's for literal separators with
+    keep_separator set and the default len length function; any other
+    configuration falls back to the parent implementation.
+
+    split_offsets() and iter_chunks() expose the offsets directly;
+    split_text() and split_documents() materialize strings and Documents as
+    usual. Documents get a shallow copy of the source metadata instead of a
+    deep copy, since callers add per-chunk fields such as doc_id to it.
+
+    Unlike the parent, add_start_index defaults to True: context packing
+    (rag.retrievers.packing) merges retrieved neighbour chunks by offset.
+    """
+
+    def __init__(self, *args: Any, add_start_index: bool = True, **kwargs: Any):
+        super().__init__(*args, add_start_index=add_start_index, **kwargs)
+
+    def split_offsets(self, text: str) -> List[Span]:
+        """(start, end) offsets of the chunks of text."""
+        return self._split_range(_SeparatorIndex(text), 0, len(text), self._separators)
+
+    def split_text(self, text: str) -> List[str]:
+        if not self._supports_offsets():
+            return super().split_text(text)
+        return [text[start:end] for start, end in self.split_offsets(text)]
+
+    def iter_chunks(self, documents: Iterable[Document]) -> Iterator[TextChunk]:
+        """
+        Split documents into TextChunks without materializing any chunk text.
+
+        All chunks of a document reference its page_content and share its
+        metadata dict (which must therefore not be mutated per chunk).
+        """
+        for doc in documents:
+            for start, end in self.split_offsets(doc.page_content):
+                yield TextChunk(doc.page_content, start, end, doc.metadata)
+
+    def create_documents(
+        self, texts: List[str], metadatas: Optional[List[Dict[Any, Any]]] = None
+    ) -> List[Document]:
+        with span("rag.split") as split_span:
+            if not self._supports_offsets():
+                documents = super().create_documents(texts, metadatas)
+            else:
+                metadatas = metadatas or [{}] * len(texts)
+                documents = []
+                for text, metadata in zip(texts, metadatas):
+                    for start, end in self.split_offsets(text):
+                        # start_index is the true offset rather than a text.find() guess
+                        documents.append(TextChunk(text, start, end, metadata).to_document(self._add_start_index))
+            split_span.set(documents=len(texts), chunks=len(documents))
+        return documents
+
+    def _supports_offsets(self) -> bool:
+        return (
+            self._keep_separator in (True, "start", "end")
+            and not self._is_separator_regex
+            and self._length_function is len
+        )
+
+    def _split_range(self, index: _SeparatorIndex, start: int, end: int, separators: List[str]) -> List[Span]:
+        # Mirrors RecursiveCharacterTextSplitter._split_text on text[start:end]
+        final_spans: List[Span] = []
+
+        separator = separators[-1]
+        new_separators: List[str] = []
+        for i, candidate in enumerate(separators):
+            if candidate == "":
+                separator = candidate
+                break
+            if index.find(candidate, start, end):
+                separator = candidate
+                new_separators = separators[i + 1:]
+                break
+
+        good_spans: List[Span] = []
+        for span in self._split_spans(index, start, end, separator):
+            if span[1] - span[0] < self._chunk_size:
+                good_spans.append(span)
+            else:
+                if good_spans:
+                    final_spans.extend(self._merge_spans(index.text, good_spans))
+                    good_spans = []
+                if not new_separators:
+                    final_spans.append(span)
+                else:
+                    final_spans.extend(self._split_range(index, span[0], span[1], new_separators))
+        if good_spans:
+            final_spans.extend(self._merge_spans(index.text, good_spans))
+        return final_spans
+
+    def _split_spans(self, index: _SeparatorIndex, start: int, end: int, separator: str) -> List[Span]:
+        if not separator:
+            return [(i, i + 1) for i in range(start, end)]
+
+        positions = index.find(separator, start, end)
+        if self._keep_separator == "end":
+            bounds = [start, *(p + len(separator) for p in positions), end]
+        else:
+            # Separators stay at the start of the following piece
+            bounds = [start, *positions, end]
+        return [(a, b) for a, b in zip(bounds, bounds[1:]) if a < b]
+
+    def _merge_spans(self, text: str, spans: List[Span]) -> List[Span]:
+        # Mirrors TextSplitter._merge_splits with an empty separator: consecutive
+        # spans are contiguous, so a merged chunk is just (first start, last end)
+        merged: List[Span] = []
+        current: deque = deque()
+        total = 0
+        for start, end in spans:
+            length = end - start
+            if total + length > self._chunk_size and current:
+                joined = self._join_span(text, current[0][0], current[-1][1])
+                if joined is not None:
+                    merged.append(joined)
+                while total > self._chunk_overlap or (total + length > self._chunk_size and total > 0):
+                    first_start, first_end = current.popleft()
+                    total -= first_end - first_start
+            current.append((start, end))
+            total += length
+        if current:
+            joined = self._join_span(text, current[0][0], current[-1][1])
+            if joined is not None:
+                merged.append(joined)
+        return merged
+
+    def _join_span(self, text: str, start: int, end: int) -> Optional[Span]:
+        if self._strip_whitespace:
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+        return (start, end) if start < end else None
+
+
+def _scan(text: str, separator: str, start: int, end: int) -> List[int]:
+    # Same leftmost, non-overlapping matches as re.split, without slicing text
+    return [match.start() for match in _pattern(separator).finditer(text, start, end)]
+
+
+@lru_cache(maxsize=64)
+def _pattern(separator: str) -> "re.Pattern[str]":
+    return re.compile(re.escape(separator))
+
+
+@lru_cache(maxsize=64)
+def _overlaps_itself(separator: str) -> bool:
+    return any(separator[:k] == separator[-k:] for k in range(1, len(separator)))
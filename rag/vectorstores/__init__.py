@@ -1,12 +1,21 @@
+import asyncio
+import dataclasses
 from enum import Enum
-from typing import List, Optional, Any
+from typing import Iterable, List, Optional, Any
 from langchain_core.documents import Document
 import os
 
 from rag.embeddings import get_openai_embeddings
-from rag.vectorstores.in_memory import create_in_memory_vectorstore
+from rag.vectorstores.in_memory import create_in_memory_vectorstore, acreate_in_memory_vectorstore
+from rag.vectorstores.numpy_store import NumpyVectorStore, create_numpy_vectorstore, acreate_numpy_vectorstore
 from rag.vectorstores.pinecone_store import setup_pinecone_vectorstore
 from rag.vectorstores.chromadb_store import setup_chromadb_vectorstore
+from rag.vectorstores.faiss_index import FaissIndexSpec
+from rag.vectorstores.ingestion import DEFAULT_MAX_TOKENS_PER_BATCH, DEFAULT_MAX_CONCURRENCY, delete_documents
+from rag.vectorstores.search import similarity_search_batch
+from rag.vectorstores.quantization import Quantization
+from rag.vectorstores.snapshot import MmapVectorStore, load_or_build_snapshot, save_snapshot, snapshot_exists, prune_snapshots
+from utils.tracing import traced
 
 # Define an enum for vectorstore types
 class VectorStoreType(str, Enum):
@@ -14,56 +23,119 @@ class VectorStoreType(str, Enum):
     PINECONE = "pinecone"
     CHROMA = "chroma"
     FAISS = "faiss"
+    NUMPY = "numpy"
 
+@traced("rag.vectorstore")
 def get_vectorstore(
-    documents: List[Document], 
+    documents: Iterable[Document], 
     embedding_model: object,
     namespace: Optional[str] = None,
     collection_name: Optional[str] = None,
     vectorstore_type: VectorStoreType = VectorStoreType.IN_MEMORY,
     index_name: str = "langchain-doc-embeddings",
     force_reload: bool = False,
-    persist_directory: str = "./faiss_indexes"
+    persist_directory: str = "./faiss_indexes",
+    chroma_db_path: str = "./chroma_db",
+    faiss_index_spec: Optional[FaissIndexSpec] = None,
+    embedding_batch_tokens: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    embedding_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    snapshot_path: Optional[str] = None,
+    quantization: Quantization = Quantization.NONE
 ):
     """
     Create or get a vectorstore based on the specified type
     
     Args:
-        documents: List of Document objects to store
+        documents: List of Document objects to store, or an iterator of them (see
+            rag.pipeline.stream_documents) to embed and write them as they are
+            produced. Pinecone and Chroma still collect streamed documents first
         embedding_model: Embedding model to use. If None, will use OpenAI embeddings
-        vectorstore_type: Type of vectorstore to create (IN_MEMORY or PINECONE)
+        vectorstore_type: Type of vectorstore to create (IN_MEMORY, NUMPY, PINECONE, CHROMA or FAISS)
         index_name: Name of the index (for Pinecone)
         force_reload: Whether to force reload the index with new documents (for Pinecone)
+        persist_directory: Directory of the saved indexes (for FAISS)
+        chroma_db_path: Directory of the Chroma database (for Chroma)
+        faiss_index_spec: Index kind (Flat, IVF-Flat, IVF-PQ, HNSW) and search parameters (for FAISS)
+        embedding_batch_tokens: Maximum tokens per embedding request during ingestion
+        embedding_concurrency: Maximum embedding requests in flight during ingestion
+        snapshot_path: Snapshot directory for IN_MEMORY/NUMPY stores. The store is
+            built and saved there on first use, and later calls (from any worker
+            process) map the existing snapshot read-only instead of re-embedding
+        quantization: Search through int8 or binary codes of the vectors and re-rank
+            the candidates with the full vectors (for NUMPY, FAISS and snapshots)
     
     Returns:
         A vectorstore instance
         
     Raises:
-        ValueError: If vectorstore_type is not supported
+        ValueError: If vectorstore_type is not supported, or does not support quantization
     """
     # if embedding_model is None:
     #     embedding_model = get_openai_embeddings()
+    
+    quantization = Quantization(quantization)
+    if quantization != Quantization.NONE:
+        _check_quantization(vectorstore_type, snapshot_path)
+        if vectorstore_type == VectorStoreType.FAISS:
+            faiss_index_spec = dataclasses.replace(faiss_index_spec or FaissIndexSpec(), quantization=quantization)
+    
+    if documents is not None and not isinstance(documents, list) and vectorstore_type in (
+        VectorStoreType.PINECONE, VectorStoreType.CHROMA
+    ):
+        # Their existence checks need the full list of candidate IDs up front
+        documents = list(documents)
+    
+    if snapshot_path and vectorstore_type in (VectorStoreType.IN_MEMORY, VectorStoreType.NUMPY):
+        return load_or_build_snapshot(
+            snapshot_path,
+            embedding_model=embedding_model,
+            build=lambda: create_numpy_vectorstore(
+                documents=documents,
+                embedding_model=embedding_model,
+                max_tokens_per_batch=embedding_batch_tokens,
+                max_concurrency=embedding_concurrency
+            ),
+            force_reload=force_reload,
+            quantization=quantization
+        )
         
     if vectorstore_type == VectorStoreType.IN_MEMORY:
         # In-memory store doesn't support appending, always creates new store
-        return create_in_memory_vectorstore(documents=documents, embedding_model=embedding_model)
+        return create_in_memory_vectorstore(
+            documents=documents,
+            embedding_model=embedding_model,
+            max_tokens_per_batch=embedding_batch_tokens,
+            max_concurrency=embedding_concurrency
+        )
+    elif vectorstore_type == VectorStoreType.NUMPY:
+        vectorstore = create_numpy_vectorstore(
+            documents=documents,
+            embedding_model=embedding_model,
+            max_tokens_per_batch=embedding_batch_tokens,
+            max_concurrency=embedding_concurrency
+        )
+        vectorstore.quantize(quantization)
+        return vectorstore
     elif vectorstore_type == VectorStoreType.PINECONE:
         return setup_pinecone_vectorstore(
             documents=documents,
             embedding_model=embedding_model,
             namespace=namespace,
-            collection_name=collection_name,
             index_name=index_name,
-            force_reload=force_reload
+            force_reload=force_reload,
+            max_tokens_per_batch=embedding_batch_tokens,
+            max_concurrency=embedding_concurrency
         )
     elif vectorstore_type == VectorStoreType.CHROMA:
         return setup_chromadb_vectorstore(
             documents=documents,
             embedding_model=embedding_model,
-            namespace=namespace,
             collection_name=collection_name,
             index_name=index_name,
-            force_reload=force_reload
+            persist_directory=chroma_db_path,
+            force_reload=force_reload,
+            max_tokens_per_batch=embedding_batch_tokens,
+            max_concurrency=embedding_concurrency
         )
     elif vectorstore_type == VectorStoreType.FAISS:
         from rag.vectorstores.faiss_store import setup_faiss_vectorstore
@@ -72,7 +144,83 @@ def get_vectorstore(
             embedding_model=embedding_model,
             index_name=index_name,
             persist_directory=persist_directory,
-            force_reload=force_reload
+            force_reload=force_reload,
+            max_tokens_per_batch=embedding_batch_tokens,
+            max_concurrency=embedding_concurrency,
+            index_spec=faiss_index_spec
         )
     else:
-        raise ValueError(f"Unsupported vectorstore type: {vectorstore_type}") 
\ No newline at end of file
+        raise ValueError(f"Unsupported vectorstore type: {vectorstore_type}")
+
+@traced("rag.vectorstore")
+async def aget_vectorstore(
+    documents: Iterable[Document], 
+    embedding_model: object,
+    namespace: Optional[str] = None,
+    collection_name: Optional[str] = None,
+    vectorstore_type: VectorStoreType = VectorStoreType.IN_MEMORY,
+    index_name: str = "langchain-doc-embeddings",
+    force_reload: bool = False,
+    persist_directory: str = "./faiss_indexes",
+    chroma_db_path: str = "./chroma_db",
+    faiss_index_spec: Optional[FaissIndexSpec] = None,
+    embedding_batch_tokens: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    embedding_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    snapshot_path: Optional[str] = None,
+    quantization: Quantization = Quantization.NONE
+):
+    """
+    Async variant of get_vectorstore.
+    
+    The in-memory stores are populated with async embedding calls. The other
+    stores, snapshots (which take a file lock) and streamed documents do
+    blocking I/O and are set up on the default thread pool.
+    """
+    # Streamed documents are pulled by blocking pipeline stages
+    streamed = documents is not None and not isinstance(documents, list)
+    quantization = Quantization(quantization)
+    
+    if vectorstore_type == VectorStoreType.IN_MEMORY and not snapshot_path and not streamed and quantization == Quantization.NONE:
+        return await acreate_in_memory_vectorstore(
+            documents=documents,
+            embedding_model=embedding_model,
+            max_tokens_per_batch=embedding_batch_tokens,
+            max_concurrency=embedding_concurrency
+        )
+    if vectorstore_type == VectorStoreType.NUMPY and not snapshot_path and not streamed:
+        vectorstore = await acreate_numpy_vectorstore(
+            documents=documents,
+            embedding_model=embedding_model,
+            max_tokens_per_batch=embedding_batch_tokens,
+            max_concurrency=embedding_concurrency
+        )
+        vectorstore.quantize(quantization)
+        return vectorstore
+    
+    return await asyncio.to_thread(
+        get_vectorstore,
+        documents=documents,
+        embedding_model=embedding_model,
+        namespace=namespace,
+        collection_name=collection_name,
+        vectorstore_type=vectorstore_type,
+        index_name=index_name,
+        force_reload=force_reload,
+        persist_directory=persist_directory,
+        chroma_db_path=chroma_db_path,
+        faiss_index_spec=faiss_index_spec,
+        embedding_batch_tokens=embedding_batch_tokens,
+        embedding_concurrency=embedding_concurrency,
+        snapshot_path=snapshot_path,
+        quantization=quantization
+    )
+
+def _check_quantization(vectorstore_type: VectorStoreType, snapshot_path: Optional[str]) -> None:
+    if vectorstore_type in (VectorStoreType.NUMPY, VectorStoreType.FAISS):
+        return
+    if vectorstore_type == VectorStoreType.IN_MEMORY and snapshot_path:
+        return
+    raise ValueError(
+        f"Quantization is not supported for {VectorStoreType(vectorstore_type).value} vectorstores; "
+        "use the numpy or faiss vectorstore, or an in_memory one with a snapshot path"
+    )
@@ -1,19 +1,50 @@
-from typing import List
+from typing import Any, Iterable, List, Set
 import chromadb
 from langchain_core.documents import Document
 from langchain_chroma import Chroma
 
+from rag.vectorstores.ingestion import ingest_documents, DEFAULT_MAX_TOKENS_PER_BATCH, DEFAULT_MAX_BATCH_SIZE, DEFAULT_MAX_CONCURRENCY
+
+try:
+    from chromadb.errors import NotFoundError
+except ImportError:  # chromadb < 0.6 raises ValueError for missing collections
+    NotFoundError = ValueError
+
+def get_max_batch_size(client: Any) -> int:
+    """Largest number of records Chroma accepts in one request."""
+    get_limit = getattr(client, "get_max_batch_size", None)
+    return get_limit() if get_limit else DEFAULT_MAX_BATCH_SIZE
+
+def fetch_existing_ids(collection: Any, ids: Iterable[str], page_size: int) -> Set[str]:
+    """
+    Find which of the given IDs are stored in a Chroma collection.
+
+    Only the candidate IDs are looked up, page_size at a time, and only IDs are
+    returned (no documents, metadatas or embeddings), so the cost depends on the
+    number of candidates rather than on the size of the collection.
+    """
+    ids = list(ids)
+    existing = set()
+    for start in range(0, len(ids), page_size):
+        existing.update(collection.get(ids=ids[start:start + page_size], include=[])["ids"])
+    return existing
+
 def setup_chromadb_vectorstore(
     documents: List[Document],
     embedding_model: object,
     index_name: str = "langchain-doc-embeddings",
     collection_name: str = None,
     persist_directory: str = "./chroma_db",
-    force_reload: bool = False
+    force_reload: bool = False,
+    max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
 ) -> Chroma:
     """
     Create or get a ChromaDB vectorstore
     
+    Only documents whose doc_id is not in the collection yet are embedded and
+    added, so re-running ingestion costs time proportional to the new chunks.
+    
     Args:
         documents: List of Document objects to store
         embedding_model: Embedding model to use for generating vectors
@@ -21,6 +52,8 @@ def setup_chromadb_vectorstore(
         collection_name: Name of the collection for multi-user isolation
         persist_directory: Directory to persist the ChromaDB data
         force_reload: Whether to force reload the collection with new documents
+        max_tokens_per_batch: Maximum tokens per embedding request
+        max_concurrency: Maximum embedding requests in flight
     
     Returns:
         A Chroma vectorstore instance
@@ -36,7 +69,7 @@ def setup_chromadb_vectorstore(
         try:
             client.delete_collection(name=collection_name)
             print(f"Deleted existing collection: {collection_name}")
-        except ValueError:
+        except NotFoundError:
             # Collection doesn't exist, that's fine
             pass
     
@@ -44,21 +77,31 @@ def setup_chromadb_vectorstore(
     vectorstore = Chroma(
         client=client,
         collection_name=collection_name,
-        embedding_function=embedding_model,
-        ids=[doc.metadata.get('doc_id') for doc in documents] if documents else None
+        embedding_function=embedding_model
     )
     
     # Add documents if provided
     if documents:
-        # Get existing IDs
-        existing_ids = set(vectorstore._collection.get()['ids'])
+        max_batch_size = get_max_batch_size(client)
+        
+        # Check only the candidate IDs; a reloaded collection is empty anyway
+        existing_ids = set()
+        if not force_reload:
+            candidate_ids = dict.fromkeys(doc.metadata['doc_id'] for doc in documents if doc.metadata.get('doc_id'))
+            existing_ids = fetch_existing_ids(vectorstore._collection, candidate_ids, max_batch_size)
         new_docs = [doc for doc in documents if doc.metadata.get('doc_id') not in existing_ids]
         
+        added = 0
         if new_docs:
-            print(f"Adding {len(new_docs)} new documents to collection: {collection_name}")
-            vectorstore.add_documents(
+            added = ingest_documents(
+                vectorstore,
                 new_docs,
-                ids=[doc.metadata.get('doc_id') for doc in new_docs]
+                embedding_model,
+                max_tokens_per_batch=max_tokens_per_batch,
+                max_batch_size=min(DEFAULT_MAX_BATCH_SIZE, max_batch_size),
+                max_concurrency=max_concurrency
             )
-        
-    return vectorstore 
\ No newline at end of file
+        print(f"Collection {collection_name}: added {added} documents, "
+              f"skipped {len(documents) - added} already stored or repeated")
+    
+    return vectorstore
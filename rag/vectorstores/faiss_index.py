@@ -0,0 +1,218 @@
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+import faiss
+import numpy as np
+
+from rag.vectorstores.quantization import Quantization, rerank_factor_for
+
+# k-means wants at least this many training points per centroid (faiss warns below it)
+MIN_POINTS_PER_CENTROID = 39
+# and uses at most this many, so larger training samples are wasted
+MAX_POINTS_PER_CENTROID = 256
+# Centroids of a PQ sub-quantizer (8 bits per code)
+PQ_CENTROIDS = 256
+
+# Vectors needed before an IVF index with an automatic nlist is trained
+DEFAULT_MIN_TRAINING_VECTORS = 10000
+# Vectors needed before a quantized index is built; below that flat search is as cheap
+MIN_QUANTIZED_VECTORS = 1000
+# Training sample of scalar quantizers and LSH thresholds (per-dimension statistics)
+QUANTIZER_TRAINING_SAMPLE = 65536
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+
+_IVF = re.compile(r"^IVF(\d*),")
+_PQ = re.compile(r",PQ(\d+)")
+_HNSW = re.compile(r"^HNSW\d+$")
+
+
+@dataclass
+class FaissIndexSpec:
+    """
+    Kind of FAISS index to build and how to search it.
+
+    factory is a faiss.index_factory string:
+        "Flat"              exact search (default)
+        "IVF{nlist},Flat"   inverted lists over full vectors
+        "IVF{nlist},PQ{m}"  inverted lists over m-byte product-quantized codes
+        "HNSW{M}"           graph with M neighbours per node
+    nlist may be left out ("IVF,PQ16"), it is then set to about 4 * sqrt(n)
+    when the index is trained.
+
+    quantization stores int8 codes (SQ8) or, for "Flat" only, 1-bit codes
+    (LSH) in place of the full vectors of "Flat", "IVF{nlist},Flat" and
+    "HNSW{M}", and keeps the full vectors in a refinement index ("RFlat"):
+    the codes find rerank_factor * k candidates, which are then re-ranked
+    with exact distances.
+
+    Indexes that need training stay flat until min_training_vectors() vectors
+    exist, and are then trained on a sample of them.
+    """
+    factory: str = "Flat"
+    nprobe: int = DEFAULT_NPROBE
+    ef_search: int = DEFAULT_EF_SEARCH
+    min_vectors: int = DEFAULT_MIN_TRAINING_VECTORS
+    quantization: Quantization = Quantization.NONE
+    rerank_factor: Optional[int] = None
+
+    def __post_init__(self):
+        self.quantization = Quantization(self.quantization)
+        self._quantized_factory(self.factory)
+
+    @property
+    def is_flat(self) -> bool:
+        return self.factory == "Flat" and self.quantization == Quantization.NONE
+
+    @property
+    def nlist(self) -> Optional[int]:
+        match = _IVF.match(self.factory)
+        return int(match.group(1)) if match and match.group(1) else None
+
+    def min_training_vectors(self) -> int:
+        """Number of vectors needed before the index can be built (0 for no training)."""
+        required = MIN_QUANTIZED_VECTORS if self.quantization != Quantization.NONE else 0
+        if not _IVF.match(self.factory):
+            return required
+        required = max(required, self.nlist * MIN_POINTS_PER_CENTROID if self.nlist else self.min_vectors)
+        if _PQ.search(self.factory):
+            required = max(required, PQ_CENTROIDS * MIN_POINTS_PER_CENTROID)
+        return required
+
+    def resolve(self, ntotal: int) -> str:
+        """The factory string to build for ntotal vectors: automatic nlist filled in, quantization applied."""
+        factory = self.factory
+        match = _IVF.match(factory)
+        if match and not match.group(1):
+            nlist = int(4 * math.sqrt(ntotal))
+            nlist = max(1, min(nlist, ntotal // MIN_POINTS_PER_CENTROID))
+            factory = f"IVF{nlist}," + factory[match.end():]
+        return self._quantized_factory(factory)
+
+    def _quantized_factory(self, factory: str) -> str:
+        """
+        Raises:
+            ValueError: If the quantization cannot be applied to factory
+        """
+        if self.quantization == Quantization.NONE:
+            return factory
+        if self.quantization == Quantization.BINARY:
+            if factory != "Flat":
+                raise ValueError(f"Binary quantization only applies to the 'Flat' FAISS index, not '{factory}'")
+            return "LSHt,RFlat"
+        if factory == "Flat":
+            return "SQ8,RFlat"
+        if _IVF.match(factory) and factory.endswith(",Flat"):
+            return factory[:-len("Flat")] + "SQ8,RFlat"
+        if _HNSW.match(factory):
+            return f"{factory}_SQ8,RFlat"
+        raise ValueError(f"int8 quantization applies to 'Flat', 'IVF{{nlist}},Flat' and 'HNSW{{M}}' indexes, not '{factory}'")
+
+
+def is_flat_index(index: Any) -> bool:
+    return isinstance(faiss.downcast_index(index), faiss.IndexFlat)
+
+
+def index_bytes(index: Any) -> Dict[str, int]:
+    """
+    Approximate bytes of an index's full vectors and of its codes (which
+    excludes inverted list and graph overhead).
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        return {
+            "vector_bytes": index.refine_index.ntotal * index.d * 4,
+            "code_bytes": index_bytes(index.base_index)["code_bytes"]
+        }
+    if isinstance(index, faiss.IndexFlat):
+        return {"vector_bytes": index.ntotal * index.code_size, "code_bytes": 0}
+    storage = getattr(index, "storage", None)  # HNSW
+    code_size = getattr(faiss.downcast_index(storage) if storage is not None else index, "code_size", index.d * 4)
+    return {"vector_bytes": 0, "code_bytes": index.ntotal * code_size}
+
+
+def tune_index(index: Any, spec: FaissIndexSpec) -> None:
+    """Apply the spec's search-time parameters (nprobe, efSearch, re-ranking depth) to a built index."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        index.k_factor = rerank_factor_for(spec.quantization, spec.rerank_factor)
+        index = faiss.downcast_index(index.base_index)
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(spec.nprobe, ivf.nlist)
+    hnsw = getattr(index, "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = spec.ef_search
+
+
+def search_parameters(index: Any, spec: FaissIndexSpec) -> Optional[Any]:
+    """
+    The spec's search-time parameters for a single search of a built index.
+
+    Unlike tune_index, the index itself is left untouched, so callers sharing
+    one index can each search it with their own nprobe, efSearch and
+    re-ranking depth. None for indexes without search parameters (Flat).
+    """
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexRefine):
+        if spec.quantization == Quantization.NONE and not spec.rerank_factor:
+            # A spec without quantization says nothing about the re-ranking depth
+            k_factor = index.k_factor
+        else:
+            k_factor = rerank_factor_for(spec.quantization, spec.rerank_factor)
+        return faiss.IndexRefineSearchParameters(
+            k_factor=k_factor,
+            base_index_params=search_parameters(index.base_index, spec)
+        )
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(nprobe=min(spec.nprobe, ivf.nlist))
+    if getattr(index, "hnsw", None) is not None:
+        return faiss.SearchParametersHNSW(efSearch=spec.ef_search)
+    return None
+
+
+def build_index(spec: FaissIndexSpec, vectors: np.ndarray, metric_type: int, seed: int = 0) -> Any:
+    """
+    Build a populated index of the spec's kind from vectors, training it on a
+    random sample when it needs training.
+
+    Raises:
+        ValueError: If the factory string is invalid for the vectors' dimension
+            or there are too few vectors to train the index
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    ntotal, d = vectors.shape
+    if ntotal < spec.min_training_vectors():
+        raise ValueError(
+            f"FAISS index '{spec.factory}' needs {spec.min_training_vectors()} vectors to train, got {ntotal}"
+        )
+    factory = spec.resolve(ntotal)
+    try:
+        index = faiss.index_factory(d, factory, metric_type)
+    except RuntimeError as e:
+        raise ValueError(f"Invalid FAISS index spec '{factory}' for dimension {d}: {e}")
+
+    coarse = faiss.downcast_index(index.base_index) if isinstance(index, faiss.IndexRefine) else index
+    if isinstance(coarse, faiss.IndexIVFPQ):
+        # Polysemous codes are only used by Hamming-filtered search, and their training dominates the build
+        coarse.do_polysemous_training = False
+
+    if not index.is_trained:
+        nlist = getattr(faiss.try_extract_index_ivf(index), "nlist", 0)
+        sample_size = MAX_POINTS_PER_CENTROID * max(nlist, PQ_CENTROIDS if _PQ.search(factory) else 0)
+        # Scalar quantizers and LSH only learn per-dimension ranges and thresholds
+        sample_size = sample_size or QUANTIZER_TRAINING_SAMPLE
+        sample = vectors
+        if ntotal > sample_size:
+            sample = vectors[np.random.default_rng(seed).choice(ntotal, sample_size, replace=False)]
+        index.train(sample)
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        # reconstruct() (used by MMR search) needs the id -> list map
+        ivf.set_direct_map_type(faiss.DirectMap.Array)
+    index.add(vectors)
+    tune_index(index, spec)
+    return index
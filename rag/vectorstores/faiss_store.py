@@ -1,24 +1,539 @@
+import dataclasses
 import os
-from typing import List, Optional
+import pickle
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import faiss
+import numpy as np
 from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 
+from rag.vectorstores.ingestion import ingest_documents, DEFAULT_MAX_TOKENS_PER_BATCH, DEFAULT_MAX_CONCURRENCY
+from rag.vectorstores.faiss_index import FaissIndexSpec, build_index, index_bytes, is_flat_index, search_parameters
+
+# Maps the vectors of flat indexes (and HNSW storage, IVF lists) instead of reading them;
+# older faiss versions have no such flag and read the index fully
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+
+# The delta segment is folded into the base file once it holds this fraction of the base's vectors
+DEFAULT_COMPACT_RATIO = 0.25
+
+# Loaded indexes per (faiss_dir, index_name), with the file stamps they were loaded from
+_registry: Dict[Tuple[str, str], Tuple[tuple, "SegmentedFAISS"]] = {}
+_registry_lock = threading.Lock()
+
+# Spec whose search parameters the searches of the current call use
+_search_spec: ContextVar[Optional[FaissIndexSpec]] = ContextVar("faiss_search_spec", default=None)
+
+
+@contextmanager
+def _searching_with(spec: FaissIndexSpec) -> Iterator[None]:
+    token = _search_spec.set(spec)
+    try:
+        yield
+    finally:
+        _search_spec.reset(token)
+
+
+class _ReadWriteLock:
+    """
+    Lock held by any number of readers at once or by a single writer. A
+    waiting writer holds off new readers, so steady searches cannot starve it.
+    Neither side is reentrant.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writing = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._condition:
+            self._condition.wait_for(lambda: not self._writing and not self._waiting_writers)
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._condition:
+            self._waiting_writers += 1
+            try:
+                self._condition.wait_for(lambda: not self._writing and not self._readers)
+            finally:
+                self._waiting_writers -= 1
+            self._writing = True
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._writing = False
+                self._condition.notify_all()
+
+
+def segment_paths(faiss_dir: str, index_name: str) -> Dict[str, str]:
+    """Paths of the base and delta segment files of an index."""
+    return {
+        "base_index": os.path.join(faiss_dir, f"{index_name}.faiss"),
+        "base_docstore": os.path.join(faiss_dir, f"{index_name}.pkl"),
+        "delta_index": os.path.join(faiss_dir, f"{index_name}.delta.faiss"),
+        "delta_docstore": os.path.join(faiss_dir, f"{index_name}.delta.pkl"),
+    }
+
+
+def _files_stamp(faiss_dir: str, index_name: str) -> tuple:
+    stamp = []
+    for path in segment_paths(faiss_dir, index_name).values():
+        try:
+            stat = os.stat(path)
+            stamp.append((stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            stamp.append(None)
+    return tuple(stamp)
+
+
+def _atomic_write(path: str, write) -> None:
+    # Readers that mapped the old file keep their view; new readers see the complete new file
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _write_docstore(path: str, docstore: InMemoryDocstore, index_to_docstore_id: Dict[int, str]) -> None:
+    def write(tmp_path):
+        with open(tmp_path, "wb") as f:
+            pickle.dump((docstore, index_to_docstore_id), f)
+    _atomic_write(path, write)
+
+
+def _remove(*paths: str) -> None:
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class SegmentIndex:
+    """
+    Index facade over a read-only base segment and an in-memory delta segment.
+
+    Searches run over both segments (through faiss.IndexShards, with the delta
+    IDs numbered after the base ones) and additions only ever go to the delta,
+    so the base can stay memory-mapped: a mapped faiss index cannot be grown.
+    """
+
+    def __init__(self, base: Any, delta: Optional[Any] = None):
+        self.base = base
+        self.delta = delta if delta is not None else faiss.IndexFlat(base.d, base.metric_type)
+        self._shards = faiss.IndexShards(base.d, False, True)
+        self._shards.add_shard(self.base)
+        self._shards.add_shard(self.delta)
+
+    @property
+    def d(self) -> int:
+        return self.base.d
+
+    @property
+    def metric_type(self) -> int:
+        return self.base.metric_type
+
+    @property
+    def ntotal(self) -> int:
+        return self.base.ntotal + self.delta.ntotal
+
+    def search(self, x: np.ndarray, k: int, **kwargs: Any):
+        spec = _search_spec.get()
+        if spec is not None and "params" not in kwargs:
+            # IndexShards hands the parameters to both segments; the flat delta ignores them
+            kwargs["params"] = search_parameters(self.base, spec)
+        return self._shards.search(x, k, **kwargs)
+
+    def add(self, x: np.ndarray) -> None:
+        self.delta.add(x)
+        self._shards.syncWithSubIndexes()
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        if key < self.base.ntotal:
+            return self.base.reconstruct(key)
+        return self.delta.reconstruct(key - self.base.ntotal)
+
+    def vectors(self) -> np.ndarray:
+        """All vectors in ID order (approximated for product-quantized bases)."""
+        return np.vstack([self.base.reconstruct_n(0, self.base.ntotal), self.delta.reconstruct_n(0, self.delta.ntotal)])
+
+    def remove_ids(self, ids: np.ndarray) -> int:
+        if self.delta.ntotal:
+            raise RuntimeError("Merge the delta segment into the base before removing vectors")
+        if is_flat_index(self.base):
+            removed = self.base.remove_ids(ids)
+        else:
+            # IVF keeps the IDs of the remaining vectors and HNSW cannot remove at
+            # all, while FAISS.delete expects the remaining vectors renumbered
+            keep = np.setdiff1d(np.arange(self.base.ntotal), ids)
+            vectors = self.base.reconstruct_batch(keep) if len(keep) else None
+            removed = self.base.ntotal - len(keep)
+            self.base.reset()
+            if vectors is not None:
+                self.base.add(vectors)
+        self._shards.syncWithSubIndexes()
+        return removed
+
+
+class SegmentedFAISS(FAISS):
+    """
+    FAISS vectorstore persisted as a base segment plus a delta segment.
+
+    The base segment is memory-mapped when loaded, so opening a large index is
+    near-instant and the OS pages vectors in as searches touch them (and shares
+    those pages between processes). Added documents go to the delta segment,
+    and save_local() only rewrites the delta files. The base is rewritten, with
+    the delta merged in, after deletions or once the delta outgrows
+    compact_ratio of the base.
+
+    The base is built as index_spec describes (see FaissIndexSpec). Kinds that
+    need training (IVF) keep a flat base until enough vectors exist; the base
+    is then trained and rebuilt at the next save. An existing base keeps its
+    kind, only the search parameters of index_spec apply to it. They are
+    passed with every search rather than set on the index, and
+    with_index_spec() gives a view searching the same store with another
+    spec's parameters.
+
+    Searches run concurrently, as each passes its own search parameters.
+    Writes (additions, deletions, merges and saves) hold the store's lock
+    exclusively, since adding to the delta segment resynchronizes the shards a
+    search is reading.
+
+    The base files are the regular FAISS.save_local files, so FAISS.load_local
+    can still read them (without the delta).
+    """
+
+    def __init__(
+        self,
+        embedding_function: Any,
+        index: Any,
+        docstore: InMemoryDocstore,
+        index_to_docstore_id: Dict[int, str],
+        mapped: bool = False,
+        compact_ratio: float = DEFAULT_COMPACT_RATIO,
+        index_spec: Optional[FaissIndexSpec] = None,
+        **kwargs: Any
+    ):
+        if not isinstance(index, SegmentIndex):
+            index = SegmentIndex(index)
+        super().__init__(embedding_function, index, docstore, index_to_docstore_id, **kwargs)
+        self.mapped = mapped
+        self.compact_ratio = compact_ratio
+        self.index_spec = index_spec or FaissIndexSpec()
+        # Set when the base segment no longer matches the base files on disk
+        self._base_dirty = False
+        self._lock = _ReadWriteLock()
+        # Views by spec, so callers with equal specs share one (and its keyword index)
+        self._views: Dict[tuple, "SegmentedFAISS"] = {}
+
+    @classmethod
+    def from_faiss(cls, vectorstore: FAISS, **kwargs: Any) -> "SegmentedFAISS":
+        """Wrap an in-memory FAISS vectorstore, using its whole index as the base segment."""
+        segmented = cls(
+            vectorstore.embedding_function,
+            vectorstore.index,
+            vectorstore.docstore,
+            vectorstore.index_to_docstore_id,
+            relevance_score_fn=vectorstore.override_relevance_score_fn,
+            normalize_L2=vectorstore._normalize_L2,
+            distance_strategy=vectorstore.distance_strategy,
+            **kwargs
+        )
+        segmented._base_dirty = True
+        return segmented
+
+    @classmethod
+    def load_segments(
+        cls,
+        faiss_dir: str,
+        index_name: str,
+        embedding_model: Any,
+        mmap: bool = True,
+        **kwargs: Any
+    ) -> "SegmentedFAISS":
+        """
+        Load an index saved by save_local (or by FAISS.save_local), mapping the
+        base segment when mmap is True and the faiss build supports it.
+        """
+        paths = segment_paths(faiss_dir, index_name)
+        mapped = mmap and MMAP_FLAG is not None
+        base = faiss.read_index(paths["base_index"], MMAP_FLAG) if mapped else faiss.read_index(paths["base_index"])
+        with open(paths["base_docstore"], "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+
+        delta = None
+        if os.path.exists(paths["delta_index"]) and os.path.exists(paths["delta_docstore"]):
+            delta = faiss.read_index(paths["delta_index"])
+            with open(paths["delta_docstore"], "rb") as f:
+                delta_docstore, delta_ids = pickle.load(f)
+            if len(delta_ids) == delta.ntotal:
+                docstore.add(delta_docstore._dict)
+                index_to_docstore_id.update({base.ntotal + i: doc_id for i, doc_id in delta_ids.items()})
+            else:
+                # A save was interrupted between the two delta files; its documents get re-added
+                print(f"Ignoring inconsistent delta segment of FAISS index '{index_name}'")
+                delta = None
+
+        return cls(embedding_model, SegmentIndex(base, delta), docstore, index_to_docstore_id, mapped=mapped, **kwargs)
+
+    def with_index_spec(self, index_spec: FaissIndexSpec) -> "SegmentedFAISS":
+        """
+        A view of this store searching with index_spec's parameters (nprobe,
+        efSearch, re-ranking depth). The view shares the index, documents and
+        lock, so writes through either are seen by both.
+        """
+        store = self._shared_store()
+        key = dataclasses.astuple(index_spec)
+        with store._lock.write():
+            view = store._views.get(key)
+            if view is None:
+                view = store._views[key] = _SpecView(store, index_spec)
+        return view
+
+    def _shared_store(self) -> "SegmentedFAISS":
+        return self
+
+    def similarity_search_with_score_by_vector(self, embedding, k=4, filter=None, fetch_k=20, **kwargs):
+        with self._lock.read(), _searching_with(self.index_spec):
+            return super().similarity_search_with_score_by_vector(embedding, k, filter, fetch_k, **kwargs)
+
+    def max_marginal_relevance_search_with_score_by_vector(self, embedding, *, k=4, fetch_k=20, lambda_mult=0.5, filter=None):
+        with self._lock.read(), _searching_with(self.index_spec):
+            return super().max_marginal_relevance_search_with_score_by_vector(
+                embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter
+            )
+
+    def add_embeddings(self, text_embeddings, metadatas=None, ids=None, **kwargs):
+        with self._lock.write():
+            return super().add_embeddings(text_embeddings, metadatas=metadatas, ids=ids, **kwargs)
+
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        with self._lock.write():
+            return super().add_texts(texts, metadatas=metadatas, ids=ids, **kwargs)
+
+    async def aadd_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        embeddings = await self._aembed_documents(texts)
+        return self.add_embeddings(zip(texts, embeddings), metadatas=metadatas, ids=ids, **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        with self._lock.write():
+            self._merge_segments()
+            return super().delete(ids, **kwargs)
+
+    def merge_from(self, target: FAISS) -> None:
+        with self._lock.write():
+            self._merge_segments()
+            self.index.base.merge_from(target.index)
+            self.index._shards.syncWithSubIndexes()
+            # FAISS.merge_from would merge the indexes again; only merge the documents
+            starting_len = len(self.index_to_docstore_id)
+            for i, target_id in target.index_to_docstore_id.items():
+                self.docstore.add({target_id: target.docstore.search(target_id)})
+                self.index_to_docstore_id[starting_len + i] = target_id
+
+    def save_local(self, folder_path: str, index_name: str = "index") -> None:
+        """
+        Persist the index, writing only the delta segment when the base files
+        are up to date, and register it as the process-wide instance.
+        """
+        with self._lock.write():
+            os.makedirs(folder_path, exist_ok=True)
+            paths = segment_paths(folder_path, index_name)
+            base_ntotal = self.index.base.ntotal
+            delta_ntotal = self.index.delta.ntotal
+
+            rewrite_base = (
+                self._base_dirty
+                or not os.path.exists(paths["base_index"])
+                or delta_ntotal > self.compact_ratio * base_ntotal
+                or self._needs_training()
+            )
+            if rewrite_base:
+                self._merge_segments()
+                _atomic_write(paths["base_index"], lambda tmp: faiss.write_index(self.index.base, tmp))
+                _write_docstore(paths["base_docstore"], self.docstore, self.index_to_docstore_id)
+                _remove(paths["delta_index"], paths["delta_docstore"])
+                self._base_dirty = False
+            elif delta_ntotal:
+                delta_ids = {i - base_ntotal: doc_id for i, doc_id in self.index_to_docstore_id.items() if i >= base_ntotal}
+                delta_docstore = InMemoryDocstore({doc_id: self.docstore.search(doc_id) for doc_id in delta_ids.values()})
+                _atomic_write(paths["delta_index"], lambda tmp: faiss.write_index(self.index.delta, tmp))
+                _write_docstore(paths["delta_docstore"], delta_docstore, delta_ids)
+
+        register_faiss_index(folder_path, index_name, self._shared_store())
+
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Memory held by the store, in bytes. A mapped base lives in the shared
+        page cache (mapped_bytes); of a quantized base only the codes are read
+        by every search, the full vectors only for re-ranked candidates.
+        """
+        base = index_bytes(self.index.base)
+        delta_bytes = self.index.delta.ntotal * self.index.d * 4
+        text_bytes = sum(len(doc.page_content) + 256 for doc in self.docstore._dict.values())
+        base_bytes = base["vector_bytes"] + base["code_bytes"]
+        return {
+            "documents": self.index.ntotal,
+            "quantization": self.index_spec.quantization.value,
+            "vector_bytes": base["vector_bytes"] + delta_bytes,
+            "code_bytes": base["code_bytes"],
+            "text_bytes": text_bytes,
+            "mapped_bytes": base_bytes if self.mapped else 0,
+            "resident_bytes": delta_bytes + text_bytes + (0 if self.mapped else base_bytes)
+        }
+
+    def memory_footprint(self) -> int:
+        """Approximate heap bytes held by the store; a mapped base lives in the page cache instead."""
+        return self.memory_report()["resident_bytes"]
+
+    def _needs_training(self) -> bool:
+        """Whether the base is still flat but now has enough vectors to build index_spec."""
+        return (
+            not self.index_spec.is_flat
+            and is_flat_index(self.index.base)
+            and self.index.ntotal >= max(1, self.index_spec.min_training_vectors())
+        )
+
+    def _merge_segments(self) -> None:
+        """Fold the delta into an in-memory copy of the base (re-read when mapped)."""
+        index = self.index
+        if self._needs_training():
+            self.index = SegmentIndex(build_index(self.index_spec, index.vectors(), index.metric_type))
+            self.mapped = False
+            self._base_dirty = True
+            return
+        if not self.mapped and not index.delta.ntotal:
+            return
+        if self.mapped:
+            base = faiss.deserialize_index(faiss.serialize_index(index.base))
+        else:
+            base = index.base
+        if index.delta.ntotal:
+            base.add(index.delta.reconstruct_n(0, index.delta.ntotal))
+        self.index = SegmentIndex(base)
+        self.mapped = False
+        self._base_dirty = True
+
+
+def _shared_attribute(name: str) -> property:
+    return property(
+        lambda view: getattr(view._store, name),
+        lambda view, value: setattr(view._store, name, value)
+    )
+
+
+class _SpecView(SegmentedFAISS):
+    """
+    SegmentedFAISS searching a shared store with its own index_spec. Every
+    other attribute is read from and written to the store, including those
+    FAISS methods reassign (index, index_to_docstore_id).
+    """
+
+    embedding_function = _shared_attribute("embedding_function")
+    index = _shared_attribute("index")
+    docstore = _shared_attribute("docstore")
+    index_to_docstore_id = _shared_attribute("index_to_docstore_id")
+    distance_strategy = _shared_attribute("distance_strategy")
+    override_relevance_score_fn = _shared_attribute("override_relevance_score_fn")
+    _normalize_L2 = _shared_attribute("_normalize_L2")
+    mapped = _shared_attribute("mapped")
+    compact_ratio = _shared_attribute("compact_ratio")
+    _base_dirty = _shared_attribute("_base_dirty")
+    _lock = _shared_attribute("_lock")
+
+    def __init__(self, store: SegmentedFAISS, index_spec: FaissIndexSpec):
+        self._store = store
+        self.index_spec = index_spec
+
+    def _shared_store(self) -> SegmentedFAISS:
+        return self._store
+
+
+def register_faiss_index(faiss_dir: str, index_name: str, vectorstore: SegmentedFAISS) -> None:
+    """Make vectorstore the process-wide instance for an index, as of its current files."""
+    key = (os.path.abspath(faiss_dir), index_name)
+    with _registry_lock:
+        _registry[key] = (_files_stamp(faiss_dir, index_name), vectorstore)
+
+
+def load_faiss_index(
+    faiss_dir: str,
+    index_name: str,
+    embedding_model: object,
+    mmap: bool = True,
+    index_spec: Optional[FaissIndexSpec] = None
+) -> SegmentedFAISS:
+    """
+    Get the process-wide instance of a saved index, loading it on first use.
+
+    The index is loaded again only when its files changed on disk since (e.g.
+    another process appended to it). When index_spec is given, the returned
+    store searches with its parameters: other callers of the same index keep
+    their own (see SegmentedFAISS.with_index_spec).
+    """
+    key = (os.path.abspath(faiss_dir), index_name)
+    stamp = _files_stamp(faiss_dir, index_name)
+    with _registry_lock:
+        cached = _registry.get(key)
+        if cached is not None and cached[0] == stamp:
+            vectorstore = cached[1]
+            return vectorstore.with_index_spec(index_spec) if index_spec is not None else vectorstore
+        vectorstore = SegmentedFAISS.load_segments(
+            faiss_dir, index_name, embedding_model, mmap=mmap, index_spec=index_spec
+        )
+        _registry[key] = (stamp, vectorstore)
+        return vectorstore
+
+
+def clear_faiss_registry() -> None:
+    """Drop every loaded index from the process-wide registry."""
+    with _registry_lock:
+        _registry.clear()
+
+
 def setup_faiss_vectorstore(
-    documents: Optional[List[Document]],
+    documents: Optional[Iterable[Document]],
     embedding_model: object,
     index_name: str = "langchain-doc-embeddings",
     persist_directory: str = "./faiss_indexes",
-    force_reload: bool = False
-) -> FAISS:
+    force_reload: bool = False,
+    max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    mmap: bool = True,
+    index_spec: Optional[FaissIndexSpec] = None
+) -> SegmentedFAISS:
     """
     Create or get a FAISS vectorstore
     
+    Existing indexes are served from a process-wide registry, so repeated calls
+    (e.g. one per create_chain) share one loaded index instead of reading and
+    unpickling it every time.
+    
     Args:
-        documents: List of Document objects to store (optional when loading existing index)
+        documents: Document objects to store, as a list or a streamed iterator (optional when loading existing index)
         embedding_model: Embedding model to use for generating vectors
         index_name: Name of the index
         persist_directory: Directory to persist the FAISS index
         force_reload: Whether to force reload the index with new documents
+        max_tokens_per_batch: Maximum tokens per embedding request
+        max_concurrency: Maximum embedding requests in flight
+        mmap: Whether to memory-map the vectors of an existing index instead of reading them
+        index_spec: Kind of index to build (Flat, IVF-Flat, IVF-PQ or HNSW, optionally
+            quantized) and its search parameters; exact flat search by default
     
     Returns:
         A FAISS vectorstore instance
@@ -32,11 +547,10 @@ def setup_faiss_vectorstore(
     os.makedirs(faiss_dir, exist_ok=True)
     
     # Construct full paths for index files
-    index_path = os.path.join(faiss_dir, f"{index_name}.faiss")
-    docstore_path = os.path.join(faiss_dir, f"{index_name}.pkl")
+    paths = segment_paths(faiss_dir, index_name)
     
     # Check if index exists
-    index_exists = os.path.exists(index_path) and os.path.exists(docstore_path)
+    index_exists = os.path.exists(paths["base_index"]) and os.path.exists(paths["base_docstore"])
     
     # Handle different scenarios
     if force_reload or not index_exists:
@@ -47,12 +561,35 @@ def setup_faiss_vectorstore(
             )
             
         print(f"Creating new FAISS index: {index_name}")
-        vectorstore = FAISS.from_documents(
-            documents=documents,
-            embedding=embedding_model,
-            ids=[doc.metadata.get('doc_id') for doc in documents]
+        vectorstore = None
+        
+        def write_batch(docs, vectors, ids):
+            # The index dimension is only known once the first batch is embedded
+            nonlocal vectorstore
+            text_embeddings = [(doc.page_content, vector) for doc, vector in zip(docs, vectors)]
+            metadatas = [doc.metadata for doc in docs]
+            if vectorstore is None:
+                vectorstore = SegmentedFAISS.from_faiss(FAISS.from_embeddings(
+                    text_embeddings,
+                    embedding_model,
+                    metadatas=metadatas,
+                    ids=ids
+                ), index_spec=index_spec)
+            else:
+                vectorstore.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+        
+        ingest_documents(
+            None,
+            documents,
+            embedding_model,
+            max_tokens_per_batch=max_tokens_per_batch,
+            max_concurrency=max_concurrency,
+            writer=write_batch
         )
         
+        if vectorstore is None:
+            raise ValueError(f"No documents could be embedded for index '{index_name}'")
+        
         # Save the index
         vectorstore.save_local(faiss_dir, index_name)
         print(f"Saved index to {faiss_dir}")
@@ -60,29 +597,30 @@ def setup_faiss_vectorstore(
     else:
         try:
             print(f"Loading existing FAISS index: {index_name}")
-            vectorstore = FAISS.load_local(
-                faiss_dir,
-                embedding_model,
-                index_name,
-                allow_dangerous_deserialization=True # TODO: Remove this on productions
-            )
+            vectorstore = load_faiss_index(faiss_dir, index_name, embedding_model, mmap=mmap, index_spec=index_spec)
             
             if documents:
                 # Get existing IDs to avoid duplicates
                 existing_ids = set(vectorstore.docstore._dict.keys())
-                new_docs = []
-                new_ids = []
-                
-                for doc in documents:
-                    doc_id = doc.metadata.get('doc_id')
-                    if doc_id not in existing_ids:
-                        new_docs.append(doc)
-                        new_ids.append(doc_id)
+                # Filtered lazily so streamed documents stay streamed
+                new_docs = (doc for doc in documents if doc.metadata.get('doc_id') not in existing_ids)
                 
-                if new_docs:
-                    print(f"Adding {len(new_docs)} new documents to existing index")
-                    vectorstore.add_documents(new_docs, ids=new_ids)
+                added = ingest_documents(
+                    vectorstore,
+                    new_docs,
+                    embedding_model,
+                    max_tokens_per_batch=max_tokens_per_batch,
+                    max_concurrency=max_concurrency
+                )
+                if added:
+                    print(f"Added {added} new documents to existing index")
+                    # Only the delta segment is written
                     vectorstore.save_local(faiss_dir, index_name)
+            
+            if vectorstore._needs_training():
+                # A flat index loaded with a spec it now has enough vectors for (e.g. new quantization)
+                print(f"Building {vectorstore.index_spec.resolve(vectorstore.index.ntotal)} index for {index_name}")
+                vectorstore.save_local(faiss_dir, index_name)
                 
         except Exception as e:
             raise FileNotFoundError(
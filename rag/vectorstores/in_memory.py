@@ -1,18 +1,23 @@
 from langchain_core.vectorstores import InMemoryVectorStore
-from typing import List, Optional
+from typing import Iterable, List, Optional
 from langchain_core.documents import Document
 from rag.embeddings import get_openai_embeddings
+from rag.vectorstores.ingestion import ingest_documents, aingest_documents, DEFAULT_MAX_TOKENS_PER_BATCH, DEFAULT_MAX_CONCURRENCY
 
 def create_in_memory_vectorstore(
-    documents: List[Document],
-    embedding_model: Optional[object] = None
+    documents: Iterable[Document],
+    embedding_model: Optional[object] = None,
+    max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
 ):
     """
     Create an InMemoryVectorStore from documents.
     
     Args:
-        documents: List of Document objects to store
+        documents: List of Document objects to store, or an iterator of them to stream
         embedding_model: Embedding model to use. If None, will raise ValueError.
+        max_tokens_per_batch: Maximum tokens per embedding request
+        max_concurrency: Maximum embedding requests in flight
     
     Returns:
         An InMemoryVectorStore instance
@@ -26,7 +31,17 @@ def create_in_memory_vectorstore(
     # Create vectorstore
     vectorstore = InMemoryVectorStore(embedding=embedding_model)
     
-    if documents:
+    if documents is not None and not isinstance(documents, list):
+        # Streamed documents (see rag.pipeline) are embedded as they arrive
+        written = ingest_documents(
+            vectorstore,
+            documents,
+            embedding_model,
+            max_tokens_per_batch=max_tokens_per_batch,
+            max_concurrency=max_concurrency
+        )
+        print(f"Added {written} streamed documents to in-memory vectorstore")
+    elif documents:
         # Get existing document IDs if vectorstore already has documents
         existing_ids = set()
         if hasattr(vectorstore, '_docs'):
@@ -37,11 +52,50 @@ def create_in_memory_vectorstore(
         
         if new_docs:
             print(f"Adding {len(new_docs)} new documents to in-memory vectorstore")
-            vectorstore.add_documents(
-                documents=new_docs,
-                ids=[doc.metadata.get('doc_id') for doc in new_docs]
+            ingest_documents(
+                vectorstore,
+                new_docs,
+                embedding_model,
+                max_tokens_per_batch=max_tokens_per_batch,
+                max_concurrency=max_concurrency
             )
         else:
             print("No new documents to add (all documents already exist)")
             
-    return vectorstore 
\ No newline at end of file
+    return vectorstore
+
+async def acreate_in_memory_vectorstore(
+    documents: List[Document],
+    embedding_model: Optional[object] = None,
+    max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+):
+    """
+    Async variant of create_in_memory_vectorstore that embeds documents with
+    the embedding model's async API.
+    
+    Args:
+        documents: List of Document objects to store
+        embedding_model: Embedding model to use. If None, will raise ValueError.
+        max_tokens_per_batch: Maximum tokens per embedding request
+        max_concurrency: Maximum embedding requests in flight
+    
+    Returns:
+        An InMemoryVectorStore instance
+    """
+    if embedding_model is None:
+        raise ValueError("embedding_model must be provided to create a vectorstore")
+    
+    vectorstore = InMemoryVectorStore(embedding=embedding_model)
+    
+    if documents:
+        print(f"Adding {len(documents)} new documents to in-memory vectorstore")
+        await aingest_documents(
+            vectorstore,
+            documents,
+            embedding_model,
+            max_tokens_per_batch=max_tokens_per_batch,
+            max_concurrency=max_concurrency
+        )
+    
+    return vectorstore
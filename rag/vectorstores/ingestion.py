@@ -0,0 +1,260 @@
+import asyncio
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from utils.tracing import current_span, span
+
+# Defaults sized well below OpenAI's per-request limit (300k tokens / 2048 inputs)
+DEFAULT_MAX_TOKENS_PER_BATCH = 20000
+DEFAULT_MAX_BATCH_SIZE = 512
+DEFAULT_MAX_CONCURRENCY = 4
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:  # tiktoken missing or encoding files unavailable
+    _encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text for batching purposes.
+
+    Uses tiktoken when available and falls back to the ~4 characters per token
+    rule of thumb otherwise.
+    """
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def batch_by_tokens(
+    documents: Iterable[Document],
+    max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE
+) -> Iterator[List[Document]]:
+    """
+    Pack documents into batches bounded by total token count and item count.
+
+    A single document larger than max_tokens_per_batch gets a batch of its own.
+    """
+    batch: List[Document] = []
+    batch_tokens = 0
+
+    for doc in documents:
+        tokens = count_tokens(doc.page_content)
+        current_span().add("embedding_tokens", tokens)
+        if batch and (batch_tokens + tokens > max_tokens_per_batch or len(batch) >= max_batch_size):
+            yield batch
+            batch = []
+            batch_tokens = 0
+        batch.append(doc)
+        batch_tokens += tokens
+
+    if batch:
+        yield batch
+
+
+def embed_batches(
+    batches: Iterable[List[Document]],
+    embedding_model: Any,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+) -> Iterator[Tuple[List[Document], List[List[float]]]]:
+    """
+    Embed batches with at most max_concurrency requests in flight.
+
+    Yields (documents, vectors) pairs in completion order. New batches are only
+    pulled from the input once a slot frees up, so a lazy input is consumed at
+    the pace the embedding API allows.
+    """
+    batches = iter(batches)
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        in_flight = {}
+
+        def submit_next() -> bool:
+            batch = next(batches, None)
+            if batch is None:
+                return False
+            texts = [doc.page_content for doc in batch]
+            in_flight[executor.submit(embedding_model.embed_documents, texts)] = batch
+            return True
+
+        for _ in range(max_concurrency):
+            if not submit_next():
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                batch = in_flight.pop(future)
+                yield batch, future.result()
+                submit_next()
+
+
+def add_embedded_documents(
+    vectorstore: Any,
+    documents: List[Document],
+    vectors: List[List[float]],
+    ids: List[str]
+) -> None:
+    """
+    Write already embedded documents into a vectorstore without re-embedding.
+    """
+    texts = [doc.page_content for doc in documents]
+    metadatas = [doc.metadata for doc in documents]
+
+    if isinstance(vectorstore, InMemoryVectorStore):
+        for doc_id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+            vectorstore.store[doc_id] = {
+                "id": doc_id,
+                "vector": vector,
+                "text": text,
+                "metadata": metadata
+            }
+    elif hasattr(vectorstore, "add_embeddings"):
+        # FAISS and other stores with a native pre-embedded API
+        vectorstore.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+    elif hasattr(vectorstore, "_collection"):
+        # Chroma
+        vectorstore._collection.upsert(
+            ids=ids,
+            embeddings=vectors,
+            documents=texts,
+            metadatas=[metadata or None for metadata in metadatas]
+        )
+    elif hasattr(vectorstore, "_index") and hasattr(vectorstore, "_text_key"):
+        # Pinecone keeps the text inside the metadata
+        vectorstore._index.upsert(
+            vectors=[
+                (doc_id, vector, {**metadata, vectorstore._text_key: text})
+                for doc_id, text, metadata, vector in zip(ids, texts, metadatas, vectors)
+            ],
+            namespace=vectorstore._namespace
+        )
+    else:
+        raise ValueError(f"Unsupported vectorstore for batched ingestion: {type(vectorstore).__name__}")
+
+
+def delete_documents(vectorstore: Any, ids: List[str], batch_size: int = 1000) -> int:
+    """
+    Remove documents by ID, ignoring IDs the vectorstore does not hold.
+
+    Deletes are sent in batches of batch_size (Pinecone accepts at most 1000
+    IDs per request).
+
+    Returns:
+        Number of IDs submitted for deletion
+    """
+    if not ids:
+        return 0
+
+    if hasattr(vectorstore, "index_to_docstore_id"):
+        # FAISS raises on unknown IDs
+        existing = set(vectorstore.index_to_docstore_id.values())
+        ids = [doc_id for doc_id in ids if doc_id in existing]
+    elif isinstance(vectorstore, InMemoryVectorStore):
+        ids = [doc_id for doc_id in ids if doc_id in vectorstore.store]
+
+    for start in range(0, len(ids), batch_size):
+        vectorstore.delete(ids=ids[start:start + batch_size])
+    return len(ids)
+
+
+def _unique_documents(documents: Iterable[Document]) -> Iterator[Document]:
+    """Drop documents whose metadata doc_id was already seen."""
+    seen = set()
+    for doc in documents:
+        doc_id = doc.metadata.get("doc_id")
+        if doc_id is not None:
+            if doc_id in seen:
+                continue
+            seen.add(doc_id)
+        yield doc
+
+
+def ingest_documents(
+    vectorstore: Any,
+    documents: Iterable[Document],
+    embedding_model: Any,
+    max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    writer: Optional[Callable[[List[Document], List[List[float]], List[str]], None]] = None
+) -> int:
+    """
+    Embed documents in token-sized batches concurrently and write each batch
+    into the vectorstore as soon as it is embedded.
+
+    Documents are written under their metadata doc_id (a random ID is used when
+    missing); repeated IDs are only ingested once.
+
+    Args:
+        vectorstore: Vectorstore to write into (may be None when writer is given)
+        documents: Documents to embed and store
+        embedding_model: Embedding model to use for generating vectors
+        max_tokens_per_batch: Maximum total tokens per embedding request
+        max_batch_size: Maximum documents per embedding request
+        max_concurrency: Maximum embedding requests in flight
+        writer: Optional callable(documents, vectors, ids) replacing the default store writer
+
+    Returns:
+        Number of documents written
+    """
+    write = writer or (lambda docs, vectors, ids: add_embedded_documents(vectorstore, docs, vectors, ids))
+    batches = batch_by_tokens(_unique_documents(documents), max_tokens_per_batch, max_batch_size)
+
+    written = 0
+    with span("rag.embed") as embed_span:
+        for batch, vectors in embed_batches(batches, embedding_model, max_concurrency):
+            ids = [doc.metadata.get("doc_id") or str(uuid.uuid4()) for doc in batch]
+            write(batch, vectors, ids)
+            written += len(batch)
+        embed_span.set(chunks=written)
+
+    return written
+
+
+async def aingest_documents(
+    vectorstore: Any,
+    documents: Iterable[Document],
+    embedding_model: Any,
+    max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    writer: Optional[Callable[[List[Document], List[List[float]], List[str]], None]] = None
+) -> int:
+    """
+    Async variant of ingest_documents using the embedding model's async API.
+
+    Batches are embedded with at most max_concurrency requests in flight on the
+    event loop instead of on worker threads. Cutting batches tokenizes every
+    document (and may wait on a lazy source), so batches are pulled one at a
+    time on the thread pool as requests finish rather than on the event loop.
+    """
+    write = writer or (lambda docs, vectors, ids: add_embedded_documents(vectorstore, docs, vectors, ids))
+    batches = batch_by_tokens(_unique_documents(documents), max_tokens_per_batch, max_batch_size)
+    # Generators cannot be advanced from two threads at once
+    pull_lock = asyncio.Lock()
+
+    async def next_batch() -> Optional[List[Document]]:
+        async with pull_lock:
+            return await asyncio.to_thread(next, batches, None)
+
+    async def embed_and_write() -> int:
+        written = 0
+        while (batch := await next_batch()) is not None:
+            vectors = await embedding_model.aembed_documents([doc.page_content for doc in batch])
+            ids = [doc.metadata.get("doc_id") or str(uuid.uuid4()) for doc in batch]
+            write(batch, vectors, ids)
+            written += len(batch)
+        return written
+
+    with span("rag.embed") as embed_span:
+        written = sum(await asyncio.gather(*(embed_and_write() for _ in range(max_concurrency))))
+        embed_span.set(chunks=written)
+    return written
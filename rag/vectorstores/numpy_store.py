@@ -0,0 +1,491 @@
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+from rag.vectorstores.ingestion import (
+    ingest_documents,
+    aingest_documents,
+    DEFAULT_MAX_TOKENS_PER_BATCH,
+    DEFAULT_MAX_CONCURRENCY
+)
+from rag.vectorstores.search import top_k_indices
+from rag.vectorstores.quantization import Quantization, QuantizedVectors, rerank_factor_for
+
+# Metadata filter: {"source": "a.pdf"} or {"source": ["a.pdf", "b.pdf"]}, or a Document predicate
+MetadataFilter = Union[Dict[str, Any], Callable[[Document], bool]]
+
+# Rough per-document python overhead (ids, dicts, list slots)
+_DOCUMENT_OVERHEAD_BYTES = 256
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-memory vectorstore keeping every vector in one contiguous float32 matrix.
+
+    Rows are L2-normalized on insert, so cosine similarity is a single
+    matrix-vector product (or matrix-matrix product for a batch of queries) and
+    top-k selection uses argpartition instead of a full sort. Metadata is also
+    kept column-wise so filters are evaluated as NumPy masks.
+
+    With quantize(), searches first rank every row by its int8 or binary code
+    and only re-score rerank_factor * k candidates against the full vectors.
+    This pays off when the full vectors are memory-mapped (see snapshots),
+    since only the candidate rows are then read.
+    """
+
+    def __init__(self, embedding: Embeddings):
+        self.embedding = embedding
+        self._vectors: Optional[np.ndarray] = None  # capacity x dimensions, grown geometrically
+        self._size = 0
+        self._ids: List[str] = []
+        self._texts: List[str] = []
+        self._metadatas: List[Dict[str, Any]] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._columns: Dict[str, np.ndarray] = {}  # metadata key -> object array, built lazily
+        self.quantization = Quantization.NONE
+        self.rerank_factor: Optional[int] = None
+        self._codes: Optional[QuantizedVectors] = None  # built lazily after changes
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """The normalized vectors of all stored documents (a view, not a copy)."""
+        if self._vectors is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._vectors[:self._size]
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        vectors = self.embedding.embed_documents(texts)
+        return self.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        vectors = await self.embedding.aembed_documents(texts)
+        return self.add_embeddings(list(zip(texts, vectors)), metadatas=metadatas, ids=ids)
+
+    def add_embeddings(
+        self,
+        text_embeddings: Iterable[Tuple[str, List[float]]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        """
+        Add pre-computed embeddings. Existing IDs are overwritten in place.
+        """
+        text_embeddings = list(text_embeddings)
+        if not text_embeddings:
+            return []
+
+        texts = [text for text, _ in text_embeddings]
+        vectors = self._normalize(np.asarray([vector for _, vector in text_embeddings], dtype=np.float32))
+        metadatas = metadatas or [{} for _ in texts]
+        ids = [doc_id or str(uuid.uuid4()) for doc_id in (ids or [None] * len(texts))]
+
+        self._reserve(self._size + len(texts), vectors.shape[1])
+
+        for doc_id, text, metadata, vector in zip(ids, texts, metadatas, vectors):
+            row = self._id_to_row.get(doc_id)
+            if row is None:
+                row = self._size
+                self._size += 1
+                self._ids.append(doc_id)
+                self._texts.append(text)
+                self._metadatas.append(dict(metadata or {}))
+                self._id_to_row[doc_id] = row
+            else:
+                self._texts[row] = text
+                self._metadatas[row] = dict(metadata or {})
+            self._vectors[row] = vector
+
+        self._columns.clear()
+        self._codes = None
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete documents by ID, compacting the matrix."""
+        if not ids:
+            return False
+
+        rows = {self._id_to_row[doc_id] for doc_id in ids if doc_id in self._id_to_row}
+        if not rows:
+            return False
+
+        keep = np.ones(self._size, dtype=bool)
+        keep[list(rows)] = False
+        kept_rows = np.flatnonzero(keep)
+
+        remaining = len(kept_rows)
+        self._vectors[:remaining] = self._vectors[kept_rows]
+        self._ids = [self._ids[i] for i in kept_rows]
+        self._texts = [self._texts[i] for i in kept_rows]
+        self._metadatas = [self._metadatas[i] for i in kept_rows]
+        self._id_to_row = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._size = remaining
+        self._columns.clear()
+        self._codes = None
+        return True
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        return [self._document(self._id_to_row[doc_id]) for doc_id in ids if doc_id in self._id_to_row]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[MetadataFilter] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return self.similarity_search_by_vector(self.embedding.embed_query(query), k=k, filter=filter)
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[MetadataFilter] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(
+            self.embedding.embed_query(query), k=k, filter=filter
+        )
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[MetadataFilter] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, filter=filter)]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[MetadataFilter] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Return the k most similar documents with their cosine similarity."""
+        return self.similarity_search_batch_with_score_by_vector([embedding], k=k, filter=filter)[0]
+
+    def similarity_search_batch_by_vector(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        k: int = 4,
+        filter: Optional[MetadataFilter] = None
+    ) -> List[List[Document]]:
+        """Search many query vectors with one matrix-matrix product."""
+        return [
+            [doc for doc, _ in results]
+            for results in self.similarity_search_batch_with_score_by_vector(embeddings, k=k, filter=filter)
+        ]
+
+    def similarity_search_batch_with_score_by_vector(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        k: int = 4,
+        filter: Optional[MetadataFilter] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """
+        Return the k most similar documents with scores for every query vector.
+        """
+        if self._size == 0 or k <= 0 or not len(embeddings):
+            return [[] for _ in embeddings]
+
+        queries = self._normalize(np.atleast_2d(np.asarray(embeddings, dtype=np.float32)))
+
+        mask = self._filter_mask(filter)
+        if mask is not None:
+            k = min(k, int(mask.sum()))
+            if k == 0:
+                return [[] for _ in embeddings]
+
+        rows, scores = self._top_k(queries, k, mask)
+        return [
+            [(self._document(int(row)), float(score)) for row, score in zip(query_rows, query_scores)]
+            for query_rows, query_scores in zip(rows, scores)
+        ]
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[MetadataFilter] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        if self._size == 0:
+            return []
+
+        query = self._normalize(np.asarray([embedding], dtype=np.float32))
+
+        mask = self._filter_mask(filter)
+        if mask is not None:
+            fetch_k = min(fetch_k, int(mask.sum()))
+            if fetch_k == 0:
+                return []
+
+        candidates = self._top_k(query, fetch_k, mask)[0][0]
+        selected = maximal_marginal_relevance(
+            query[0],
+            self.vectors[candidates],
+            lambda_mult=lambda_mult,
+            k=k
+        )
+        return [self._document(int(candidates[i])) for i in selected]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[MetadataFilter] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self.embedding.embed_query(query),
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            filter=filter
+        )
+
+    def quantize(self, quantization: Quantization, rerank_factor: Optional[int] = None) -> None:
+        """
+        Search through quantized codes of the vectors (Quantization.NONE searches the full vectors).
+
+        Args:
+            quantization: Encoding of the coarse search pass
+            rerank_factor: Candidates re-scored against the full vectors per requested
+                result (default: 4 for INT8, 40 for BINARY)
+        """
+        self.quantization = Quantization(quantization)
+        self.rerank_factor = rerank_factor
+        self._codes = None
+
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Memory held by the store, in bytes.
+
+        resident_bytes is the private memory of this process; mapped_bytes
+        lives in the shared page cache and is only paged in as it is read.
+        """
+        vector_bytes = self._vectors.nbytes if self._vectors is not None else 0
+        code_bytes = self._codes.nbytes if self._codes is not None else 0
+        text_bytes = sum(len(text) for text in self._texts) + self._size * _DOCUMENT_OVERHEAD_BYTES
+        return {
+            "documents": self._size,
+            "quantization": self.quantization.value,
+            "vector_bytes": vector_bytes,
+            "code_bytes": code_bytes,
+            "text_bytes": text_bytes,
+            "mapped_bytes": 0,
+            "resident_bytes": vector_bytes + code_bytes + text_bytes
+        }
+
+    def memory_footprint(self) -> int:
+        """Approximate resident size in bytes, used by the vectorstore cache."""
+        return self.memory_report()["resident_bytes"]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> "NumpyVectorStore":
+        store = cls(embedding=embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    def _reserve(self, size: int, dimensions: int) -> None:
+        if self._vectors is None:
+            self._vectors = np.empty((max(size, 1024), dimensions), dtype=np.float32)
+            return
+        if dimensions != self._vectors.shape[1]:
+            raise ValueError(
+                f"Embedding dimensions {dimensions} do not match the store's {self._vectors.shape[1]}"
+            )
+        if size > self._vectors.shape[0]:
+            # Grow geometrically so batched ingestion stays linear overall
+            grown = np.empty((max(size, self._vectors.shape[0] * 2), dimensions), dtype=np.float32)
+            grown[:self._size] = self._vectors[:self._size]
+            self._vectors = grown
+
+    def _top_k(self, queries: np.ndarray, k: int, mask: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows and cosine similarities of the k best rows for every normalized query, best first."""
+        codes = self._quantized_codes()
+        if codes is None:
+            scores = queries @ self.vectors.T
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+            rows = top_k_indices(scores, k)
+            return rows, np.take_along_axis(scores, rows, axis=1)
+
+        coarse = codes.scores(queries)
+        if mask is not None:
+            coarse[:, ~mask] = -np.inf
+        fetch = k * rerank_factor_for(self.quantization, self.rerank_factor)
+        candidates = top_k_indices(coarse, min(fetch, self._size if mask is None else int(mask.sum())))
+
+        # Exact scores for the candidates only, reading each distinct row once and in order
+        unique_rows, positions = np.unique(candidates, return_inverse=True)
+        exact = np.einsum(
+            "qcd,qd->qc",
+            np.asarray(self.vectors[unique_rows])[positions.reshape(candidates.shape)],
+            queries
+        )
+        best = top_k_indices(exact, k)
+        return np.take_along_axis(candidates, best, axis=1), np.take_along_axis(exact, best, axis=1)
+
+    def _quantized_codes(self) -> Optional[QuantizedVectors]:
+        if self.quantization == Quantization.NONE or self._size == 0:
+            return None
+        if self._codes is None:
+            self._codes = QuantizedVectors.encode(self.quantization, self.vectors)
+        return self._codes
+
+    def _filter_mask(self, filter: Optional[MetadataFilter]) -> Optional[np.ndarray]:
+        if filter is None:
+            return None
+
+        if callable(filter):
+            return np.fromiter(
+                (filter(self._document(row)) for row in range(self._size)),
+                dtype=bool,
+                count=self._size
+            )
+
+        mask = np.ones(self._size, dtype=bool)
+        for key, value in filter.items():
+            column = self._column(key)
+            if isinstance(value, (list, tuple, set)):
+                mask &= np.isin(column, list(value))
+            else:
+                mask &= column == value
+        return mask
+
+    def _column(self, key: str) -> np.ndarray:
+        column = self._columns.get(key)
+        if column is None:
+            column = np.empty(self._size, dtype=object)
+            column[:] = [metadata.get(key) for metadata in self._metadatas]
+            self._columns[key] = column
+        return column
+
+    def _document(self, row: int) -> Document:
+        return Document(id=self._ids[row], page_content=self._texts[row], metadata=self._metadatas[row])
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+def create_numpy_vectorstore(
+    documents: Iterable[Document],
+    embedding_model: Optional[object] = None,
+    max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+) -> NumpyVectorStore:
+    """
+    Create a NumpyVectorStore from documents.
+
+    Args:
+        documents: List of Document objects to store, or an iterator of them to stream
+        embedding_model: Embedding model to use. If None, will raise ValueError.
+        max_tokens_per_batch: Maximum tokens per embedding request
+        max_concurrency: Maximum embedding requests in flight
+
+    Returns:
+        A NumpyVectorStore instance
+
+    Raises:
+        ValueError: If embedding_model is None
+    """
+    if embedding_model is None:
+        raise ValueError("embedding_model must be provided to create a vectorstore")
+
+    vectorstore = NumpyVectorStore(embedding=embedding_model)
+
+    if documents is not None and not isinstance(documents, list):
+        # Streamed documents (see rag.pipeline) are embedded as they arrive
+        written = ingest_documents(
+            vectorstore,
+            documents,
+            embedding_model,
+            max_tokens_per_batch=max_tokens_per_batch,
+            max_concurrency=max_concurrency
+        )
+        print(f"Added {written} streamed documents to numpy vectorstore")
+    elif documents:
+        print(f"Adding {len(documents)} new documents to numpy vectorstore")
+        ingest_documents(
+            vectorstore,
+            documents,
+            embedding_model,
+            max_tokens_per_batch=max_tokens_per_batch,
+            max_concurrency=max_concurrency
+        )
+
+    return vectorstore
+
+
+async def acreate_numpy_vectorstore(
+    documents: List[Document],
+    embedding_model: Optional[object] = None,
+    max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+) -> NumpyVectorStore:
+    """
+    Async variant of create_numpy_vectorstore that embeds documents with the
+    embedding model's async API.
+    """
+    if embedding_model is None:
+        raise ValueError("embedding_model must be provided to create a vectorstore")
+
+    vectorstore = NumpyVectorStore(embedding=embedding_model)
+
+    if documents:
+        print(f"Adding {len(documents)} new documents to numpy vectorstore")
+        await aingest_documents(
+            vectorstore,
+            documents,
+            embedding_model,
+            max_tokens_per_batch=max_tokens_per_batch,
+            max_concurrency=max_concurrency
+        )
+
+    return vectorstore
@@ -1,16 +1,263 @@
 import os
+import json
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
 from pinecone import Pinecone, ServerlessSpec
 from langchain_pinecone import PineconeVectorStore
-from typing import List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
 from langchain_core.documents import Document
-from rag.embeddings import get_openai_embeddings
+from rag.embeddings import get_openai_embeddings, get_embedding_dimension
+from rag.vectorstores.ingestion import ingest_documents, DEFAULT_MAX_TOKENS_PER_BATCH, DEFAULT_MAX_CONCURRENCY
+
+# IDs per fetch request; fetch takes the IDs in the URL, so keep requests short
+DEFAULT_FETCH_BATCH_SIZE = 200
+# Pinecone recommends upserts of at most ~100 vectors (2MB) per request
+DEFAULT_UPSERT_BATCH_SIZE = 100
+DEFAULT_UPSERT_CONCURRENCY = 4
+DEFAULT_PROGRESS_DIR = "./pinecone_progress"
+
+
+class UpsertProgress:
+    """
+    Progress of loading documents into one Pinecone namespace, persisted as JSON.
+
+    The file records whether a load is still running and whether it started by
+    wiping the namespace (force_reload). A load that was interrupted is resumed
+    by the next run: an interrupted reload is not wiped again, and vectors that
+    were already written are skipped by the existence check.
+    """
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self.state: Dict[str, Any] = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.state = json.load(f)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_namespace(cls, progress_dir: Optional[str], index_name: str, namespace: Optional[str]) -> "UpsertProgress":
+        if not progress_dir:
+            return cls(None)
+        return cls(os.path.join(progress_dir, index_name, f"{namespace or '__default__'}.json"))
+
+    @property
+    def interrupted_reload(self) -> bool:
+        return self.state.get("status") == "loading" and self.state.get("reload", False)
+
+    def start(self, total: int, reload: bool, resumed: bool = False) -> None:
+        if not resumed:
+            self.state = {"written": 0}
+        self.state.update({"status": "loading", "reload": reload, "total": total})
+        self.save()
+
+    def add_written(self, count: int) -> None:
+        with self._lock:
+            self.state["written"] = self.state.get("written", 0) + count
+            self.save()
+
+    def finish(self) -> None:
+        self.state["status"] = "complete"
+        self.save()
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        self.state["updated_at"] = datetime.now().isoformat()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.tmp-{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(self.state, f, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def fetch_existing_ids(
+    index: Any,
+    ids: List[str],
+    namespace: Optional[str] = None,
+    batch_size: int = DEFAULT_FETCH_BATCH_SIZE,
+    max_concurrency: int = DEFAULT_UPSERT_CONCURRENCY
+) -> Set[str]:
+    """
+    Find which of the given IDs are stored in a Pinecone namespace.
+
+    IDs are looked up with fetch requests of batch_size IDs, max_concurrency
+    at a time, so the check is exact whatever the size of the namespace.
+    """
+    batches = [ids[start:start + batch_size] for start in range(0, len(ids), batch_size)]
+    if not batches:
+        return set()
+
+    def fetch(batch: List[str]) -> List[str]:
+        return list(index.fetch(ids=batch, namespace=namespace).vectors)
+
+    existing: Set[str] = set()
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(batches))) as executor:
+        for found in executor.map(fetch, batches):
+            existing.update(found)
+    return existing
+
+
+class ParallelUpserter:
+    """
+    Writer for ingest_documents that upserts embedded documents into a Pinecone
+    index in batches of batch_size, with up to max_concurrency requests in flight.
+
+    Call close() once ingestion is done to wait for the last batches; the first
+    failed upsert is re-raised from the next write or from close().
+    """
+
+    def __init__(
+        self,
+        index: Any,
+        namespace: Optional[str] = None,
+        text_key: str = "text",
+        batch_size: int = DEFAULT_UPSERT_BATCH_SIZE,
+        max_concurrency: int = DEFAULT_UPSERT_CONCURRENCY,
+        progress: Optional[UpsertProgress] = None
+    ):
+        self.index = index
+        self.namespace = namespace
+        self.text_key = text_key
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.progress = progress
+        self.written = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+        self._in_flight = set()
+        self._lock = threading.Lock()
+
+    def __call__(self, documents: List[Document], vectors: List[List[float]], ids: List[str]) -> None:
+        records = [
+            (doc_id, vector, {**doc.metadata, self.text_key: doc.page_content})
+            for doc, vector, doc_id in zip(documents, vectors, ids)
+        ]
+        for start in range(0, len(records), self.batch_size):
+            # Bound the vectors held in memory by pending requests
+            self._wait(self.max_concurrency)
+            self._in_flight.add(self._executor.submit(self._upsert, records[start:start + self.batch_size]))
+
+    def close(self) -> None:
+        try:
+            self._wait(0)
+        finally:
+            self._executor.shutdown(wait=True)
+
+    def _upsert(self, records: List[Tuple[str, List[float], Dict[str, Any]]]) -> None:
+        self.index.upsert(vectors=records, namespace=self.namespace)
+        with self._lock:
+            self.written += len(records)
+        if self.progress is not None:
+            self.progress.add_written(len(records))
+
+    def _wait(self, limit: int) -> None:
+        while len(self._in_flight) > limit:
+            done, self._in_flight = wait(self._in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+
+
+def upsert_documents(
+    index: Any,
+    documents: Iterable[Document],
+    embedding_model: object,
+    namespace: Optional[str] = None,
+    force_reload: bool = False,
+    text_key: str = "text",
+    progress: Optional[UpsertProgress] = None,
+    fetch_batch_size: int = DEFAULT_FETCH_BATCH_SIZE,
+    upsert_batch_size: int = DEFAULT_UPSERT_BATCH_SIZE,
+    upsert_concurrency: int = DEFAULT_UPSERT_CONCURRENCY,
+    max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+) -> int:
+    """
+    Incrementally load documents into a Pinecone namespace.
+
+    Documents whose doc_id is already stored are skipped before embedding; the
+    rest are embedded in token-sized batches and upserted in parallel batches.
+    With force_reload the namespace is wiped first, unless the progress record
+    shows an interrupted reload, which is resumed instead.
+
+    Args:
+        index: Pinecone index (anything with fetch, upsert and delete)
+        documents: Documents to store
+        embedding_model: Embedding model to use for generating vectors
+        namespace: Namespace to write into
+        force_reload: Whether to replace the namespace's vectors (only for named namespaces)
+        text_key: Metadata key holding the document text
+        progress: Optional progress record used to resume interrupted loads
+        fetch_batch_size: IDs per existence-check fetch request
+        upsert_batch_size: Vectors per upsert request
+        upsert_concurrency: Fetch and upsert requests in flight
+        max_tokens_per_batch: Maximum tokens per embedding request
+        max_concurrency: Maximum embedding requests in flight
+
+    Returns:
+        Number of vectors written
+    """
+    progress = progress or UpsertProgress(None)
+    documents = list(documents)
+    reload = force_reload and bool(namespace)
+
+    resumed = reload and progress.interrupted_reload
+    wiped = reload and not resumed
+    if resumed:
+        print(f"Resuming interrupted reload of namespace {namespace} "
+              f"({progress.state.get('written', 0)} vectors already written)")
+    elif wiped:
+        print(f"Deleting existing vectors in namespace: {namespace}")
+        index.delete(delete_all=True, namespace=namespace)
+    progress.start(total=len(documents), reload=reload, resumed=resumed)
+
+    # A freshly wiped namespace holds nothing to check against
+    if documents and not wiped:
+        candidate_ids = list(dict.fromkeys(doc.metadata["doc_id"] for doc in documents if doc.metadata.get("doc_id")))
+        existing_ids = fetch_existing_ids(index, candidate_ids, namespace, fetch_batch_size, upsert_concurrency)
+        documents = [doc for doc in documents if doc.metadata.get("doc_id") not in existing_ids]
+        if existing_ids:
+            print(f"Skipping {len(existing_ids)} documents already in Pinecone")
+
+    written = 0
+    if documents:
+        print(f"Adding {len(documents)} new documents to Pinecone{' in namespace ' + namespace if namespace else ''}")
+        upserter = ParallelUpserter(
+            index,
+            namespace=namespace,
+            text_key=text_key,
+            batch_size=upsert_batch_size,
+            max_concurrency=upsert_concurrency,
+            progress=progress
+        )
+        try:
+            ingest_documents(
+                None,
+                documents,
+                embedding_model,
+                max_tokens_per_batch=max_tokens_per_batch,
+                max_concurrency=max_concurrency,
+                writer=upserter
+            )
+        finally:
+            upserter.close()
+        written = upserter.written
+
+    progress.finish()
+    return written
+
 
 def setup_pinecone_vectorstore(
     documents: Optional[List[Document]] = None,
     embedding_model: Optional[object] = None,
     index_name: str = "langchain-doc-embeddings",
     namespace: Optional[str] = None,
-    force_reload: bool = False
+    force_reload: bool = False,
+    max_tokens_per_batch: int = DEFAULT_MAX_TOKENS_PER_BATCH,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    upsert_batch_size: int = DEFAULT_UPSERT_BATCH_SIZE,
+    upsert_concurrency: int = DEFAULT_UPSERT_CONCURRENCY,
+    progress_dir: Optional[str] = DEFAULT_PROGRESS_DIR
 ):
     """
     Setup a Pinecone vectorstore - creates new one or connects to existing.
@@ -21,6 +268,12 @@ def setup_pinecone_vectorstore(
         index_name: Name of the Pinecone index
         namespace: Optional namespace for multi-user isolation within the index
         force_reload: Whether to force reload the namespace with new documents
+        max_tokens_per_batch: Maximum tokens per embedding request
+        max_concurrency: Maximum embedding requests in flight
+        upsert_batch_size: Vectors per upsert request
+        upsert_concurrency: Fetch and upsert requests in flight
+        progress_dir: Directory of the per-namespace progress records used to resume
+            interrupted loads (None disables them)
     
     Returns:
         A Pinecone vectorstore instance
@@ -28,34 +281,36 @@ def setup_pinecone_vectorstore(
     # Use OpenAI embeddings by default if none provided
     if embedding_model is None:
         embedding_model = get_openai_embeddings()
-
+    
     # Initialize Pinecone client
     api_key = os.environ.get("PINECONE_API_KEY")
     if not api_key:
         raise ValueError("PINECONE_API_KEY environment variable not set")
     
     pc = Pinecone(api_key=api_key)
+    dimension = get_embedding_dimension(embedding_model)
     
     # Create index if it doesn't exist
     if index_name not in pc.list_indexes().names():
         print(f"Creating index {index_name}")
         pc.create_index(
             name=index_name,
-            dimension=1536,  # OpenAI embeddings dimension
+            dimension=dimension,
             metric='cosine',
             spec=ServerlessSpec(cloud='aws', region='us-east-1')
         )
     else:
         print(f"Using existing index {index_name}")
+        index_dimension = pc.describe_index(index_name).dimension
+        if index_dimension != dimension:
+            raise ValueError(
+                f"Index {index_name} has dimension {index_dimension}, "
+                f"but the embedding model produces {dimension}-dimensional vectors"
+            )
 
     # Connect to the index
     pinecone_index = pc.Index(index_name)
     
-    # Delete existing vectors in the namespace if force_reload is True
-    if force_reload and documents is not None and namespace:
-        print(f"Deleting existing vectors in namespace: {namespace}")
-        pinecone_index.delete(delete_all=True, namespace=namespace)
-    
     # Create vectorstore
     vectorstore = PineconeVectorStore(
         index=pinecone_index,
@@ -66,28 +321,20 @@ def setup_pinecone_vectorstore(
     
     # Add documents if provided
     if documents is not None:
-        if force_reload and namespace:
-            print(f"Deleting existing vectors in namespace: {namespace}")
-            pinecone_index.delete(delete_all=True, namespace=namespace)
-        elif documents:
-            # Get existing IDs
-            existing_ids = set()
-            query_response = pinecone_index.query(
-                vector=[0] * 1536,  # dummy vector
-                namespace=namespace,
-                top_k=10000,
-                include_metadata=True
-            )
-            for match in query_response.matches:
-                existing_ids.add(match.id)
-            
-            # Filter out existing documents
-            new_docs = [doc for doc in documents if doc.metadata.get('doc_id') not in existing_ids]
-            
-            if new_docs:
-                print(f"Adding {len(new_docs)} new documents to Pinecone{' in namespace ' + namespace if namespace else ''}")
-                vectorstore.add_documents(new_docs)
-        
+        upsert_documents(
+            pinecone_index,
+            documents,
+            embedding_model,
+            namespace=namespace,
+            force_reload=force_reload,
+            text_key="text",
+            progress=UpsertProgress.for_namespace(progress_dir, index_name, namespace),
+            upsert_batch_size=upsert_batch_size,
+            upsert_concurrency=upsert_concurrency,
+            max_tokens_per_batch=max_tokens_per_batch,
+            max_concurrency=max_concurrency
+        )
+    
         # Verify documents were added
         stats = pinecone_index.describe_index_stats()
         if namespace:
@@ -96,4 +343,4 @@ def setup_pinecone_vectorstore(
         else:
             print(f"Index stats after adding documents: {stats}")
     
-    return vectorstore 
\ No newline at end of file
+    return vectorstore
@@ -0,0 +1,148 @@
+import os
+import shutil
+import uuid
+from enum import Enum
+from typing import Optional
+
+import numpy as np
+
+CODES_FILE = "codes.npy"
+CODES_PARAMS_FILE = "codes.params.npy"
+# Every save writes its codes into a new directory named with this prefix
+CODES_DIR_PREFIX = "codes-"
+
+# Candidates re-scored against the full vectors, per requested result
+DEFAULT_RERANK_FACTORS = {"int8": 4, "binary": 40}
+
+# Rows encoded or scored at a time, bounding the float32 temporaries
+_BLOCK_ROWS = 32768
+# int8 rows widened to float32 at a time while scoring; small enough to stay in cache
+_SCORE_BLOCK_ROWS = 1024
+
+# Set bits of every byte value, for NumPy versions without bitwise_count
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+class Quantization(str, Enum):
+    """Compact vector encodings used for a coarse first search pass"""
+    NONE = "none"
+    INT8 = "int8"  # One signed byte per dimension, scaled per dimension (4x smaller)
+    BINARY = "binary"  # One bit per dimension, set above the dimension's mean (32x smaller)
+
+
+class QuantizedVectors:
+    """
+    Quantized copy of a matrix of normalized vectors.
+
+    scores() approximates the cosine similarity of queries to every row from
+    the codes alone (int8 dot products, or negated Hamming distances of the
+    sign bits), so the full float32 vectors only need to be read for the few
+    candidates that are re-scored exactly.
+    """
+
+    def __init__(self, kind: Quantization, codes: np.ndarray, params: np.ndarray):
+        self.kind = Quantization(kind)
+        self.codes = codes
+        # Per-dimension scale (INT8) or threshold (BINARY)
+        self.params = params
+
+    def __len__(self) -> int:
+        return self.codes.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + self.params.nbytes
+
+    @classmethod
+    def encode(cls, kind: Quantization, vectors: np.ndarray) -> "QuantizedVectors":
+        """Quantize vectors (which may be memory-mapped) block by block."""
+        kind = Quantization(kind)
+        count, dimensions = vectors.shape
+        if kind == Quantization.INT8:
+            peak = np.zeros(dimensions, dtype=np.float32)
+            for start in range(0, count, _BLOCK_ROWS):
+                np.maximum(peak, np.abs(vectors[start:start + _BLOCK_ROWS]).max(axis=0), out=peak)
+            params = np.maximum(peak, 1e-12) / 127
+            codes = np.empty((count, dimensions), dtype=np.int8)
+            for start in range(0, count, _BLOCK_ROWS):
+                codes[start:start + _BLOCK_ROWS] = np.clip(
+                    np.rint(vectors[start:start + _BLOCK_ROWS] / params), -127, 127
+                )
+        elif kind == Quantization.BINARY:
+            params = np.zeros(dimensions, dtype=np.float64)
+            for start in range(0, count, _BLOCK_ROWS):
+                params += vectors[start:start + _BLOCK_ROWS].sum(axis=0, dtype=np.float64)
+            params = (params / max(count, 1)).astype(np.float32)
+            codes = np.empty((count, (dimensions + 7) // 8), dtype=np.uint8)
+            for start in range(0, count, _BLOCK_ROWS):
+                codes[start:start + _BLOCK_ROWS] = np.packbits(vectors[start:start + _BLOCK_ROWS] > params, axis=1)
+        else:
+            raise ValueError(f"Cannot encode vectors with quantization {kind.value}")
+        return cls(kind, codes, params.astype(np.float32))
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        """Approximate similarity of every query (rows of normalized vectors) to every code, higher is closer."""
+        queries = np.atleast_2d(queries).astype(np.float32)
+        scores = np.empty((len(queries), len(self.codes)), dtype=np.float32)
+        if self.kind == Quantization.INT8:
+            scaled = (queries * self.params).T
+            for start in range(0, len(self.codes), _SCORE_BLOCK_ROWS):
+                block = self.codes[start:start + _SCORE_BLOCK_ROWS].astype(np.float32)
+                scores[:, start:start + _SCORE_BLOCK_ROWS] = (block @ scaled).T
+            return scores
+
+        query_codes = np.packbits(queries > self.params, axis=1)
+        codes, query_codes = _popcount_view(self.codes), _popcount_view(query_codes)
+        for i, query_code in enumerate(query_codes):
+            for start in range(0, len(codes), _BLOCK_ROWS):
+                scores[i, start:start + _BLOCK_ROWS] = -_popcount(codes[start:start + _BLOCK_ROWS] ^ query_code)
+        return scores
+
+    def save(self, directory: str) -> str:
+        """
+        Write the codes and their parameters into a new subdirectory of
+        directory and return its name.
+
+        Both files are written to a temporary directory that is renamed into
+        place at once, so a crash never leaves codes next to the parameters of
+        another encoding. Callers record the name (e.g. in a snapshot manifest)
+        once the save returns, and remove the directory it replaces.
+        """
+        name = f"{CODES_DIR_PREFIX}{self.kind.value}-{uuid.uuid4().hex}"
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        os.makedirs(tmp_path)
+        try:
+            np.save(os.path.join(tmp_path, CODES_PARAMS_FILE), self.params)
+            np.save(os.path.join(tmp_path, CODES_FILE), self.codes)
+            os.rename(tmp_path, os.path.join(directory, name))
+        except BaseException:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+        return name
+
+    @classmethod
+    def load(cls, kind: Quantization, directory: str, mmap: bool = True) -> "QuantizedVectors":
+        """Map the codes saved in directory (the path of a directory save() created)."""
+        mmap_mode = "r" if mmap else None
+        return cls(
+            kind,
+            np.load(os.path.join(directory, CODES_FILE), mmap_mode=mmap_mode),
+            np.load(os.path.join(directory, CODES_PARAMS_FILE))
+        )
+
+
+def rerank_factor_for(kind: Quantization, rerank_factor: Optional[int] = None) -> int:
+    return rerank_factor or DEFAULT_RERANK_FACTORS.get(Quantization(kind).value, 1)
+
+
+def _popcount_view(codes: np.ndarray) -> np.ndarray:
+    # Wider words mean fewer XOR and popcount operations per row
+    if hasattr(np, "bitwise_count") and codes.shape[-1] % 8 == 0:
+        return np.ascontiguousarray(codes).view(np.uint64)
+    return codes
+
+
+def _popcount(words: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int32)
+    return _POPCOUNT[words].sum(axis=-1, dtype=np.int32)
@@ -0,0 +1,67 @@
+from typing import Any, List, Sequence
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import InMemoryVectorStore
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores of every row, best first."""
+    k = min(k, scores.shape[1])
+    candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, candidates, axis=1), axis=1)
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def similarity_search_batch(
+    vectorstore: Any,
+    query_vectors: Sequence[Sequence[float]],
+    k: int = 4
+) -> List[List[Document]]:
+    """
+    Run a similarity search for many already embedded queries at once.
+
+    InMemoryVectorStore is scored with a single matrix-matrix product over all
+    queries; stores with a native batched search are delegated to, and any
+    other store falls back to one similarity_search_by_vector call per query.
+
+    Args:
+        vectorstore: Vectorstore to search
+        query_vectors: One embedding per query
+        k: Number of documents to return per query
+
+    Returns:
+        The top k documents for every query, in query order
+    """
+    if not len(query_vectors):
+        return []
+
+    if hasattr(vectorstore, "similarity_search_batch_by_vector"):
+        return vectorstore.similarity_search_batch_by_vector(query_vectors, k=k)
+
+    if not isinstance(vectorstore, InMemoryVectorStore):
+        return [vectorstore.similarity_search_by_vector(vector, k=k) for vector in query_vectors]
+
+    entries = list(vectorstore.store.values())
+    if not entries or k <= 0:
+        return [[] for _ in query_vectors]
+
+    matrix = np.asarray([entry["vector"] for entry in entries], dtype=np.float32)
+    queries = np.asarray(query_vectors, dtype=np.float32)
+
+    # Cosine similarity, same as InMemoryVectorStore.similarity_search
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+    queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+    scores = queries @ matrix.T
+
+    results = []
+    for row in top_k_indices(scores, k):
+        results.append([
+            Document(
+                id=entries[i]["id"],
+                page_content=entries[i]["text"],
+                metadata=entries[i]["metadata"]
+            )
+            for i in row
+        ])
+    return results
@@ -0,0 +1,404 @@
+import json
+import mmap
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from rag.vectorstores.numpy_store import NumpyVectorStore
+from rag.vectorstores.quantization import Quantization, QuantizedVectors
+
+try:
+    import fcntl
+except ImportError:  # Windows: snapshots still work, builds are just not deduplicated
+    fcntl = None
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+TEXTS_FILE = "texts.bin"
+TEXT_OFFSETS_FILE = "texts.offsets.npy"
+METADATA_FILE = "metadata.bin"
+METADATA_OFFSETS_FILE = "metadata.offsets.npy"
+
+
+def snapshot_exists(path: str) -> bool:
+    """Whether a complete snapshot exists at path."""
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+def save_snapshot(vectorstore: Any, path: str, quantization: Quantization = Quantization.NONE) -> str:
+    """
+    Write a vectorstore to a snapshot directory that workers can mmap.
+
+    The snapshot holds the normalized float32 vectors as vectors.npy, the
+    texts and JSON metadata as two concatenated UTF-8 blobs, and an int64 offsets
+    array for each blob. It is written to a temporary directory and renamed into
+    place, so readers never see a partial snapshot.
+
+    Args:
+        vectorstore: NumpyVectorStore or InMemoryVectorStore to write
+        path: Snapshot directory to create (replaced if it exists)
+        quantization: Also write int8 or binary codes of the vectors, which
+            stores mapping the snapshot search first
+
+    Returns:
+        The snapshot path
+    """
+    ids, texts, metadatas, vectors = _snapshot_rows(vectorstore)
+
+    parent = os.path.dirname(os.path.abspath(path))
+    os.makedirs(parent, exist_ok=True)
+    tmp_path = os.path.join(parent, f".{os.path.basename(path)}.tmp-{uuid.uuid4().hex}")
+    os.makedirs(tmp_path)
+
+    try:
+        np.save(os.path.join(tmp_path, VECTORS_FILE), vectors)
+        _write_blobs(
+            os.path.join(tmp_path, TEXTS_FILE),
+            os.path.join(tmp_path, TEXT_OFFSETS_FILE),
+            (text.encode("utf-8") for text in texts)
+        )
+        _write_blobs(
+            os.path.join(tmp_path, METADATA_FILE),
+            os.path.join(tmp_path, METADATA_OFFSETS_FILE),
+            (
+                json.dumps({"id": doc_id, "metadata": metadata}, default=str).encode("utf-8")
+                for doc_id, metadata in zip(ids, metadatas)
+            )
+        )
+        quantization = Quantization(quantization)
+        codes_dir = None
+        if quantization != Quantization.NONE and len(ids):
+            codes_dir = QuantizedVectors.encode(quantization, vectors).save(tmp_path)
+        else:
+            quantization = Quantization.NONE
+        # The manifest is written last; its presence marks a complete snapshot
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w") as f:
+            json.dump({
+                "format": SNAPSHOT_FORMAT_VERSION,
+                "count": len(ids),
+                "dimensions": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+                "quantization": quantization.value,
+                "codes": codes_dir,
+                "created_at": time.time()
+            }, f)
+
+        if os.path.exists(path):
+            # Move the old snapshot aside; workers that mapped it keep their mapping
+            stale_path = os.path.join(parent, f".{os.path.basename(path)}.old-{uuid.uuid4().hex}")
+            os.rename(path, stale_path)
+            os.rename(tmp_path, path)
+            shutil.rmtree(stale_path, ignore_errors=True)
+        else:
+            os.rename(tmp_path, path)
+    except BaseException:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    return path
+
+
+def quantize_snapshot(path: str, quantization: Quantization) -> None:
+    """
+    Add (or replace) the quantized codes of an existing snapshot, encoded from
+    its vectors.npy, so a snapshot can switch quantization without re-embedding.
+
+    The new codes get a directory of their own, which the manifest switches to
+    in one replace, so readers see either the old or the new codes in full.
+    Stores that already map the snapshot keep searching with what they loaded.
+    """
+    quantization = Quantization(quantization)
+    manifest_path = os.path.join(path, MANIFEST_FILE)
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    previous_codes_dir = manifest.get("codes")
+    codes_dir = None
+    if quantization != Quantization.NONE and manifest["count"]:
+        vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r")
+        codes_dir = QuantizedVectors.encode(quantization, vectors).save(path)
+    else:
+        quantization = Quantization.NONE
+
+    manifest["quantization"] = quantization.value
+    manifest["codes"] = codes_dir
+    tmp_path = f"{manifest_path}.tmp-{uuid.uuid4().hex}"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, manifest_path)
+    if previous_codes_dir:
+        shutil.rmtree(os.path.join(path, previous_codes_dir), ignore_errors=True)
+
+
+def load_or_build_snapshot(
+    path: str,
+    embedding_model: Embeddings,
+    build: Callable[[], Any],
+    force_reload: bool = False,
+    quantization: Quantization = Quantization.NONE,
+    rerank_factor: Optional[int] = None
+) -> "MmapVectorStore":
+    """
+    Attach to the snapshot at path, building and saving it first if needed.
+
+    Builds are serialized with a file lock next to the snapshot, so when several
+    workers miss at the same time one of them embeds the documents and the
+    others wait and map its result. Mapping an existing snapshot takes the
+    lock shared, so prune_snapshots cannot remove it halfway.
+
+    Args:
+        path: Snapshot directory
+        embedding_model: Embedding model used to embed queries
+        build: Callable returning a NumpyVectorStore or InMemoryVectorStore
+        force_reload: Rebuild even if a snapshot already exists
+        quantization: Codes to search the snapshot with; an existing snapshot
+            with other codes is re-encoded from its vectors
+        rerank_factor: Candidates re-scored against the full vectors per result
+            (see NumpyVectorStore.quantize)
+
+    Returns:
+        A read-only MmapVectorStore over the snapshot
+    """
+    quantization = Quantization(quantization)
+    lock_path = f"{os.path.abspath(path)}.lock"
+    while True:
+        write = force_reload or _snapshot_quantization(path) != quantization
+        with _file_lock(lock_path, shared=not write):
+            if write:
+                # Another worker may have built it while we waited for the lock
+                if force_reload or not snapshot_exists(path):
+                    save_snapshot(build(), path, quantization=quantization)
+                elif _snapshot_quantization(path) != quantization:
+                    quantize_snapshot(path, quantization)
+            elif _snapshot_quantization(path) != quantization:
+                # Pruned or re-encoded before we got the lock
+                continue
+            vectorstore = MmapVectorStore(path, embedding=embedding_model)
+        break
+
+    vectorstore.rerank_factor = rerank_factor
+    return vectorstore
+
+
+def _snapshot_quantization(path: str) -> Optional[Quantization]:
+    if not snapshot_exists(path):
+        return None
+    with open(os.path.join(path, MANIFEST_FILE)) as f:
+        return Quantization(json.load(f).get("quantization", Quantization.NONE.value))
+
+
+def prune_snapshots(root: str, keep: int) -> List[str]:
+    """
+    Remove all but the keep most recently created snapshots under root.
+
+    Each snapshot is removed under its file lock, and snapshots whose lock is
+    held (being built, re-encoded or mapped by another worker) are skipped
+    until a later prune. Workers that already mapped a removed snapshot keep
+    reading it until they drop it; the files are only freed once unmapped.
+
+    Returns:
+        The removed snapshot paths
+    """
+    if not os.path.isdir(root):
+        return []
+
+    snapshots = []
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if not name.startswith(".") and snapshot_exists(path):
+            snapshots.append((os.path.getmtime(os.path.join(path, MANIFEST_FILE)), path))
+
+    removed = []
+    for _, path in sorted(snapshots, reverse=True)[keep:]:
+        lock_path = f"{os.path.abspath(path)}.lock"
+        with _file_lock(lock_path, blocking=False) as locked:
+            if not locked:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            # Unlinked while held: workers waiting on it take the lock again on a new file
+            if os.path.exists(lock_path):
+                os.remove(lock_path)
+        removed.append(path)
+    return removed
+
+
+class MmapVectorStore(NumpyVectorStore):
+    """
+    Read-only NumpyVectorStore backed by a memory-mapped snapshot.
+
+    Vectors, texts and metadata are mapped rather than loaded, so opening a
+    snapshot is O(1) and every process mapping the same files shares one copy
+    in the page cache. Texts and metadata are only decoded for search hits.
+
+    Snapshots saved with quantization are searched through their (also mapped)
+    codes, so only the codes need to stay in memory: the full vectors are
+    paged in for the re-scored candidates only.
+    """
+
+    def __init__(self, path: str, embedding: Embeddings):
+        super().__init__(embedding=embedding)
+        self.path = path
+
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        if self.manifest.get("format") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {path}: {self.manifest.get('format')}")
+
+        self._size = self.manifest["count"]
+        self._vectors = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r") if self._size else None
+        self._text_offsets = np.load(os.path.join(path, TEXT_OFFSETS_FILE), mmap_mode="r")
+        self._metadata_offsets = np.load(os.path.join(path, METADATA_OFFSETS_FILE), mmap_mode="r")
+        self._text_data = _map_file(os.path.join(path, TEXTS_FILE))
+        self._metadata_data = _map_file(os.path.join(path, METADATA_FILE))
+        self._decoded_metadata: Optional[List[Dict[str, Any]]] = None
+
+        self.quantization = Quantization(self.manifest.get("quantization", Quantization.NONE.value))
+        if self.quantization != Quantization.NONE:
+            self._codes = QuantizedVectors.load(self.quantization, os.path.join(path, self.manifest["codes"]))
+
+    def add_embeddings(self, *args: Any, **kwargs: Any) -> List[str]:
+        raise ValueError("Snapshot vectorstores are read-only; rebuild the snapshot instead")
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        raise ValueError("Snapshot vectorstores are read-only; rebuild the snapshot instead")
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        if not self._id_to_row:
+            self._id_to_row = {entry["id"]: row for row, entry in enumerate(self._all_metadata())}
+        return [self._document(self._id_to_row[doc_id]) for doc_id in ids if doc_id in self._id_to_row]
+
+    def quantize(self, quantization: Quantization, rerank_factor: Optional[int] = None) -> None:
+        raise ValueError("Use load_or_build_snapshot(quantization=...) to quantize a snapshot")
+
+    def memory_report(self) -> Dict[str, Any]:
+        """
+        Memory held by the store, in bytes. The mapped files live in the shared
+        page cache and count as mapped_bytes; resident_bytes is what this
+        process holds privately.
+        """
+        resident = self._text_offsets.nbytes + self._metadata_offsets.nbytes
+        if self._decoded_metadata is not None:
+            resident += sum(len(entry) for entry in self._decoded_metadata) * 64
+        vector_bytes = self._vectors.nbytes if self._vectors is not None else 0
+        code_bytes = self._codes.nbytes if self._codes is not None else 0
+        return {
+            "documents": self._size,
+            "quantization": self.quantization.value,
+            "vector_bytes": vector_bytes,
+            "code_bytes": code_bytes,
+            "text_bytes": len(self._text_data) + len(self._metadata_data),
+            "mapped_bytes": vector_bytes + code_bytes + len(self._text_data) + len(self._metadata_data),
+            "resident_bytes": resident
+        }
+
+    def _document(self, row: int) -> Document:
+        entry = self._metadata_entry(row)
+        start, end = self._text_offsets[row], self._text_offsets[row + 1]
+        text = self._text_data[start:end].decode("utf-8")
+        return Document(id=entry["id"], page_content=text, metadata=entry["metadata"])
+
+    def _column(self, key: str) -> np.ndarray:
+        column = self._columns.get(key)
+        if column is None:
+            column = np.empty(self._size, dtype=object)
+            column[:] = [entry["metadata"].get(key) for entry in self._all_metadata()]
+            self._columns[key] = column
+        return column
+
+    def _metadata_entry(self, row: int) -> Dict[str, Any]:
+        if self._decoded_metadata is not None:
+            return self._decoded_metadata[row]
+        start, end = self._metadata_offsets[row], self._metadata_offsets[row + 1]
+        return json.loads(self._metadata_data[start:end])
+
+    def _all_metadata(self) -> List[Dict[str, Any]]:
+        # Only decoded when a filter or ID lookup needs every row
+        if self._decoded_metadata is None:
+            self._decoded_metadata = [self._metadata_entry(row) for row in range(self._size)]
+        return self._decoded_metadata
+
+
+def _snapshot_rows(vectorstore: Any) -> Tuple[List[str], List[str], List[Dict[str, Any]], np.ndarray]:
+    if isinstance(vectorstore, NumpyVectorStore):
+        return (
+            list(vectorstore._ids),
+            list(vectorstore._texts),
+            list(vectorstore._metadatas),
+            np.ascontiguousarray(vectorstore.vectors, dtype=np.float32)
+        )
+
+    if isinstance(vectorstore, InMemoryVectorStore):
+        entries = list(vectorstore.store.values())
+        vectors = np.asarray([entry["vector"] for entry in entries], dtype=np.float32)
+        if len(entries):
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return (
+            [entry["id"] for entry in entries],
+            [entry["text"] for entry in entries],
+            [entry["metadata"] for entry in entries],
+            vectors
+        )
+
+    raise ValueError(f"Cannot snapshot vectorstore of type {type(vectorstore).__name__}")
+
+
+def _write_blobs(data_path: str, offsets_path: str, blobs: Iterator[bytes]) -> None:
+    offsets = [0]
+    with open(data_path, "wb") as f:
+        for blob in blobs:
+            f.write(blob)
+            offsets.append(offsets[-1] + len(blob))
+    np.save(offsets_path, np.asarray(offsets, dtype=np.int64))
+
+
+def _map_file(path: str):
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap cannot map empty files
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@contextmanager
+def _file_lock(path: str, shared: bool = False, blocking: bool = True) -> Iterator[bool]:
+    """
+    Hold an exclusive (or shared) flock on path, yielding whether it was
+    acquired, which is always the case when blocking.
+
+    prune_snapshots unlinks lock files while holding them, so a lock acquired
+    on a file that is no longer at path is released and taken on the new one.
+    """
+    if fcntl is None:
+        yield True
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    operation = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+    if not blocking:
+        operation |= fcntl.LOCK_NB
+    while True:
+        with open(path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, operation)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                current = os.stat(path)
+            except FileNotFoundError:
+                current = None
+            if current is None or not os.path.samestat(current, os.fstat(lock_file.fileno())):
+                continue
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            return
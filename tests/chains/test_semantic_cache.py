@@ -0,0 +1,31 @@
+import time
+
+from chains.semantic_cache import SemanticAnswerCache
+
+
+def store(cache, vector, corpus_version):
+    cache.store("question", vector, "answer", [], corpus_version)
+
+
+def test_versions_without_entries_are_forgotten():
+    cache = SemanticAnswerCache(max_entries=4)
+    for i in range(50):
+        store(cache, [1.0, float(i % 3)], f"etag-{i}")
+
+    # Only the versions of the 4 entries left after eviction are tracked
+    assert sorted(cache._versions) == [f"etag-{i}" for i in range(46, 50)]
+    assert cache.lookup([1.0, 0.0], "etag-48") is not None
+    assert cache.lookup([1.0, 0.0], "etag-45") is None
+
+    cache.clear()
+    assert cache._versions == {}
+
+
+def test_expired_versions_are_forgotten():
+    cache = SemanticAnswerCache(ttl_seconds=0.01)
+    store(cache, [1.0, 0.0], "old")
+    time.sleep(0.02)
+    store(cache, [1.0, 0.0], "new")
+
+    assert cache.lookup([1.0, 0.0], "new") is not None
+    assert list(cache._versions) == ["new"]
@@ -0,0 +1,36 @@
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic embeddings that count the texts they embed."""
+
+    dimension = 8
+
+    def __init__(self):
+        self.embedded = 0
+
+    def embed_documents(self, texts):
+        self.embedded += len(texts)
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float((len(text) + i) % 7) for i in range(self.dimension)]
+
+
+@pytest.fixture
+def fake_embeddings():
+    """Factory of FakeEmbeddings; call it once per simulated indexing run."""
+    return FakeEmbeddings
+
+
+@pytest.fixture
+def make_documents():
+    """Factory of chunks with stable doc_ids, numbered from start."""
+    def make(count, start=0):
+        return [
+            Document(page_content=f"chunk number {i}", metadata={"doc_id": f"doc-{i}", "source": "test"})
+            for i in range(start, start + count)
+        ]
+    return make
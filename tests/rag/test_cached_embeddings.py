@@ -0,0 +1,27 @@
+from rag.embeddings.cached_embeddings import CachedEmbeddings, SQLiteEmbeddingStore, hash_text
+
+
+def test_replacing_vectors_keeps_the_size_accurate(tmp_path):
+    store = SQLiteEmbeddingStore(str(tmp_path / "embeddings.db"))
+
+    for _ in range(5):
+        store.put_many([("same", [0.5] * 8)], "model", 0)
+    store.put_many([("same", [0.5] * 4), ("other", [0.5] * 8), ("other", [0.5] * 8)], "model", 0)
+
+    assert store.size_bytes() == store._count_bytes() == 16 + 32
+    assert len(store) == 2
+
+
+def test_repeated_misses_do_not_evict_early(tmp_path, fake_embeddings):
+    texts = [f"chunk {i}" for i in range(10)]
+    # Room for the 10 vectors, though above the 90% an eviction would shrink to
+    store = SQLiteEmbeddingStore(str(tmp_path / "embeddings.db"), max_bytes=10 * fake_embeddings.dimension * 4 + 20)
+
+    # Two requests missed on the same texts before either stored its vectors
+    for _ in range(2):
+        CachedEmbeddings(fake_embeddings(), store, "model")._store_missing(
+            {hash_text(text): i for i, text in enumerate(texts)}, fake_embeddings().embed_documents(texts)
+        )
+
+    assert len(store) == 10
+    assert store.size_bytes() == store._count_bytes()
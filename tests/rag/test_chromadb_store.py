@@ -0,0 +1,82 @@
+import pytest
+from chromadb.api.models.Collection import Collection
+
+from rag.vectorstores.chromadb_store import fetch_existing_ids, setup_chromadb_vectorstore
+
+
+@pytest.fixture
+def get_calls(monkeypatch):
+    """Record the ids and include arguments of every Collection.get call."""
+    calls = []
+    original_get = Collection.get
+
+    def recording_get(self, ids=None, *args, include=None, **kwargs):
+        calls.append({"ids": list(ids) if ids is not None else None, "include": include})
+        if include is None:
+            return original_get(self, ids, *args, **kwargs)
+        return original_get(self, ids, *args, include=include, **kwargs)
+
+    monkeypatch.setattr(Collection, "get", recording_get)
+    return calls
+
+
+def test_rerun_embeds_only_new_documents(tmp_path, get_calls, capsys, fake_embeddings, make_documents):
+    embeddings = fake_embeddings()
+    setup_chromadb_vectorstore(make_documents(50), embeddings, collection_name="docs", persist_directory=str(tmp_path))
+    assert embeddings.embedded == 50
+    assert "added 50 documents, skipped 0" in capsys.readouterr().out
+
+    get_calls.clear()
+    embeddings = fake_embeddings()
+    vectorstore = setup_chromadb_vectorstore(
+        make_documents(80), embeddings, collection_name="docs", persist_directory=str(tmp_path)
+    )
+
+    assert embeddings.embedded == 30
+    assert "added 30 documents, skipped 50 already stored or repeated" in capsys.readouterr().out
+    assert vectorstore._collection.count() == 80
+    # Only the candidate IDs are looked up, and only their IDs are returned
+    assert [call["ids"] for call in get_calls] == [[f"doc-{i}" for i in range(80)]]
+    assert all(call["include"] == [] for call in get_calls)
+
+
+def test_repeated_documents_are_embedded_once(tmp_path, get_calls, capsys, fake_embeddings, make_documents):
+    embeddings = fake_embeddings()
+    documents = make_documents(10) + make_documents(5)
+
+    vectorstore = setup_chromadb_vectorstore(documents, embeddings, collection_name="docs", persist_directory=str(tmp_path))
+
+    assert embeddings.embedded == 10
+    assert vectorstore._collection.count() == 10
+    assert "added 10 documents, skipped 5 already stored or repeated" in capsys.readouterr().out
+    # Repeated candidates are looked up once
+    assert [call["ids"] for call in get_calls] == [[f"doc-{i}" for i in range(10)]]
+
+
+def test_force_reload_skips_the_existence_check(tmp_path, get_calls, fake_embeddings, make_documents):
+    setup_chromadb_vectorstore(make_documents(10), fake_embeddings(), collection_name="docs", persist_directory=str(tmp_path))
+    get_calls.clear()
+
+    embeddings = fake_embeddings()
+    vectorstore = setup_chromadb_vectorstore(
+        make_documents(5, start=100), embeddings, collection_name="docs",
+        persist_directory=str(tmp_path), force_reload=True
+    )
+
+    # The collection was just recreated, so nothing was looked up before adding
+    assert get_calls == []
+    assert embeddings.embedded == 5
+    assert sorted(vectorstore._collection.get(include=[])["ids"]) == [f"doc-{i}" for i in range(100, 105)]
+
+
+def test_fetch_existing_ids_pages_through_candidates(tmp_path, get_calls, fake_embeddings, make_documents):
+    vectorstore = setup_chromadb_vectorstore(
+        make_documents(20), fake_embeddings(), collection_name="docs", persist_directory=str(tmp_path)
+    )
+    get_calls.clear()
+
+    existing = fetch_existing_ids(vectorstore._collection, [f"doc-{i}" for i in range(15, 25)], page_size=4)
+
+    assert existing == {f"doc-{i}" for i in range(15, 20)}
+    assert [len(call["ids"]) for call in get_calls] == [4, 4, 2]
+    assert all(call["include"] == [] for call in get_calls)
@@ -0,0 +1,45 @@
+from langchain_core.documents import Document
+
+from rag.dedup import ChunkDeduplicator
+
+SPEC = (
+    "Mounting bracket {part}. Fasten the bracket to the frame with four M8 bolts tightened to {torque} Nm. "
+    "Net weight {weight} kg. Supplied with a zinc coating for outdoor use. List price {price} EUR per unit."
+)
+DISCLAIMER = (
+    "This document is provided for information only and does not constitute an offer. "
+    "All specifications are subject to change without notice. Reproduction of this document "
+    "in whole or in part requires the prior written consent of the publisher. Printed {date}."
+)
+
+
+def test_only_exact_duplicates_are_dropped_by_default():
+    deduplicator = ChunkDeduplicator()
+    texts = [
+        DISCLAIMER.format(date="March 2024"),
+        DISCLAIMER.format(date="April 2024"),
+        "  " + DISCLAIMER.format(date="March 2024").replace(" ", "\n", 3),
+    ]
+
+    kept = deduplicator.deduplicate([Document(page_content=text) for text in texts])
+
+    assert [doc.page_content for doc in kept] == texts[:2]
+    assert deduplicator.stats.exact_duplicates == 1
+    assert deduplicator.stats.near_duplicates == 0
+
+
+def test_near_duplicates_are_dropped_when_enabled():
+    deduplicator = ChunkDeduplicator(near_duplicate_threshold=0.8)
+
+    assert deduplicator.check(DISCLAIMER.format(date="March 2024")) is None
+    assert deduplicator.check(DISCLAIMER.format(date="April 2024")) == "near"
+    assert deduplicator.check(DISCLAIMER.format(date="March 2024")) == "exact"
+
+
+def test_chunks_differing_only_in_numbers_are_kept():
+    deduplicator = ChunkDeduplicator(near_duplicate_threshold=0.8)
+    first = SPEC.format(part="XJ-4412", torque=35, weight=1.2, price=49)
+    second = SPEC.format(part="XJ-9031", torque=90, weight=3.4, price=129)
+
+    assert deduplicator.check(first) is None
+    assert deduplicator.check(second) is None
@@ -0,0 +1,125 @@
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from rag.embeddings import get_embedding_dimension
+from rag.vectorstores.pinecone_store import UpsertProgress, fetch_existing_ids, upsert_documents
+
+class FakeIndex:
+    """In-memory stand-in for a Pinecone index, recording the requests it gets."""
+
+    def __init__(self, fail_after_upserts=None):
+        self.namespaces = {}
+        self.fetch_sizes = []
+        self.upsert_sizes = []
+        self.delete_calls = 0
+        self.fail_after_upserts = fail_after_upserts
+        self._lock = threading.Lock()
+
+    def fetch(self, ids, namespace=None):
+        with self._lock:
+            self.fetch_sizes.append(len(ids))
+            stored = self.namespaces.get(namespace or "", {})
+            return SimpleNamespace(vectors={i: stored[i] for i in ids if i in stored})
+
+    def upsert(self, vectors, namespace=None):
+        with self._lock:
+            if self.fail_after_upserts is not None and len(self.upsert_sizes) >= self.fail_after_upserts:
+                raise ConnectionError("injected upsert failure")
+            self.upsert_sizes.append(len(vectors))
+            stored = self.namespaces.setdefault(namespace or "", {})
+            for doc_id, values, metadata in vectors:
+                stored[doc_id] = {"values": values, "metadata": metadata}
+
+    def delete(self, delete_all=False, namespace=None):
+        with self._lock:
+            self.delete_calls += 1
+            self.namespaces.pop(namespace or "", None)
+
+
+def test_fetch_existing_ids_checks_every_id_in_batches(fake_embeddings):
+    index = FakeIndex()
+    index.upsert([(f"doc-{i}", [0.0] * fake_embeddings.dimension, {}) for i in range(12000)], namespace="ns")
+
+    ids = [f"doc-{i}" for i in range(11500, 12500)]
+    existing = fetch_existing_ids(index, ids, namespace="ns", batch_size=200)
+
+    # Past the 10k limit of the old top_k query
+    assert existing == {f"doc-{i}" for i in range(11500, 12000)}
+    assert index.fetch_sizes == [200] * 5
+
+
+def test_upsert_skips_existing_documents_and_batches_upserts(fake_embeddings, make_documents):
+    index = FakeIndex()
+    embeddings = fake_embeddings()
+    upsert_documents(index, make_documents(50), embeddings, namespace="ns", upsert_batch_size=20)
+    assert embeddings.embedded == 50
+
+    index.upsert_sizes.clear()
+    embeddings.embedded = 0
+    written = upsert_documents(index, make_documents(80), embeddings, namespace="ns", upsert_batch_size=20)
+
+    assert written == 30
+    assert embeddings.embedded == 30
+    assert sum(index.upsert_sizes) == 30
+    assert max(index.upsert_sizes) <= 20
+    assert len(index.namespaces["ns"]) == 80
+    assert index.namespaces["ns"]["doc-0"]["metadata"]["text"] == "chunk number 0"
+
+
+def test_force_reload_deletes_namespace_once(fake_embeddings, make_documents):
+    index = FakeIndex()
+    upsert_documents(index, make_documents(10), fake_embeddings(), namespace="ns")
+    index.fetch_sizes.clear()
+
+    written = upsert_documents(index, make_documents(5, start=100), fake_embeddings(), namespace="ns", force_reload=True)
+
+    assert index.delete_calls == 1
+    assert written == 5
+    assert sorted(index.namespaces["ns"]) == [f"doc-{i}" for i in range(100, 105)]
+    # The namespace was just wiped, so no existence check is needed
+    assert index.fetch_sizes == []
+
+
+def test_interrupted_reload_resumes_without_wiping_again(tmp_path, fake_embeddings, make_documents):
+    index = FakeIndex(fail_after_upserts=3)
+    progress_dir = str(tmp_path)
+    documents = make_documents(100)
+
+    with pytest.raises(ConnectionError):
+        upsert_documents(
+            index, documents, fake_embeddings(), namespace="ns", force_reload=True,
+            progress=UpsertProgress.for_namespace(progress_dir, "idx", "ns"),
+            upsert_batch_size=10, upsert_concurrency=1
+        )
+
+    progress_path = tmp_path / "idx" / "ns.json"
+    state = json.loads(progress_path.read_text())
+    assert state["status"] == "loading"
+    assert state["reload"] is True
+    assert state["written"] == 30
+    assert len(index.namespaces["ns"]) == 30
+
+    index.fail_after_upserts = None
+    embeddings = fake_embeddings()
+    written = upsert_documents(
+        index, documents, embeddings, namespace="ns", force_reload=True,
+        progress=UpsertProgress.for_namespace(progress_dir, "idx", "ns"),
+        upsert_batch_size=10
+    )
+
+    assert index.delete_calls == 1
+    assert written == 70
+    assert embeddings.embedded == 70
+    assert len(index.namespaces["ns"]) == 100
+    state = json.loads(progress_path.read_text())
+    assert state["status"] == "complete"
+    assert state["written"] == 100
+
+
+def test_embedding_dimension_comes_from_the_model(fake_embeddings):
+    assert get_embedding_dimension(fake_embeddings()) == fake_embeddings.dimension
+    assert get_embedding_dimension(SimpleNamespace(model="text-embedding-3-large", dimensions=None)) == 3072
+    assert get_embedding_dimension(SimpleNamespace(model="text-embedding-3-large", dimensions=256)) == 256
@@ -0,0 +1,130 @@
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from rag.loaders.s3_directory_loader import list_s3_objects
+from rag.loaders.s3_parallel_loader import S3ParallelLoader, create_s3_client
+
+BUCKET = "parallel-loader-test"
+
+
+class FlakyClient:
+    """Wraps an S3 client so get_object fails a number of times per key."""
+
+    def __init__(self, client, failures, code="SlowDown"):
+        self.client = client
+        self.failures = dict(failures)
+        self.code = code
+        self.calls = {}
+
+    def get_object(self, **kwargs):
+        key = kwargs["Key"]
+        self.calls[key] = self.calls.get(key, 0) + 1
+        if self.failures.get(key, 0) > 0:
+            self.failures[key] -= 1
+            raise ClientError({"Error": {"Code": self.code, "Message": "injected"}}, "GetObject")
+        return self.client.get_object(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+@pytest.fixture
+def s3_client():
+    with mock_aws():
+        client = create_s3_client(max_pool_connections=8, region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        for i in range(30):
+            client.put_object(Bucket=BUCKET, Key=f"docs/file-{i:02d}.txt", Body=f"document {i}".encode())
+        client.put_object(Bucket=BUCKET, Key="docs/skip.bin", Body=b"\x00\x01")
+        client.put_object(Bucket=BUCKET, Key="docs/folder/", Body=b"")
+        yield client
+
+
+def test_create_s3_client_sizes_pool():
+    with mock_aws():
+        client = create_s3_client(max_pool_connections=32, region_name="us-east-1")
+        assert client.meta.config.max_pool_connections == 32
+
+
+def test_load_returns_documents_in_listing_order(s3_client):
+    objects = list_s3_objects(BUCKET, "docs/", ".txt", s3_client=s3_client)
+    assert len(objects) == 30
+
+    loader = S3ParallelLoader(BUCKET, s3_client=s3_client, max_concurrency=8)
+    results = loader.load(objects)
+
+    assert list(results) == [obj["Key"] for obj in objects]
+    for i, docs in enumerate(results.values()):
+        assert len(docs) == 1
+        assert docs[0].page_content == f"document {i}"
+        assert docs[0].metadata["source"] == f"s3://{BUCKET}/docs/file-{i:02d}.txt"
+    assert loader.progress.completed_objects == 30
+    assert loader.progress.downloaded_bytes == loader.progress.total_bytes
+
+
+def test_transient_errors_are_retried(s3_client):
+    objects = list_s3_objects(BUCKET, "docs/", ".txt", s3_client=s3_client)
+    flaky = FlakyClient(s3_client, {"docs/file-03.txt": 2, "docs/file-07.txt": 1})
+
+    loader = S3ParallelLoader(BUCKET, s3_client=flaky, backoff_seconds=0.001)
+    results = loader.load(objects)
+
+    assert len(results) == 30
+    assert flaky.calls["docs/file-03.txt"] == 3
+    assert loader.progress.retries == 3
+    assert loader.progress.downloaded_bytes == loader.progress.total_bytes
+
+
+def test_retries_are_bounded(s3_client):
+    objects = list_s3_objects(BUCKET, "docs/file-01", s3_client=s3_client)
+    flaky = FlakyClient(s3_client, {"docs/file-01.txt": 10})
+
+    loader = S3ParallelLoader(BUCKET, s3_client=flaky, max_retries=2, backoff_seconds=0.001)
+    with pytest.raises(ClientError):
+        loader.load(objects)
+    assert flaky.calls["docs/file-01.txt"] == 3
+
+
+def test_permanent_errors_are_not_retried(s3_client):
+    objects = list_s3_objects(BUCKET, "docs/", ".txt", s3_client=s3_client)
+    objects.append({"Key": "docs/missing.txt", "Size": 0})
+    flaky = FlakyClient(s3_client, {})
+
+    loader = S3ParallelLoader(BUCKET, s3_client=flaky, raise_on_error=False)
+    results = loader.load(objects)
+
+    assert len(results) == 30
+    assert "docs/missing.txt" in loader.errors
+    assert flaky.calls["docs/missing.txt"] == 1
+    assert loader.progress.failed_objects == 1
+
+
+def test_large_bodies_spool_to_disk(s3_client):
+    body = b"x" * (3 * 1024 * 1024)
+    s3_client.put_object(Bucket=BUCKET, Key="big/large.txt", Body=body)
+    objects = list_s3_objects(BUCKET, "big/", s3_client=s3_client)
+
+    rolled = []
+
+    def parse(bucket_name, key, spool):
+        rolled.append(spool._rolled)
+        return []
+
+    loader = S3ParallelLoader(BUCKET, s3_client=s3_client, spool_max_bytes=1024 * 1024, parse=parse)
+    loader.load(objects)
+
+    assert rolled == [True]
+    assert loader.progress.downloaded_bytes == len(body)
+
+
+def test_progress_callback(s3_client):
+    objects = list_s3_objects(BUCKET, "docs/", ".txt", s3_client=s3_client)
+    seen = []
+
+    loader = S3ParallelLoader(BUCKET, s3_client=s3_client, on_progress=lambda p: seen.append(p.completed_objects))
+    loader.load(objects)
+
+    assert sorted(seen) == list(range(1, 31))
+    assert loader.progress.throughput_mb_s > 0
+    assert "30/30 objects" in str(loader.progress)
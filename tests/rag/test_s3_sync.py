@@ -0,0 +1,60 @@
+import pytest
+from moto import mock_aws
+
+import chains.rag_chain as rag_chain
+from rag.loaders.s3_parallel_loader import create_s3_client
+from rag.loaders.s3_sync import sync_s3_directory
+from rag.vectorstores import VectorStoreType
+
+BUCKET = "sync-test"
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        client = create_s3_client(region_name="us-east-1")
+        client.create_bucket(Bucket=BUCKET)
+        for i in range(3):
+            client.put_object(Bucket=BUCKET, Key=f"docs/file-{i}.txt", Body=f"document number {i}".encode())
+        yield client
+
+
+@pytest.mark.parametrize("vectorstore_type", [VectorStoreType.IN_MEMORY, VectorStoreType.NUMPY])
+def test_sync_requires_a_persistent_vectorstore(tmp_path, vectorstore_type):
+    with pytest.raises(ValueError, match="persistent vectorstore"):
+        rag_chain.create_vectorstore(
+            source_type=rag_chain.SourceType.S3_DIRECTORY, bucket_name=BUCKET, prefix="docs/",
+            vectorstore_type=vectorstore_type, sync_manifest_path=str(tmp_path / "manifest.json")
+        )
+
+
+def test_force_reload_syncs_against_an_empty_manifest(tmp_path, s3_client):
+    manifest_path = str(tmp_path / "manifest.json")
+    sync_s3_directory(BUCKET, "docs/", manifest_path, s3_client=s3_client, show_progress=False).commit()
+
+    unchanged = sync_s3_directory(BUCKET, "docs/", manifest_path, s3_client=s3_client, show_progress=False)
+    assert unchanged.documents == [] and len(unchanged.unchanged_keys) == 3
+
+    reloaded = sync_s3_directory(
+        BUCKET, "docs/", manifest_path, s3_client=s3_client, show_progress=False, force_reload=True
+    )
+    assert len(reloaded.added_keys) == 3
+    assert len(reloaded.documents) == 3
+    assert reloaded.stale_doc_ids == []
+
+
+def test_force_reload_reindexes_every_object(tmp_path, s3_client, monkeypatch, fake_embeddings):
+    monkeypatch.setattr(rag_chain, "get_openai_embeddings", lambda **kwargs: fake_embeddings())
+    options = dict(
+        source_type=rag_chain.SourceType.S3_DIRECTORY, bucket_name=BUCKET, prefix="docs/",
+        region_name="us-east-1", vectorstore_type=VectorStoreType.CHROMA, collection_name="docs",
+        chroma_db_path=str(tmp_path / "chroma"), sync_manifest_path=str(tmp_path / "manifest.json")
+    )
+
+    vectorstore = rag_chain.create_vectorstore(**options)
+    assert vectorstore._collection.count() == 3
+
+    # The collection is wiped, so unchanged objects must be indexed again
+    vectorstore = rag_chain.create_vectorstore(force_reload=True, **options)
+    assert vectorstore._collection.count() == 3
@@ -0,0 +1,71 @@
+import os
+import time
+
+import pytest
+
+from rag.vectorstores.numpy_store import NumpyVectorStore
+from rag.vectorstores.quantization import Quantization
+from rag.vectorstores.snapshot import (
+    _file_lock, load_or_build_snapshot, prune_snapshots, save_snapshot, snapshot_exists
+)
+
+
+@pytest.fixture
+def build(fake_embeddings, make_documents):
+    def build():
+        store = NumpyVectorStore(embedding=fake_embeddings())
+        store.add_documents(make_documents(5))
+        return store
+    return build
+
+
+def save_snapshots(root, build, names):
+    paths = []
+    for name in names:
+        paths.append(save_snapshot(build(), os.path.join(root, name)))
+        # Snapshots are pruned oldest first by manifest mtime
+        time.sleep(0.01)
+    return paths
+
+
+def test_prune_removes_the_oldest_snapshots_and_their_locks(tmp_path, build):
+    oldest, older, new = save_snapshots(str(tmp_path), build, ["oldest", "older", "new"])
+    load_or_build_snapshot(oldest, build().embeddings, build)
+
+    assert prune_snapshots(str(tmp_path), keep=1) == [older, oldest]
+    assert snapshot_exists(new)
+    assert not snapshot_exists(oldest) and not os.path.exists(f"{oldest}.lock")
+
+
+def test_prune_skips_snapshots_whose_lock_is_held(tmp_path, build):
+    busy, idle, new = save_snapshots(str(tmp_path), build, ["busy", "idle", "new"])
+
+    # Another worker is building, re-encoding or mapping it
+    with _file_lock(f"{busy}.lock", shared=True):
+        assert prune_snapshots(str(tmp_path), keep=1) == [idle]
+    assert snapshot_exists(busy)
+    assert prune_snapshots(str(tmp_path), keep=1) == [busy]
+
+
+def test_build_waiting_on_a_pruned_lock_takes_the_new_one(tmp_path, build):
+    path = os.path.join(str(tmp_path), "corpus")
+    with _file_lock(f"{path}.lock") as locked:
+        assert locked
+        # What prune_snapshots does while holding it
+        os.remove(f"{path}.lock")
+        with _file_lock(f"{path}.lock", blocking=False) as relocked:
+            assert relocked
+
+    store = load_or_build_snapshot(path, build().embeddings, build)
+    assert len(store) == 5
+
+
+def test_snapshot_stores_refuse_writes(tmp_path, build, make_documents):
+    store = load_or_build_snapshot(os.path.join(str(tmp_path), "corpus"), build().embeddings, build)
+
+    with pytest.raises(ValueError, match="read-only"):
+        store.add_documents(make_documents(1, start=10))
+    with pytest.raises(ValueError, match="read-only"):
+        store.delete(["doc-0"])
+    with pytest.raises(ValueError, match="load_or_build_snapshot"):
+        store.quantize(Quantization.INT8)
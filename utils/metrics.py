@@ -0,0 +1,369 @@
+"""
+Prometheus metrics of the RAG pipeline and the API.
+
+Counters, gauges and histograms are sharded per thread: every thread updates
+its own dict without taking a lock, and a scrape (render()) sums the shards of
+all threads. Shards of finished threads are folded into a retired total, so
+short-lived worker threads do not accumulate. Updates cost a thread-local
+lookup and a dict update, cheap enough to leave on in production.
+
+Metrics are per process; with several uvicorn workers every worker reports its
+own values.
+"""
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Request latencies, from cached lookups to long LLM generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# In-process vector searches take well under a second
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Labels = Tuple[str, ...]
+
+
+class _ShardToken:
+    """Kept in the owning thread's locals; its finalizer retires the shard when the thread ends."""
+    __slots__ = ("__weakref__",)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), registry: Optional["Registry"] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: Dict[int, Dict[Labels, Any]] = {}
+        self._retired: Dict[Labels, Any] = {}
+        # Reentrant: a shard may be retired by garbage collection while collecting
+        self._lock = threading.RLock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def _values(self) -> Dict[Labels, Any]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values: Dict[Labels, Any] = {}
+            token = _ShardToken()
+            with self._lock:
+                self._shards[id(token)] = values
+            weakref.finalize(token, self._retire, id(token))
+            self._local.values = values
+            self._local.token = token
+            return values
+
+    def _retire(self, shard_id: int) -> None:
+        with self._lock:
+            values = self._shards.pop(shard_id, None)
+            if values:
+                self._merge(self._retired, values)
+
+    def _merge(self, into: Dict[Labels, Any], values: Dict[Labels, Any]) -> None:
+        for labels, value in values.items():
+            into[labels] = into.get(labels, 0) + value
+
+    def _check(self, labels: Labels) -> None:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+
+    def collect(self) -> Dict[Labels, Any]:
+        """Values summed over all threads, per label values."""
+        with self._lock:
+            totals: Dict[Labels, Any] = {}
+            self._merge(totals, self._retired)
+            for values in list(self._shards.values()):
+                # dict.copy() is atomic, so a shard can be read while its thread updates it
+                self._merge(totals, values.copy())
+        return totals
+
+    def samples(self) -> Iterator[Tuple[str, Labels, Tuple[str, ...], float]]:
+        for labels, value in sorted(self.collect().items()):
+            yield self.name, self.labelnames, labels, value
+
+
+class Counter(_Metric):
+    """Monotonic count, e.g. requests or tokens."""
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._check(labels)
+        values = self._values()
+        values[labels] = values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """Value that goes up and down, tracked with inc/dec or read from a function at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._function: Optional[Callable[[], Any]] = None
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._check(labels)
+        values = self._values()
+        values[labels] = values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self.inc(*labels, amount=-amount)
+
+    def set_function(self, function: Callable[[], Any]) -> None:
+        """
+        Report function() at every scrape: a number, or a dict of label values
+        tuples to numbers for labelled gauges.
+        """
+        self._function = function
+
+    def collect(self) -> Dict[Labels, Any]:
+        if self._function is None:
+            return super().collect()
+        value = self._function()
+        return dict(value) if isinstance(value, dict) else {(): value}
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, e.g. latencies."""
+    kind = "histogram"
+
+    def __init__(self, *args: Any, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str) -> None:
+        self._check(labels)
+        values = self._values()
+        counts = values.get(labels)
+        if counts is None:
+            # One count per bucket and +Inf, then the sum of the observed values
+            counts = values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        """Observe the duration of the block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def _merge(self, into: Dict[Labels, Any], values: Dict[Labels, Any]) -> None:
+        for labels, counts in values.items():
+            counts = list(counts)
+            if labels in into:
+                into[labels] = [a + b for a, b in zip(into[labels], counts)]
+            else:
+                into[labels] = counts
+
+    def samples(self) -> Iterator[Tuple[str, Labels, Tuple[str, ...], float]]:
+        bucket_names = self.labelnames + ("le",)
+        for labels, counts in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", bucket_names, labels + (_format_value(bound),), cumulative
+            yield f"{self.name}_sum", self.labelnames, labels, counts[-1]
+            yield f"{self.name}_count", self.labelnames, labels, cumulative
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    """Set of metrics rendered together in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> None:
+        with self._lock:
+            if any(existing.name == metric.name for existing in self._metrics):
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics.append(metric)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                lines.append(f"# Error collecting {metric.name}: {_escape(e)}")
+                continue
+            for name, labelnames, labels, value in samples:
+                if labelnames:
+                    pairs = ",".join(f'{key}="{_escape(label)}"' for key, label in zip(labelnames, labels))
+                    name = f"{name}{{{pairs}}}"
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# API
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending the last byte of its response",
+    ("method", "route")
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled")
+THREAD_POOL_QUEUE_DEPTH = Gauge("thread_pool_queue_depth", "Tasks waiting for a thread of a pool", ("pool",))
+
+# Models
+LLM_REQUESTS = Counter("llm_requests_total", "LLM calls", ("model", "status"))
+LLM_REQUEST_DURATION = Histogram("llm_request_duration_seconds", "LLM call latency", ("model",))
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens reported by the provider", ("model", "type"))
+EMBEDDING_REQUESTS = Counter("embedding_requests_total", "Embedding API requests", ("model", "status"))
+EMBEDDING_REQUEST_DURATION = Histogram("embedding_request_duration_seconds", "Embedding API request latency", ("model",))
+EMBEDDING_TOKENS = Counter(
+    "embedding_tokens_total", "Tokens sent to the embedding API, estimated at 4 characters per token", ("model",)
+)
+
+# Retrieval and caches
+VECTORSTORE_QUERY_DURATION = Histogram(
+    "vectorstore_query_duration_seconds", "Vector store searches, including embedding the query",
+    ("store",), buckets=QUERY_BUCKETS
+)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by cache and result (hit or miss)", ("cache", "result"))
+
+# S3
+S3_DOWNLOADED_BYTES = Counter("s3_downloaded_bytes_total", "Bytes of S3 objects downloaded, including retried downloads")
+
+
+def cache_lookup(cache: str, hit: bool, count: int = 1) -> None:
+    CACHE_LOOKUPS.inc(cache, "hit" if hit else "miss", amount=count)
+
+
+def _reported_usage(response: Any) -> Optional[Tuple[int, int]]:
+    """(prompt, completion) tokens reported by the provider, if any."""
+    usage = (response.llm_output or {}).get("token_usage")
+    if usage:
+        return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+    prompt = completion = 0
+    found = False
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                found = True
+                prompt += metadata.get("input_tokens", 0)
+                completion += metadata.get("output_tokens", 0)
+    return (prompt, completion) if found else None
+
+
+class MetricsCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback handler recording LLM calls and vector store searches.
+
+    It is registered for every LangChain run of the process (see
+    register_configure_hook), so all chains and agents are covered without
+    passing callbacks around.
+    """
+
+    # Run in the caller rather than on an executor thread, which would cost more than the update
+    run_inline = True
+
+    def __init__(self):
+        self._started: Dict[UUID, Tuple[float, str]] = {}
+
+    @property
+    def ignore_chain(self) -> bool:
+        return True
+
+    @property
+    def ignore_agent(self) -> bool:
+        return True
+
+    def _start_llm(self, run_id: UUID, metadata: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = (metadata or {}).get("ls_model_name") or params.get("model_name") or params.get("model") or "unknown"
+        self._started[run_id] = (time.perf_counter(), str(model))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        self._start_llm(run_id, metadata, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start_llm(run_id, metadata, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        start, model = started
+        LLM_REQUEST_DURATION.observe(time.perf_counter() - start, model)
+        LLM_REQUESTS.inc(model, "ok")
+        usage = _reported_usage(response)
+        if usage is not None:
+            LLM_TOKENS.inc(model, "prompt", amount=usage[0])
+            LLM_TOKENS.inc(model, "completion", amount=usage[1])
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            LLM_REQUEST_DURATION.observe(time.perf_counter() - started[0], started[1])
+            LLM_REQUESTS.inc(started[1], "error")
+
+    def on_retriever_start(self, serialized, query, *, run_id, metadata=None, **kwargs):
+        # Only vector store retrievers, not the retrievers wrapping them
+        store = (metadata or {}).get("ls_vector_store_provider")
+        if store:
+            self._started[run_id] = (time.perf_counter(), store)
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is not None:
+            VECTORSTORE_QUERY_DURATION.observe(time.perf_counter() - started[0], started[1])
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._started.pop(run_id, None)
+
+
+_metrics_handler: ContextVar[Optional[MetricsCallbackHandler]] = ContextVar(
+    "metrics_callback_handler", default=MetricsCallbackHandler()
+)
+register_configure_hook(_metrics_handler, inheritable=True)
+
+
+@contextmanager
+def metered_embedding(model: str, texts: Sequence[str]) -> Iterator[None]:
+    """Record one embedding API request for texts around the block."""
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        EMBEDDING_REQUESTS.inc(model, "error")
+        raise
+    finally:
+        EMBEDDING_REQUEST_DURATION.observe(time.perf_counter() - start, model)
+    EMBEDDING_REQUESTS.inc(model, "ok")
+    # Tokenizing again just for a counter would double the cost of batching the texts
+    EMBEDDING_TOKENS.inc(model, amount=sum(len(text) for text in texts) // 4)
+
+
+def render() -> str:
+    return REGISTRY.render()
@@ -0,0 +1,250 @@
+"""
+Sampling profiler for individual requests.
+
+A background thread wakes up every interval while profiles are being
+recorded and takes the Python stack of the threads working for each profiled
+request: the event loop thread while the request's task is running on it, and
+threads of a ProfiledThreadPoolExecutor while they run a call submitted by the
+request (e.g. asyncio.to_thread in the API). Nothing is traced or hooked
+between samples, so a recording request pays only for the sampling thread and
+other requests pay nothing.
+
+Profiles are written as collapsed stacks ("frame;frame;frame count" lines),
+which flamegraph.pl, speedscope and inferno read directly.
+"""
+import asyncio
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from types import CodeType, FrameType
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_INTERVAL = 0.01
+# Deeper stacks are cut at the root end, which is mostly framework code
+MAX_STACK_DEPTH = 128
+
+PROFILE_SUFFIX = ".collapsed"
+METADATA_SUFFIX = ".json"
+_PROFILE_ID = re.compile(r"^[A-Za-z0-9_.-]{1,128}$")
+
+_current_session: ContextVar[Optional["ProfileSession"]] = ContextVar("profile_session", default=None)
+
+# Frame labels by code object, so a sample costs a dict lookup per frame
+_labels: Dict[CodeType, str] = {}
+
+
+def _label(frame: FrameType) -> str:
+    code = frame.f_code
+    label = _labels.get(code)
+    if label is None:
+        module = frame.f_globals.get("__name__", "?")
+        label = _labels[code] = f"{module}:{getattr(code, 'co_qualname', code.co_name)}".replace(";", ",").replace(" ", "_")
+    return label
+
+
+def _stack(frame: Optional[FrameType]) -> Tuple[str, ...]:
+    labels = []
+    while frame is not None and len(labels) < MAX_STACK_DEPTH:
+        labels.append(_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return tuple(labels)
+
+
+class ProfileSession:
+    """Stack samples of one request."""
+
+    def __init__(self, name: str, interval: float, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.name = name
+        self.interval = interval
+        self.loop = loop
+        self.task = asyncio.current_task(loop) if loop is not None else None
+        self.thread_id = threading.get_ident()
+        self.started_at = time.time()
+        self.duration: Optional[float] = None
+        self.samples: Counter = Counter()
+        self._start = time.perf_counter()
+        # Pool threads currently running calls for this request, with their nesting depth
+        self._workers: Dict[int, int] = {}
+        self._token = None
+
+    def attach_thread(self) -> None:
+        thread_id = threading.get_ident()
+        self._workers[thread_id] = self._workers.get(thread_id, 0) + 1
+
+    def detach_thread(self) -> None:
+        thread_id = threading.get_ident()
+        depth = self._workers.get(thread_id, 0) - 1
+        if depth > 0:
+            self._workers[thread_id] = depth
+        else:
+            self._workers.pop(thread_id, None)
+
+    def sample(self, frames: Dict[int, FrameType]) -> None:
+        frame = frames.get(self.thread_id)
+        # The event loop runs other requests' tasks too; only count our own
+        if frame is not None and (self.task is None or asyncio.current_task(self.loop) is self.task):
+            self.samples[("event-loop" if self.task is not None else "thread",) + _stack(frame)] += 1
+        for thread_id in list(self._workers):
+            frame = frames.get(thread_id)
+            if frame is not None:
+                self.samples[("thread-pool",) + _stack(frame)] += 1
+
+    def stop(self) -> None:
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._start
+
+    def collapsed(self) -> str:
+        """The samples as collapsed stacks, most frequent first."""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.samples.most_common())
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every active ProfileSession from a background thread,
+    which only runs while at least one session is active.
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL, max_sessions: int = 4):
+        self.interval = interval
+        self.max_sessions = max_sessions
+        self._sessions: List[ProfileSession] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, name: str, loop: Optional[asyncio.AbstractEventLoop] = None) -> Optional[ProfileSession]:
+        """
+        Start profiling the calling thread (or, with loop, the current task on it)
+        and the pool calls it submits. Returns None when max_sessions are
+        already recording, which bounds the profiling overhead.
+        """
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                return None
+            session = ProfileSession(name, self.interval, loop)
+            self._sessions.append(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+            self._wakeup.notify()
+        session._token = _current_session.set(session)
+        return session
+
+    def stop(self, session: ProfileSession) -> ProfileSession:
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        session.stop()
+        try:
+            _current_session.reset(session._token)
+        except ValueError:
+            _current_session.set(None)
+        return session
+
+    def _run(self) -> None:
+        own_thread = threading.get_ident()
+        while True:
+            # Sampled under the lock, so a stopped session is no longer written to
+            with self._lock:
+                while not self._sessions:
+                    self._wakeup.wait()
+                frames = sys._current_frames()
+                frames.pop(own_thread, None)
+                for session in self._sessions:
+                    session.sample(frames)
+                del frames
+            time.sleep(self.interval)
+
+
+def current_session() -> Optional[ProfileSession]:
+    return _current_session.get()
+
+
+class ProfiledThreadPoolExecutor(ThreadPoolExecutor):
+    """ThreadPoolExecutor whose calls are sampled as part of the profile of the request submitting them."""
+
+    def submit(self, fn, /, *args, **kwargs):
+        session = _current_session.get()
+        if session is None:
+            return super().submit(fn, *args, **kwargs)
+
+        def profiled():
+            session.attach_thread()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                session.detach_thread()
+        return super().submit(profiled)
+
+
+def new_profile_id(request_id: Optional[str] = None) -> str:
+    """A file-safe profile ID: UTC timestamp and the request ID (or a random one)."""
+    safe_request_id = re.sub(r"[^A-Za-z0-9_.-]", "", request_id or "")[:64].lstrip(".")
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    return f"{stamp}-{safe_request_id or uuid.uuid4().hex}"
+
+
+def save_profile(directory: str, profile_id: str, session: ProfileSession, metadata: Dict[str, Any], keep: int = 200) -> str:
+    """
+    Write a session's collapsed stacks and metadata and prune the oldest profiles
+    beyond keep. Returns the path of the collapsed stacks.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, profile_id + PROFILE_SUFFIX)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(session.collapsed())
+    metadata = {
+        "id": profile_id,
+        "started_at": datetime.fromtimestamp(session.started_at, timezone.utc).isoformat(),
+        "duration": session.duration,
+        "samples": sum(session.samples.values()),
+        "interval": session.interval,
+        **metadata
+    }
+    # Written last: listings only show profiles whose stacks are complete
+    with open(os.path.join(directory, profile_id + METADATA_SUFFIX), "w", encoding="utf-8") as f:
+        json.dump(metadata, f)
+    _prune(directory, keep)
+    return path
+
+
+def _prune(directory: str, keep: int) -> None:
+    profile_ids = sorted(name[:-len(METADATA_SUFFIX)] for name in os.listdir(directory) if name.endswith(METADATA_SUFFIX))
+    for profile_id in profile_ids[:max(len(profile_ids) - keep, 0)]:
+        for suffix in (METADATA_SUFFIX, PROFILE_SUFFIX):
+            try:
+                os.remove(os.path.join(directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles(directory: str, limit: int = 50) -> List[Dict[str, Any]]:
+    """Metadata of the most recent profiles, newest first."""
+    if not os.path.isdir(directory):
+        return []
+    names = sorted((name for name in os.listdir(directory) if name.endswith(METADATA_SUFFIX)), reverse=True)
+    profiles = []
+    for name in names[:limit]:
+        try:
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # Pruned or being written meanwhile
+    return profiles
+
+
+def profile_path(directory: str, profile_id: str) -> Optional[str]:
+    """Path of a profile's collapsed stacks, or None if the ID is invalid or unknown."""
+    if not _PROFILE_ID.match(profile_id) or profile_id.startswith("."):
+        return None
+    path = os.path.join(directory, profile_id + PROFILE_SUFFIX)
+    return path if os.path.isfile(path) else None
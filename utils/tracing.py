@@ -0,0 +1,365 @@
+"""
+Lightweight in-process tracing of RAG requests.
+
+trace() opens the root span of a request and collects every span finished
+under it (in the same task, or in threads started with asyncio.to_thread,
+which copy the context). span() and @traced open child spans and are no-ops
+outside a trace, so library code can be instrumented unconditionally.
+
+Finished traces can be summarized per stage with Trace.breakdown() and sent
+to exporters, e.g. OTLPSpanExporter for an OpenTelemetry collector.
+"""
+import functools
+import inspect
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+_exporters: List[Any] = []
+_exporters_lock = threading.Lock()
+
+
+class Span:
+    """A timed operation, with numeric attributes (counts, tokens) summed per stage in breakdowns."""
+
+    def __init__(self, name: str, trace: "Trace", parent: Optional["Span"] = None, **attributes: Any):
+        self.name = name
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.attributes: Dict[str, Any] = attributes
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    @property
+    def end_ns(self) -> int:
+        return self.start_ns + int((self.duration or 0.0) * 1e9)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def add(self, key: str, value: float) -> None:
+        """Add to a numeric attribute, e.g. tokens counted as they are processed."""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def end(self) -> None:
+        if self.duration is None:
+            self.duration = time.perf_counter() - self._start
+            self.trace.spans.append(self)
+
+
+class _NoopSpan:
+    """Stand-in for span() outside a trace; accepts and drops everything."""
+
+    def set(self, **attributes: Any) -> None:
+        pass
+
+    def add(self, key: str, value: float) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class Trace:
+    """Spans of one request, collected in process as they finish."""
+
+    def __init__(self):
+        self.trace_id = os.urandom(16).hex()
+        self.root: Optional[Span] = None
+        self.spans: List[Span] = []
+
+    def breakdown(self) -> Dict[str, Any]:
+        """
+        Time and numeric attributes per stage (span name) of the spans finished
+        so far, e.g. {"total_time": 1.9, "stages": {"rag.retrieval": {"time": 0.2,
+        "calls": 1, "documents": 6}}}. Stages nest (rag.vectorstore includes
+        rag.embed) and the time of concurrent spans of a stage is summed.
+        """
+        stages: Dict[str, Dict[str, Any]] = {}
+        for finished in list(self.spans):
+            if finished is self.root:
+                continue
+            stage = stages.setdefault(finished.name, {"time": 0.0, "calls": 0})
+            stage["time"] += finished.duration
+            stage["calls"] += 1
+            for key, value in finished.attributes.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stage[key] = stage.get(key, 0) + value
+        total_time = None
+        if self.root is not None:
+            # The root is still open while a streamed response is being produced
+            total_time = self.root.duration
+            if total_time is None:
+                total_time = time.perf_counter() - self.root._start
+        return {"trace_id": self.trace_id, "total_time": total_time, "stages": stages}
+
+
+def current_span():
+    """The innermost open span, or a no-op span outside a trace."""
+    return _current_span.get() or _NOOP_SPAN
+
+
+@contextmanager
+def _open(span: Span) -> Iterator[Span]:
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.error = f"{type(e).__name__}: {e}"[:500]
+        raise
+    finally:
+        span.end()
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # Closed from another context (e.g. an async generator resumed elsewhere)
+            _current_span.set(None)
+
+
+@contextmanager
+def trace(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Open the root span of a new trace. Once it ends, the trace (span.trace)
+    holds every finished span and has been handed to the exporters.
+    """
+    root = Span(name, Trace(), **attributes)
+    root.trace.root = root
+    try:
+        with _open(root):
+            yield root
+    finally:
+        _export(root.trace)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Any]:
+    """Open a child span of the current span (a no-op outside a trace)."""
+    parent = _current_span.get()
+    if parent is None:
+        yield _NOOP_SPAN
+        return
+    with _open(Span(name, parent.trace, parent, **attributes)) as child:
+        yield child
+
+
+def traced(name: str) -> Callable:
+    """Decorator running every call of a (sync or async) function in a span."""
+    def decorator(func: Callable) -> Callable:
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _count_tokens(text: str) -> int:
+    # Imported here since the ingestion module is itself instrumented with spans
+    from rag.vectorstores.ingestion import count_tokens
+    return count_tokens(text)
+
+
+class SpanCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback handler recording retriever and LLM runs as spans.
+
+    Retrieval spans count the returned documents and their tokens; generation
+    spans count prompt and completion tokens, as reported by the model or else
+    counted with tiktoken.
+    """
+
+    def __init__(self):
+        self._spans: Dict[UUID, Span] = {}
+        self._nested: Set[UUID] = set()
+
+    def _start(self, run_id: UUID, name: str, **attributes: Any) -> Optional[Span]:
+        parent = _current_span.get()
+        if parent is None:
+            return None
+        # Runs are nested in the span that was current when the chain was invoked
+        opened = Span(name, parent.trace, parent, **attributes)
+        self._spans[run_id] = opened
+        return opened
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None) -> Optional[Span]:
+        self._nested.discard(run_id)
+        opened = self._spans.pop(run_id, None)
+        if opened is not None:
+            if error is not None:
+                opened.error = f"{type(error).__name__}: {error}"[:500]
+            opened.end()
+        return opened
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        # Retrievers wrapping others (packing, hybrid) make up a single retrieval stage
+        if parent_run_id in self._spans or parent_run_id in self._nested:
+            self._nested.add(run_id)
+        else:
+            self._start(run_id, "rag.retrieval")
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        opened = self._spans.get(run_id)
+        if opened is not None:
+            opened.set(documents=len(documents), context_tokens=sum(_count_tokens(doc.page_content) for doc in documents))
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        prompt = "".join(str(message.content) for batch in messages for message in batch)
+        self._start(run_id, "rag.generation", prompt_tokens=_count_tokens(prompt))
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, "rag.generation", prompt_tokens=sum(_count_tokens(prompt) for prompt in prompts))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        opened = self._spans.get(run_id)
+        if opened is not None:
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            if usage.get("prompt_tokens"):
+                opened.set(prompt_tokens=usage["prompt_tokens"])
+            completion = usage.get("completion_tokens")
+            if completion is None:
+                completion = sum(_count_tokens(g.text) for generations in response.generations for g in generations)
+            opened.set(completion_tokens=completion)
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error)
+
+
+def add_span_exporter(exporter: Any) -> None:
+    """Register an exporter; its export(trace) is called with every finished trace."""
+    with _exporters_lock:
+        _exporters.append(exporter)
+
+
+def clear_span_exporters() -> None:
+    with _exporters_lock:
+        for exporter in _exporters:
+            getattr(exporter, "shutdown", lambda: None)()
+        _exporters.clear()
+
+
+def _export(finished: Trace) -> None:
+    with _exporters_lock:
+        exporters = list(_exporters)
+    for exporter in exporters:
+        try:
+            exporter.export(finished)
+        except Exception as e:
+            print(f"Span exporter {type(exporter).__name__} failed: {e}")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+class OTLPSpanExporter:
+    """
+    Export traces as OTLP/HTTP JSON (e.g. to an OpenTelemetry collector at
+    http://localhost:4318/v1/traces).
+
+    Traces are queued and posted by a background thread, so requests never wait
+    on the collector; when the queue is full (collector down or slow) traces are
+    dropped.
+    """
+
+    def __init__(
+        self,
+        endpoint: str = "http://localhost:4318/v1/traces",
+        service_name: str = "llm-toolchain",
+        timeout: float = 5.0,
+        max_queue_size: int = 1000
+    ):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self.dropped = 0
+        self._queue: "queue.Queue[Optional[Trace]]" = queue.Queue(max_queue_size)
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, finished: Trace) -> None:
+        try:
+            self._queue.put_nowait(finished)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(self.timeout)
+
+    def encode(self, finished: Trace) -> Dict[str, Any]:
+        """The OTLP JSON ExportTraceServiceRequest of a trace."""
+        spans = []
+        for finished_span in finished.spans:
+            encoded = {
+                "traceId": finished.trace_id,
+                "spanId": finished_span.span_id,
+                "name": finished_span.name,
+                "kind": 1,  # SPAN_KIND_INTERNAL
+                "startTimeUnixNano": str(finished_span.start_ns),
+                "endTimeUnixNano": str(finished_span.end_ns),
+                "attributes": _otlp_attributes(finished_span.attributes),
+                "status": {"code": 2, "message": finished_span.error} if finished_span.error else {"code": 1}
+            }
+            if finished_span.parent_id:
+                encoded["parentSpanId"] = finished_span.parent_id
+            spans.append(encoded)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{"scope": {"name": "utils.tracing"}, "spans": spans}]
+            }]
+        }
+
+    def _run(self) -> None:
+        while True:
+            finished = self._queue.get()
+            if finished is None:
+                return
+            request = urllib.request.Request(
+                self.endpoint,
+                data=json.dumps(self.encode(finished)).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST"
+            )
+            try:
+                with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                    response.read()
+            except Exception as e:
+                self.dropped += 1
+                print(f"OTLP export to {self.endpoint} failed: {e}")